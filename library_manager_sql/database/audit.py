@@ -0,0 +1,289 @@
+# database/audit.py
+"""
+Ghi log hệ thống (system_logs) bất đồng bộ, theo lô.
+
+    audit("circulation", {"action": "borrow_book", ...})   # trả về ngay, không chờ MongoDB
+
+- Hàng đợi trong bộ nhớ có giới hạn, một thread nền gom lô rồi insert_many.
+- Mỗi loại log (LOG_CLASSES) có write concern riêng: log bảo mật chờ ghi
+  majority + journal, log mượn / trả w=1, log gỡ lỗi w=0.
+- Hàng đợi đầy: xử lý theo "backpressure" trong config:
+    "spill" (mặc định) ghi thẳng ra file tạm, "block" chờ tối đa block_timeout_ms
+    rồi mới ghi file, "drop" bỏ log và đếm lại.
+- MongoDB không kết nối được: lô đó được ghi nối vào file JSONL (spill_file)
+  và tự động ghi lại vào MongoDB ở lần ghi thành công kế tiếp. Mỗi log có sẵn
+  _id nên ghi lại nhiều lần cũng không bị trùng. Dòng hỏng trong file (ghi dở,
+  thiếu "entry") được chuyển sang file .bad để các dòng còn lại vẫn ghi được.
+- Lô có document không ghi được (ví dụ InvalidDocument) cũng được ghi ra
+  file, giá trị không chuyển được sang JSON thì lưu bằng str(); lỗi bất kỳ
+  không làm dừng thread ghi.
+- flush_audit() được gọi khi đăng xuất và khi thoát chương trình (atexit).
+
+Cấu hình (khối "audit" trong config.json, đều có mặc định):
+    queue_size, batch_size, flush_interval_ms, backpressure, block_timeout_ms,
+    spill_file, write_concern: {loại log: {"w": ..., "j": ...}}
+"""
+import atexit
+import os
+import queue
+import threading
+from pathlib import Path
+
+from bson import ObjectId, json_util
+from pymongo.errors import BulkWriteError
+from pymongo.write_concern import WriteConcern
+
+from database.db import get_collection, load_config
+
+LOG_COLLECTION = "system_logs"
+
+# loại log -> write concern mặc định (ghi đè bằng audit.write_concern trong config.json)
+LOG_CLASSES = {
+    "security": {"w": "majority", "j": True},
+    "circulation": {"w": 1},
+    "general": {"w": 1},
+    "debug": {"w": 0},
+}
+
+DEFAULT_AUDIT_OPTIONS = {
+    "queue_size": 10_000,
+    "batch_size": 500,
+    "flush_interval_ms": 500,
+    "backpressure": "spill",
+    "block_timeout_ms": 200,
+    "spill_file": str(Path(__file__).parent / "audit_spill.jsonl"),
+}
+
+_DUPLICATE_KEY = 11000
+
+
+class _FlushMarker:
+    """Phần tử đặc biệt trong hàng đợi: thread nền gặp nó thì ghi hết lô đang gom."""
+
+    def __init__(self, stop: bool = False):
+        self.done = threading.Event()
+        self.stop = stop
+
+
+class AuditSink:
+    def __init__(self, options: dict | None = None):
+        opts = {**DEFAULT_AUDIT_OPTIONS, **(options or {})}
+        if opts["backpressure"] not in ("spill", "block", "drop"):
+            raise ValueError(f"backpressure không hợp lệ: {opts['backpressure']}")
+        self.batch_size = int(opts["batch_size"])
+        self.flush_interval = int(opts["flush_interval_ms"]) / 1000
+        self.backpressure = opts["backpressure"]
+        self.block_timeout = int(opts["block_timeout_ms"]) / 1000
+        self.spill_file = Path(opts["spill_file"])
+        self.write_concerns = {
+            name: WriteConcern(**wc)
+            for name, wc in {**LOG_CLASSES, **opts.get("write_concern", {})}.items()
+        }
+        self.counters = {
+            "enqueued": 0, "written": 0, "spilled": 0, "dropped": 0, "replayed": 0, "quarantined": 0,
+        }
+
+        self._queue: queue.Queue = queue.Queue(maxsize=int(opts["queue_size"]))
+        self._spill_lock = threading.Lock()
+        self._counter_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    # ---------------------------------------------------------------- ghi vào
+    def submit(self, log_class: str, entry: dict):
+        if log_class not in self.write_concerns:
+            log_class = "general"
+        item = (log_class, {"_id": ObjectId(), **entry})
+        try:
+            if self.backpressure == "block":
+                self._queue.put(item, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(item)
+            self._count("enqueued")
+        except queue.Full:
+            if self.backpressure == "drop":
+                self._count("dropped")
+            else:
+                self._spill([item])
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Chờ ghi hết những log đã nhận. False nếu quá thời gian."""
+        return self._send_marker(_FlushMarker(), timeout)
+
+    def close(self, timeout: float = 5.0) -> bool:
+        ok = self._send_marker(_FlushMarker(stop=True), timeout)
+        self._thread.join(timeout)
+        return ok
+
+    def _send_marker(self, marker: _FlushMarker, timeout: float) -> bool:
+        if not self._thread.is_alive():
+            return True
+        try:
+            self._queue.put(marker, timeout=timeout)
+        except queue.Full:
+            return False
+        return marker.done.wait(timeout)
+
+    def stats(self) -> dict:
+        with self._counter_lock:
+            return {**self.counters, "queued": self._queue.qsize()}
+
+    def _count(self, name: str, n: int = 1):
+        with self._counter_lock:
+            self.counters[name] += n
+
+    # ---------------------------------------------------------------- thread nền
+    def _safe(self, fn, *args):
+        """Lỗi bất kỳ chỉ in ra: thread ghi log không được dừng giữa chừng."""
+        try:
+            fn(*args)
+        except Exception as e:
+            print("Audit writer error:", e)
+
+    def _run(self):
+        self._safe(self._replay)
+        batch: list = []
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, _FlushMarker):
+                self._safe(self._write, batch)
+                batch = []
+                item.done.set()
+                if item.stop:
+                    return
+                continue
+            if item is not None:
+                batch.append(item)
+                if len(batch) < self.batch_size:
+                    continue
+            if batch:
+                self._safe(self._write, batch)
+                batch = []
+
+    def _write(self, batch: list):
+        if not batch:
+            return
+        by_class: dict[str, list] = {}
+        for log_class, entry in batch:
+            by_class.setdefault(log_class, []).append(entry)
+        failed = []
+        for log_class, entries in by_class.items():
+            if self._insert(entries, self.write_concerns[log_class]):
+                self._count("written", len(entries))
+            else:
+                failed += [(log_class, e) for e in entries]
+        if failed:
+            self._spill(failed)
+        elif self.spill_file.exists():
+            self._replay()  # MongoDB đã ghi được trở lại: ghi nốt phần tồn trong file
+
+    def _insert(self, entries: list, write_concern: WriteConcern) -> bool:
+        coll = get_collection(LOG_COLLECTION).with_options(write_concern=write_concern)
+        try:
+            coll.insert_many(entries, ordered=False)
+        except BulkWriteError as e:
+            # Trùng _id = đã ghi từ lần trước (ghi lại từ file), coi như thành công
+            return all(err.get("code") == _DUPLICATE_KEY for err in e.details.get("writeErrors", []))
+        except Exception as e:
+            # PyMongoError (mất kết nối...) hoặc lỗi mã hoá BSON (InvalidDocument...)
+            print("Audit write error:", e)
+            return False
+        return True
+
+    # ---------------------------------------------------------------- file tạm
+    @staticmethod
+    def _spill_line(log_class: str, entry: dict) -> str:
+        # default=str: giá trị json_util không chuyển được vẫn ghi được (dạng chuỗi)
+        return json_util.dumps({"class": log_class, "entry": entry}, default=str) + "\n"
+
+    def _spill(self, items: list):
+        with self._spill_lock:
+            with open(self.spill_file, "a", encoding="utf-8") as f:
+                for log_class, entry in items:
+                    f.write(self._spill_line(log_class, entry))
+                f.flush()
+                os.fsync(f.fileno())
+        self._count("spilled", len(items))
+
+    def _replay(self):
+        """Ghi lại các log trong spill_file vào MongoDB; lỗi thì giữ nguyên file."""
+        replaying = self.spill_file.with_suffix(".replaying")
+        with self._spill_lock:
+            # File .replaying còn sót (tắt giữa chừng lần trước) thì ghi nó trước
+            if not replaying.exists():
+                if not self.spill_file.exists():
+                    return
+                os.replace(self.spill_file, replaying)
+        items, bad = [], []
+        with open(replaying, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    rec = json_util.loads(line)
+                    items.append((rec.get("class", "general"), rec["entry"]))
+                except (ValueError, KeyError, AttributeError):
+                    # dòng ghi dở khi tiến trình bị tắt đột ngột / không đúng dạng:
+                    # để riêng ra, không chặn cả file ở mọi lần ghi lại sau
+                    bad.append(line if line.endswith("\n") else line + "\n")
+        if bad:
+            with open(self.spill_file.with_suffix(".bad"), "a", encoding="utf-8") as f:
+                f.writelines(bad)
+            self._count("quarantined", len(bad))
+        by_class: dict[str, list] = {}
+        for log_class, entry in items:
+            by_class.setdefault(log_class, []).append(entry)
+        remaining = []
+        for log_class, entries in by_class.items():
+            wc = self.write_concerns.get(log_class, self.write_concerns["general"])
+            for i in range(0, len(entries), self.batch_size):
+                chunk = entries[i:i + self.batch_size]
+                if self._insert(chunk, wc):
+                    self._count("replayed", len(chunk))
+                else:
+                    remaining += [(log_class, e) for e in chunk]
+        os.remove(replaying)
+        if remaining:
+            with self._spill_lock:
+                with open(self.spill_file, "a", encoding="utf-8") as f:
+                    for log_class, entry in remaining:
+                        f.write(self._spill_line(log_class, entry))
+
+
+# === SINK DÙNG CHUNG TRONG TIẾN TRÌNH (tạo khi ghi log lần đầu) ===
+_sink: AuditSink | None = None
+_sink_lock = threading.Lock()
+
+
+def get_sink() -> AuditSink:
+    global _sink
+    with _sink_lock:
+        if _sink is None:
+            _sink = AuditSink(load_config().get("audit"))
+        return _sink
+
+
+def audit(log_class: str, entry: dict):
+    get_sink().submit(log_class, entry)
+
+
+def flush_audit(timeout: float = 5.0) -> bool:
+    """Ghi hết log còn trong hàng đợi (không làm gì nếu chưa ghi log nào)."""
+    return _sink.flush(timeout) if _sink is not None else True
+
+
+def audit_stats() -> dict | None:
+    return _sink.stats() if _sink is not None else None
+
+
+def _close_at_exit():
+    if _sink is not None:
+        _sink.close()
+
+
+# Đăng ký sau db.close_clients nên chạy TRƯỚC nó (atexit chạy ngược thứ tự)
+atexit.register(_close_at_exit)
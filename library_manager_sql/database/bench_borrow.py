@@ -0,0 +1,184 @@
+# database/bench_borrow.py
+"""
+Đo số lệnh SQL (round trip) + thời gian cho mỗi lần mượn / trả sách,
+so sánh cách cũ (từng câu lệnh riêng) và cách mới (một batch T-SQL).
+Chỉ đo phần SQL: log_action / notify_mirror bị tắt trong lúc bench nên hai
+cách cùng phạm vi và không lượt mượn thử nào được gửi sang MongoDB. Cuối bench
+các lượt mượn thử cùng sự kiện loan_outbox của chúng bị xoá.
+
+Chạy từ thư mục library_manager_sql (cần SQL Server theo config.json, có sẵn
+ít nhất 1 nhân viên, 1 độc giả và 1 sách 'Có sẵn'):
+    python -m database.bench_borrow          # mặc định 50 vòng mượn + trả
+    python -m database.bench_borrow 200
+Không chạy song song với ứng dụng / python -m database.loan_outbox (thread gửi
+bản sao của chúng có thể chép sự kiện trước khi bench kịp xoá); an toàn nhất
+là trỏ config.json vào một database SQL Server nháp.
+"""
+import statistics
+import sys
+import threading
+import time
+
+from database import library_system as ls
+
+
+class StatementCounter:
+    """Đếm execute / commit trên thread đo (bỏ qua thread nền của loan_outbox)."""
+
+    def __init__(self):
+        self.count = 0
+        self.thread = threading.current_thread()
+
+    def hit(self):
+        if threading.current_thread() is self.thread:
+            self.count += 1
+
+
+class _CountingCursor:
+    def __init__(self, cursor, counter):
+        self._cursor = cursor
+        self._counter = counter
+
+    def execute(self, *args):
+        self._counter.hit()
+        return self._cursor.execute(*args)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class _CountingConnection:
+    def __init__(self, conn, counter):
+        self._conn = conn
+        self._counter = counter
+
+    def cursor(self):
+        return _CountingCursor(self._conn.cursor(), self._counter)
+
+    def commit(self):
+        self._counter.hit()
+        return self._conn.commit()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+counter = StatementCounter()
+# Phải thay factory trước khi pool mở kết nối đầu tiên
+_factory = ls.sql_pool.factory
+ls.sql_pool.factory = lambda: _CountingConnection(_factory(), counter)
+
+# borrow_book / return_book gọi qua tên trong module library_system
+ls.log_action = lambda *args, **kwargs: None
+ls.notify_mirror = lambda: None
+
+
+# === CÁCH CŨ: kiểm tra nhân viên, kiểm tra sách, insert, SCOPE_IDENTITY, outbox, tên sách ===
+def legacy_borrow(borrower_id, book_id, emp_id):
+    with ls.sql_pool.unit_of_work() as cur:
+        if not ls.sql_fetch("SELECT 1 FROM employees WHERE employee_id = ?", (emp_id,)):
+            return None
+        book = ls.sql_fetch("SELECT status FROM books WITH (UPDLOCK, ROWLOCK) WHERE book_id = ?", (book_id,))
+        if not book or book[0]["status"] != "Có sẵn":
+            return None
+        cur.execute("INSERT INTO loans (borrower_id, book_id, employee_id) VALUES (?, ?, ?)",
+                    (borrower_id, book_id, emp_id))
+        cur.execute("SELECT CAST(SCOPE_IDENTITY() AS INT)")
+        loan_id = cur.fetchone()[0]
+        cur.execute(
+            "INSERT INTO loan_outbox (event_type, loan_id, borrower_id, book_id, employee_id) "
+            "VALUES ('borrow', ?, ?, ?, ?)",
+            (loan_id, borrower_id, book_id, emp_id))
+        ls.sql_fetch("SELECT title, category FROM books WHERE book_id = ?", (book_id,))
+    return loan_id
+
+
+def legacy_return(loan_id):
+    with ls.sql_pool.unit_of_work() as cur:
+        cur.execute("UPDATE loans SET is_returned = 1 WHERE loan_id = ? AND is_returned = 0", (loan_id,))
+        if cur.rowcount != 1:
+            return False
+        cur.execute(
+            "INSERT INTO loan_outbox (event_type, loan_id, borrower_id, book_id, employee_id) "
+            "SELECT 'return', loan_id, borrower_id, book_id, employee_id FROM loans WHERE loan_id = ?",
+            (loan_id,))
+    return True
+
+
+# === CÁCH MỚI: library_system.borrow_book / return_book ===
+def batch_borrow(borrower_id, book_id, emp_id):
+    return ls.borrow_book(borrower_id, book_id, emp_id)[0]
+
+
+def batch_return(loan_id):
+    return ls.return_book(loan_id)[0]
+
+
+def _last_loan_id(book_id):
+    """loan_id của lượt vừa mượn (đọc ngoài phần đo, cho cả hai cách)."""
+    return ls.sql_fetch("SELECT MAX(loan_id) AS loan_id FROM loans WHERE book_id = ?", (book_id,))[0]["loan_id"]
+
+
+def _sample_ids():
+    row = ls.sql_fetch(
+        "SELECT (SELECT TOP 1 employee_id FROM employees ORDER BY employee_id) AS emp_id, "
+        "       (SELECT TOP 1 borrower_id FROM borrowers ORDER BY borrower_id) AS borrower_id, "
+        "       (SELECT TOP 1 book_id FROM books WHERE status = N'Có sẵn' ORDER BY book_id) AS book_id"
+    )[0]
+    return row["borrower_id"], row["book_id"], row["emp_id"]
+
+
+def cleanup(loan_ids):
+    """Xoá các lượt mượn do bench tạo cùng sự kiện outbox của chúng."""
+    for i in range(0, len(loan_ids), 500):  # SQL Server: tối đa 2100 tham số / lệnh
+        chunk = tuple(loan_ids[i:i + 500])
+        marks = ", ".join("?" * len(chunk))
+        with ls.sql_pool.unit_of_work():  # 1 kết nối, 1 transaction cho cả hai lệnh
+            ls.sql_execute(f"DELETE FROM loan_outbox WHERE loan_id IN ({marks})", chunk)
+            ls.sql_execute(f"DELETE FROM loans WHERE loan_id IN ({marks})", chunk)
+
+
+def measure(label, borrow_fn, return_fn, ids, rounds, loan_ids):
+    borrow_ms, return_ms, borrow_stmts, return_stmts = [], [], [], []
+    for _ in range(rounds):
+        counter.count = 0
+        t0 = time.perf_counter()
+        ok = borrow_fn(*ids)
+        borrow_ms.append((time.perf_counter() - t0) * 1000)
+        borrow_stmts.append(counter.count)
+        if not ok:
+            print(f"  {label}: không mượn được sách #{ids[1]} (đã dừng)")
+            return
+        loan_id = _last_loan_id(ids[1])
+        loan_ids.append(loan_id)
+
+        counter.count = 0
+        t0 = time.perf_counter()
+        if not return_fn(loan_id):
+            print(f"  {label}: không trả được lượt mượn #{loan_id} (đã dừng)")
+            return
+        return_ms.append((time.perf_counter() - t0) * 1000)
+        return_stmts.append(counter.count)
+
+    for op, ms, stmts in (("mượn", borrow_ms, borrow_stmts), ("trả", return_ms, return_stmts)):
+        print(
+            f"  {label:<4} {op:<5} {statistics.mean(stmts):4.1f} lệnh | "
+            f"trung bình {statistics.mean(ms):7.2f} ms | p95 {sorted(ms)[min(len(ms) - 1, int(len(ms) * 0.95))]:7.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    print(f"=== BENCH MƯỢN / TRẢ SQL SERVER ({rounds} vòng, lệnh = execute + commit) ===")
+    ids = _sample_ids()
+    if None in ids:
+        print("Cần ít nhất 1 nhân viên, 1 độc giả và 1 sách 'Có sẵn'.")
+        sys.exit(1)
+    print(f"độc giả #{ids[0]}, sách #{ids[1]}, nhân viên #{ids[2]}")
+    loan_ids = []
+    try:
+        measure("cũ", legacy_borrow, legacy_return, ids, rounds, loan_ids)
+        measure("mới", batch_borrow, batch_return, ids, rounds, loan_ids)
+    finally:
+        cleanup(loan_ids)
+        print(f"Đã xoá {len(loan_ids)} lượt mượn thử + sự kiện loan_outbox của chúng")
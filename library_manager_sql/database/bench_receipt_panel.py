@@ -0,0 +1,99 @@
+# database/bench_receipt_panel.py
+"""
+Đo số lệnh MongoDB + thời gian khi mở panel "Chi tiết mượn–trả" của một độc giả
+(danh sách phiếu + sách trong từng phiếu), so sánh cách cũ và cách mới.
+
+Chạy từ thư mục library_manager_sql (cần dữ liệu từ seed_demo_data.py):
+    python -m database.bench_receipt_panel
+"""
+import time
+
+from pymongo import monitoring
+
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        if event.command_name not in ("hello", "isMaster", "ping", "endSessions"):
+            self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+# Phải đăng ký trước khi MongoClient được tạo
+counter = CommandCounter()
+monitoring.register(counter)
+
+from database.db import get_collection  # noqa: E402
+from ui.frames.borrowers_frame import _list_receipts, _receipt_lines  # noqa: E402
+
+
+# === CÁCH CŨ: 1 count_documents / phiếu, 1 find_one / dòng sách ===
+def legacy_list_receipts(borrower_id: int):
+    receipts = get_collection("loan_receipts")
+    loans = get_collection("loans")
+    result = []
+    for r in receipts.find({"borrower_id": borrower_id}).sort(
+        [("borrow_date", -1), ("receipt_id", -1)]
+    ):
+        rid = int(r["receipt_id"])
+        book_count = loans.count_documents({"receipt_id": rid})
+        result.append((rid, r.get("borrow_date"), r.get("due_date"), r.get("return_date"), book_count))
+    return result
+
+
+def legacy_receipt_lines(receipt_id: int):
+    loans = get_collection("loans")
+    books = get_collection("books")
+    lines = []
+    for l in loans.find({"receipt_id": receipt_id}).sort("loan_id", 1):
+        bk = books.find_one({"book_id": int(l["book_id"])}) or {}
+        lines.append((int(l["book_id"]), bk.get("title", "")))
+    return lines
+
+
+def open_panel(list_fn, lines_fn, borrower_id: int):
+    """Mở panel rồi chọn lần lượt từng phiếu, giống thao tác trên giao diện."""
+    rows = list_fn(borrower_id)
+    for row in rows:
+        lines_fn(row[0])
+    return len(rows)
+
+
+def measure(label, list_fn, lines_fn, borrower_id):
+    counter.count = 0
+    t0 = time.perf_counter()
+    n_receipts = open_panel(list_fn, lines_fn, borrower_id)
+    elapsed = (time.perf_counter() - t0) * 1000
+    # 1 lệnh cho danh sách + 1 lệnh cho mỗi lần chọn phiếu
+    print(f"  {label:<6} {n_receipts:>4} phiếu | {counter.count:>5} lệnh | {elapsed:8.1f} ms")
+
+
+if __name__ == "__main__":
+    print("=== BENCH PANEL CHI TIẾT MƯỢN–TRẢ ===")
+    top = list(
+        get_collection("loan_receipts").aggregate(
+            [
+                {"$group": {"_id": "$borrower_id", "n": {"$sum": 1}}},
+                {"$sort": {"n": -1}},
+                {"$limit": 3},
+            ]
+        )
+    )
+    if not top:
+        print("Chưa có phiếu mượn nào, hãy chạy seed_demo_data.py trước.")
+    for doc in top:
+        bid = int(doc["_id"])
+        print(f"Độc giả #{bid}:")
+        measure("cũ", legacy_list_receipts, legacy_receipt_lines, bid)
+        measure("mới", _list_receipts, _receipt_lines, bid)
+        # Panel chỉ mở danh sách (chưa chọn phiếu): số lệnh mới luôn là 1
+        counter.count = 0
+        _list_receipts(bid)
+        print(f"  chỉ danh sách phiếu (mới): {counter.count} lệnh")
@@ -0,0 +1,79 @@
+# database/bench_search.py
+"""
+So sánh tìm sách bằng $regex (cách cũ) và bằng index tiền tố không dấu (database/search.py).
+
+Tạo dữ liệu giả trong một database riêng (<database>_bench_search), đo rồi xoá:
+    python -m database.bench_search            # 100000 sách
+    python -m database.bench_search 300000
+"""
+import random
+import sys
+import time
+
+from pymongo import ASCENDING
+
+from database.db import get_client, load_config
+from database import search
+
+WORDS = [
+    "Văn", "học", "Việt", "Nam", "Lịch", "sử", "Khoa", "Kinh", "tế", "Lập", "trình",
+    "Python", "Thiếu", "nhi", "Truyện", "ngắn", "Thơ", "Đời", "sống", "Toán", "rời", "rạc",
+    "Cơ", "sở", "dữ", "liệu", "Mạng", "máy", "tính", "Triết", "Địa", "lý", "Âm", "nhạc",
+]
+CATEGORIES = ["Lịch sử", "Khoa học", "Lập trình", "Văn học", "Thiếu nhi", "Kinh tế"]
+KEYWORDS = ["van hoc", "Văn học", "lich su", "pyth", "C++", "dữ liệu", "toan roi rac"]
+
+
+def _fake_book(book_id: int) -> dict:
+    doc = {
+        "book_id": book_id,
+        "title": " ".join(random.choices(WORDS, k=random.randint(2, 5))) + f" {book_id}",
+        "author": f"Tác giả {random.choice(WORDS)} {random.randint(1, 999)}",
+        "category": random.choice(CATEGORIES),
+        "status": "Có sẵn",
+    }
+    return {**doc, **search.search_fields(doc)}
+
+
+def _regex_find(col, kw: str) -> int:
+    regex = {"$regex": kw, "$options": "i"}
+    try:
+        return len(list(col.find({"$or": [{"title": regex}, {"author": regex}, {"category": regex}]})))
+    except Exception as e:
+        return f"LỖI ({type(e).__name__})"
+
+
+def _index_find(col, kw: str) -> int:
+    query = search.search_query(kw)
+    return len(list(col.find(query))) if query else 0
+
+
+def _timed(fn, *args, repeat: int = 3):
+    best, result = None, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(*args)
+        ms = (time.perf_counter() - t0) * 1000
+        best = ms if best is None else min(best, ms)
+    return best, result
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    db_name = f"{load_config()['database']}_bench_search"
+    col = get_client()[db_name]["books"]
+
+    print(f"=== BENCH TÌM SÁCH ({n} sách) ===")
+    col.drop()
+    for start in range(1, n + 1, 5000):
+        col.insert_many([_fake_book(i) for i in range(start, min(start + 5000, n + 1))])
+    col.create_index([("search_prefixes", ASCENDING)])
+
+    try:
+        print(f"{'từ khoá':<16}{'regex ms':>10}{'kq':>8}{'index ms':>10}{'kq':>8}")
+        for kw in KEYWORDS:
+            t_re, r_re = _timed(_regex_find, col, kw)
+            t_ix, r_ix = _timed(_index_find, col, kw)
+            print(f"{kw:<16}{t_re:>10.1f}{str(r_re):>8}{t_ix:>10.1f}{r_ix:>8}")
+    finally:
+        get_client().drop_database(db_name)
@@ -0,0 +1,155 @@
+# database/borrower_stats.py
+"""
+Bộ đếm lưu ngay trên document borrowers, để danh sách / xếp hạng độc giả
+không phải đếm lại loan_receipts / loans:
+
+    open_receipts  : số phiếu đang mở
+    total_receipts : tổng số phiếu đã lập
+    total_loans    : tổng số lượt mượn sách (mọi lúc)
+
+circulation.create_receipt / close_receipt cập nhật bằng $inc trong cùng
+transaction với phiếu; xoá sách kèm lịch sử loans thì trừ total_loans.
+Độc giả cũ chưa có bộ đếm được tính khi khởi động (repair(only_missing=True)).
+Sửa lệch (dữ liệu cũ, sau seed, lỗi giữa chừng khi server không có transaction):
+    python -m database.borrower_stats --repair      # tính lại và ghi
+    python -m database.borrower_stats --check       # chỉ báo số độc giả bị lệch
+"""
+import sys
+
+from pymongo import UpdateOne
+
+from database.cache import invalidate_queries, memoize_query
+from database.db import get_collection
+
+COUNTER_FIELDS = ("open_receipts", "total_receipts", "total_loans")
+EMPTY_COUNTERS = {f: 0 for f in COUNTER_FIELDS}
+
+
+def on_receipt_opened(borrower_id: int, book_count: int, session=None):
+    get_collection("borrowers").update_one(
+        {"borrower_id": borrower_id},
+        {"$inc": {"open_receipts": 1, "total_receipts": 1, "total_loans": book_count}},
+        session=session,
+    )
+
+
+def on_receipt_cancelled(borrower_id: int, book_count: int, session=None):
+    """Hoàn tác on_receipt_opened khi lập phiếu lỗi giữa chừng (không có transaction)."""
+    get_collection("borrowers").update_one(
+        {"borrower_id": borrower_id, "open_receipts": {"$gt": 0}},
+        {"$inc": {"open_receipts": -1, "total_receipts": -1, "total_loans": -book_count}},
+        session=session,
+    )
+
+
+def on_receipt_closed(borrower_id: int, session=None):
+    # Điều kiện > 0 để bộ đếm không âm nếu trước đó đã lệch
+    get_collection("borrowers").update_one(
+        {"borrower_id": borrower_id, "open_receipts": {"$gt": 0}},
+        {"$inc": {"open_receipts": -1}},
+        session=session,
+    )
+
+
+def on_loan_recorded(borrower_id: int, session=None):
+    """Lượt mượn lẻ không qua phiếu (đồng bộ từ SQL Server: library_system)."""
+    get_collection("borrowers").update_one(
+        {"borrower_id": borrower_id},
+        {"$inc": {"total_loans": 1}},
+        session=session,
+    )
+
+
+def on_loans_deleted(counts: dict, session=None):
+    """Xoá lịch sử loans (xoá sách): trừ total_loans theo {borrower_id: số lượt}."""
+    ops = [
+        # Điều kiện >= n để bộ đếm không âm nếu trước đó đã lệch
+        UpdateOne({"borrower_id": bid, "total_loans": {"$gte": n}}, {"$inc": {"total_loans": -n}})
+        for bid, n in counts.items()
+    ]
+    if ops:
+        get_collection("borrowers").bulk_write(ops, ordered=False, session=session)
+
+
+@memoize_query("top_borrowers")
+def top_borrowers(limit: int = 20) -> list[tuple]:
+    """[(tên, số lượt mượn), ...] đọc thẳng theo index ix_top_loans, không quét lịch sử."""
+    docs = (
+        get_collection("borrowers")
+        .find(
+            {"total_loans": {"$gt": 0}},
+            projection={"_id": 0, "borrower_id": 1, "name": 1, "total_loans": 1},
+        )
+        .sort([("total_loans", -1), ("borrower_id", 1)])
+        .limit(limit)
+    )
+    return [(d.get("name") or f"#{d['borrower_id']}", d["total_loans"]) for d in docs]
+
+
+# === SỬA LỆCH ===
+def _actual_counters(borrower_ids: list | None = None) -> dict:
+    """{borrower_id: {open_receipts, total_receipts, total_loans}} đếm lại từ lịch sử."""
+    match = [{"$match": {"borrower_id": {"$in": borrower_ids}}}] if borrower_ids is not None else []
+    actual: dict = {}
+    for d in get_collection("loan_receipts").aggregate(
+        match + [
+            {
+                "$group": {
+                    "_id": "$borrower_id",
+                    "total": {"$sum": 1},
+                    "open": {"$sum": {"$cond": [{"$eq": ["$return_date", None]}, 1, 0]}},
+                }
+            }
+        ]
+    ):
+        c = actual.setdefault(d["_id"], dict(EMPTY_COUNTERS))
+        c["total_receipts"], c["open_receipts"] = d["total"], d["open"]
+    for d in get_collection("loans").aggregate(match + [{"$group": {"_id": "$borrower_id", "n": {"$sum": 1}}}]):
+        actual.setdefault(d["_id"], dict(EMPTY_COUNTERS))["total_loans"] = d["n"]
+    return actual
+
+
+def repair(write: bool = True, batch_size: int = 1000, only_missing: bool = False) -> int:
+    """
+    Đặt lại bộ đếm cho mọi độc giả bị lệch. Trả về số độc giả lệch.
+    only_missing=True: chỉ độc giả còn thiếu trường bộ đếm (dùng khi khởi động).
+    """
+    borrowers = get_collection("borrowers")
+    cond: dict = {"borrower_id": {"$exists": True}}
+    ids = None
+    if only_missing:
+        cond["$or"] = [{f: {"$exists": False}} for f in COUNTER_FIELDS]
+        ids = [b["borrower_id"] for b in borrowers.find(cond, projection={"borrower_id": 1})]
+        if not ids:
+            return 0
+    actual = _actual_counters(ids)
+    ops, wrong = [], 0
+    projection = {"_id": 1, "borrower_id": 1, **{f: 1 for f in COUNTER_FIELDS}}
+    for b in borrowers.find(cond, projection=projection):
+        want = actual.get(b["borrower_id"], EMPTY_COUNTERS)
+        if all(b.get(f) == want[f] for f in COUNTER_FIELDS):
+            continue
+        wrong += 1
+        if write:
+            ops.append(UpdateOne({"_id": b["_id"]}, {"$set": dict(want)}))
+        if len(ops) >= batch_size:
+            borrowers.bulk_write(ops, ordered=False)
+            ops = []
+    if ops:
+        borrowers.bulk_write(ops, ordered=False)
+    if write and wrong:
+        invalidate_queries()   # top_borrowers đã nhớ theo bộ đếm cũ
+    return wrong
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if "--repair" in args:
+        print(f"Đã sửa bộ đếm cho {repair()} độc giả.")
+    elif "--check" in args:
+        n = repair(write=False)
+        print(f"{n} độc giả có bộ đếm lệch." if n else "Bộ đếm khớp với lịch sử mượn.")
+        sys.exit(1 if n else 0)
+    else:
+        for name, n in top_borrowers():
+            print(f"{n:>5}  {name}")
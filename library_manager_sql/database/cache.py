@@ -0,0 +1,191 @@
+# database/cache.py
+"""
+Cache trong tiến trình cho các bản ghi hay được đọc lại (sách, người mượn).
+
+LRUCache giới hạn số phần tử + thời gian sống (TTL), đếm hit / miss, và có
+hàm invalidate để các hàm ghi (_update_book, _delete_borrower, ...) xoá bản cũ.
+Mỗi lần invalidate / clear tăng generation: loader bắt đầu TRƯỚC đó (đọc số
+liệu trước lần ghi) không được lưu kết quả vào cache sau khi đã xoá.
+Bản ghi sách KHÔNG chứa status (status đổi liên tục khi mượn / trả).
+
+query_cache nhớ kết quả các truy vấn thống kê (@memoize_query) theo tên +
+tham số, TTL lấy từ "stats_cache_ttl_seconds" trong config.json; các hàm
+mượn / trả gọi invalidate_queries() để lần xem sau lấy số liệu mới.
+"""
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+from database.db import get_collection, load_config
+
+_MISSING = object()
+
+
+class LRUCache:
+    def __init__(self, name: str, maxsize: int = 2000, ttl: float = 300.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0   # tăng mỗi lần invalidate / clear
+        self._data: OrderedDict = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING:
+                expires_at, value = item
+                if expires_at >= time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value, generation: int | None = None):
+        """generation: giá trị đọc trước khi nạp; đã có invalidate / clear từ đó thì không lưu."""
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_load(self, key, loader):
+        """Trả về bản trong cache, nếu không có thì gọi loader() rồi lưu lại (None không lưu)."""
+        generation = self.generation
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = loader()
+            if value is not None:
+                self.put(key, value, generation)
+        return value
+
+    def get_many(self, keys, loader_many) -> dict:
+        """
+        Lấy nhiều key: phần thiếu được nạp bằng MỘT lần gọi loader_many(missing_keys)
+        (trả về dict key -> value).
+        """
+        generation = self.generation
+        found, missing = {}, []
+        for key in keys:
+            value = self.get(key, _MISSING)
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+        if missing:
+            for key, value in loader_many(missing).items():
+                self.put(key, value, generation)
+                found[key] = value
+        return found
+
+    def invalidate(self, key):
+        with self._lock:
+            self.generation += 1
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
+
+    def oldest_age(self) -> float | None:
+        """Số giây kể từ khi phần tử cũ nhất còn hạn được nạp (None nếu cache rỗng)."""
+        now = time.monotonic()
+        with self._lock:
+            stored = [exp - self.ttl for exp, _ in self._data.values() if exp >= now]
+        return now - min(stored) if stored else None
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits / total) if total else 0.0,
+        }
+
+
+# === CACHE BẢN GHI SÁCH / NGƯỜI MƯỢN (MongoDB) ===
+_BOOK_FIELDS = {"_id": 0, "book_id": 1, "title": 1, "author": 1, "published_year": 1, "category": 1}
+_BORROWER_FIELDS = {"_id": 0, "borrower_id": 1, "name": 1, "phone": 1, "email": 1}
+
+book_cache = LRUCache("books", maxsize=5000, ttl=600)
+borrower_cache = LRUCache("borrowers", maxsize=5000, ttl=600)
+
+
+def _load_books(book_ids) -> dict:
+    docs = get_collection("books").find({"book_id": {"$in": list(book_ids)}}, projection=_BOOK_FIELDS)
+    return {int(d["book_id"]): d for d in docs}
+
+
+def get_book(book_id: int) -> dict | None:
+    book_id = int(book_id)
+    return book_cache.get_or_load(
+        book_id,
+        lambda: get_collection("books").find_one({"book_id": book_id}, projection=_BOOK_FIELDS),
+    )
+
+
+def get_books(book_ids) -> dict:
+    """{book_id: record} cho nhiều sách, tối đa 1 truy vấn $in cho phần chưa có trong cache."""
+    return book_cache.get_many([int(b) for b in book_ids], _load_books)
+
+
+def get_borrower(borrower_id: int) -> dict | None:
+    borrower_id = int(borrower_id)
+    return borrower_cache.get_or_load(
+        borrower_id,
+        lambda: get_collection("borrowers").find_one(
+            {"borrower_id": borrower_id}, projection=_BORROWER_FIELDS
+        ),
+    )
+
+
+def invalidate_book(book_id: int):
+    book_cache.invalidate(int(book_id))
+
+
+def invalidate_borrower(borrower_id: int):
+    borrower_cache.invalidate(int(borrower_id))
+
+
+def cache_stats() -> list[dict]:
+    return [book_cache.stats(), borrower_cache.stats(), query_stats()]
+
+
+# === CACHE KẾT QUẢ TRUY VẤN THỐNG KÊ ===
+query_cache = LRUCache(
+    "queries", maxsize=256, ttl=float(load_config().get("stats_cache_ttl_seconds", 60))
+)
+
+
+def memoize_query(name: str):
+    """
+    Nhớ kết quả hàm truy vấn theo (name, tham số) trong query_cache.
+    Tham số phải hashable (chuẩn hoá ngày về 00:00 trước khi gọi để key ổn định).
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = (name, args, tuple(sorted(kwargs.items())))
+            return query_cache.get_or_load(key, lambda: fn(*args, **kwargs))
+        return wrapper
+    return decorator
+
+
+def invalidate_queries():
+    """Xoá toàn bộ kết quả thống kê đã nhớ (gọi sau khi tạo / đóng phiếu mượn)."""
+    query_cache.clear()
+
+
+def query_stats() -> dict:
+    """stats() của query_cache kèm age = tuổi (giây) của số liệu cũ nhất đang dùng."""
+    return {**query_cache.stats(), "age": query_cache.oldest_age()}
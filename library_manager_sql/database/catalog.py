@@ -0,0 +1,111 @@
+# database/catalog.py
+"""
+Danh mục sách phân trang kiểu keyset (con trỏ after / before) thay vì tải
+toàn bộ collection books rồi sort trong Python.
+
+Con trỏ là tuple (giá trị cột sort, book_id) của dòng cuối / đầu trang, nên
+trang kế tiếp luôn ổn định kể cả khi có sách được thêm / xoá giữa hai lần tải.
+Mỗi cột sort đều có index (cột, book_id) trong database/indexes.py.
+"""
+from database.db import get_collection
+
+PAGE_SIZE = 200
+SORT_FIELDS = ("book_id", "title")
+
+_PROJECTION = {
+    "_id": 0,
+    "book_id": 1,
+    "title": 1,
+    "author": 1,
+    "published_year": 1,
+    "category": 1,
+    "status": 1,
+}
+
+
+def book_row(d: dict) -> tuple:
+    """(book_id, title, author, year, category, status) cho Treeview."""
+    return (
+        int(d.get("book_id")),
+        d.get("title", ""),
+        d.get("author", ""),
+        d.get("published_year", ""),
+        d.get("category", ""),
+        d.get("status", "Có sẵn"),
+    )
+
+
+def _keyset_filter(sort_field: str, cursor: tuple, op: str) -> dict:
+    value, book_id = cursor
+    if sort_field == "book_id":
+        return {"book_id": {op: book_id}}
+    return {
+        "$or": [
+            {sort_field: {op: value}},
+            {sort_field: value, "book_id": {op: book_id}},
+        ]
+    }
+
+
+def _cursor_of(d: dict, sort_field: str) -> tuple:
+    return (d.get(sort_field), int(d["book_id"]))
+
+
+def list_books_page(
+    query: dict | None = None,
+    after: tuple | None = None,
+    before: tuple | None = None,
+    limit: int = PAGE_SIZE,
+    sort_field: str = "book_id",
+) -> dict:
+    """
+    Trả về một trang sách:
+        {"rows": [...], "next": cursor | None, "prev": cursor | None}
+    - query : điều kiện lọc thêm (ví dụ từ ô tìm kiếm)
+    - after : lấy trang ngay sau con trỏ này
+    - before: lấy trang ngay trước con trỏ này
+    """
+    if sort_field not in SORT_FIELDS:
+        raise ValueError(f"Không hỗ trợ sắp xếp theo {sort_field}")
+
+    # Chỉ lấy document có book_id dạng số (bỏ dữ liệu test cũ không chuẩn)
+    conditions = [{"book_id": {"$type": "number"}}]
+    if query:
+        conditions.append(query)
+    if after is not None:
+        conditions.append(_keyset_filter(sort_field, after, "$gt"))
+    elif before is not None:
+        conditions.append(_keyset_filter(sort_field, before, "$lt"))
+
+    direction = -1 if before is not None and after is None else 1
+    sort = [(sort_field, direction)]
+    if sort_field != "book_id":
+        sort.append(("book_id", direction))
+
+    # Lấy dư 1 dòng để biết còn trang tiếp theo hay không
+    docs = list(
+        get_collection("books")
+        .find({"$and": conditions}, projection=_PROJECTION)
+        .sort(sort)
+        .limit(limit + 1)
+    )
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    if direction == -1:
+        docs.reverse()
+
+    if not docs:
+        return {"rows": [], "next": None, "prev": None}
+
+    first, last = _cursor_of(docs[0], sort_field), _cursor_of(docs[-1], sort_field)
+    if direction == 1:
+        next_cursor = last if has_more else None
+        prev_cursor = first if (after is not None) else None
+    else:
+        next_cursor = last
+        prev_cursor = first if has_more else None
+    return {
+        "rows": [book_row(d) for d in docs],
+        "next": next_cursor,
+        "prev": prev_cursor,
+    }
@@ -0,0 +1,291 @@
+# database/circulation.py
+"""
+Nghiệp vụ mượn / trả theo phiếu (loan_receipts + loans) trên MongoDB.
+
+Một lần lập phiếu chỉ tốn vài round trip cố định, không phụ thuộc số sách:
+    - kiểm tra phiếu mở
+    - đổi trạng thái sách có điều kiện (available -> on_loan) bằng một bulk_write,
+      không cần đọc trước để kiểm tra
+    - insert phiếu, insert_many các dòng loans
+Tất cả chạy trong một transaction (nếu server hỗ trợ) để không còn phiếu
+thiếu loans hoặc sách bị kẹt ở "Đang mượn" khi lỗi giữa chừng. Server
+standalone (không transaction): phiếu được insert SAU CÙNG và mọi bước đã làm
+được hoàn tác khi lỗi, nên không còn phiếu mở dở dang chặn độc giả.
+"""
+import datetime
+import re
+import uuid
+
+from pymongo import UpdateOne
+
+from database.borrower_stats import on_receipt_cancelled, on_receipt_closed, on_receipt_opened
+from database.cache import get_books, get_borrower, invalidate_queries
+from database.db import get_collection, run_in_transaction
+from database.rollups import forget_loans, record_loans, record_returns
+from database.sequences import next_id, reserve_ids
+from database.storage.base import (  # noqa: F401  (hằng số dùng chung mọi backend)
+    AVAILABLE_STATUSES,
+    MAX_BOOKS_PER_RECEIPT,
+    ON_LOAN_VALUES,
+    STATUS_AVAILABLE,
+    STATUS_ON_LOAN,
+    BooksUnavailable,
+    check_receipt_books,
+)
+
+
+# Điều kiện find() tương đương is_available(): so khớp sau strip().lower()
+# (regex không phân biệt hoa thường, cho phép khoảng trắng hai đầu)
+_AVAILABLE_RE = r"^\s*(" + "|".join(re.escape(v) for v in AVAILABLE_STATUSES if v) + r")?\s*$"
+AVAILABLE_FILTER = {
+    "$or": [
+        {"status": {"$regex": _AVAILABLE_RE, "$options": "i"}},
+        {"status": {"$exists": False}},
+    ]
+}
+# Trạng thái "đang mượn" so khớp cùng cách (dữ liệu cũ 'đang mượn ' vẫn trả được)
+_ON_LOAN_RE = r"^\s*(" + "|".join(re.escape(v) for v in ON_LOAN_VALUES) + r")\s*$"
+ON_LOAN_FILTER = {"status": {"$regex": _ON_LOAN_RE, "$options": "i"}}
+
+
+def transition_books(
+    book_ids: list[int],
+    from_filter: dict,
+    to_status: str,
+    session=None,
+) -> list[int]:
+    """
+    Đổi status của nhiều sách, mỗi sách là một update có điều kiện
+    {book_id, from_filter} (compare-and-set) gom trong 1 bulk_write, thay cho
+    đọc kiểm tra từng sách. Số lệnh cố định, không phụ thuộc số sách:
+    bulk_write + 1 lệnh xoá dấu status_op (thêm 1 lần đọc khi có sách thất bại).
+
+    Trả về danh sách book_id KHÔNG chuyển được (không tồn tại hoặc đang ở
+    trạng thái khác). Danh sách rỗng = tất cả thành công.
+    """
+    if not book_ids:
+        return []
+    books = get_collection("books")
+    op = uuid.uuid4().hex  # đánh dấu các sách do lần gọi này đổi
+    result = books.bulk_write(
+        [
+            UpdateOne(
+                {"book_id": b_id, **from_filter},
+                {"$set": {"status": to_status, "status_op": op}},
+            )
+            for b_id in book_ids
+        ],
+        ordered=False,
+        session=session,
+    )
+    failed = []
+    if result.matched_count != len(book_ids):
+        # Chỉ khi có sách thất bại mới cần đọc lại để biết chính xác sách nào
+        changed = {
+            int(d["book_id"])
+            for d in books.find(
+                {"book_id": {"$in": book_ids}, "status_op": op},
+                projection={"book_id": 1},
+                session=session,
+            )
+        }
+        failed = [b_id for b_id in book_ids if b_id not in changed]
+    if result.matched_count:
+        # Dấu chỉ dùng trong lần gọi này: xoá đi để document không giữ trường thừa
+        # (lọc theo book_id để dùng index unique, status_op không có index)
+        books.update_many(
+            {"book_id": {"$in": book_ids}, "status_op": op},
+            {"$unset": {"status_op": ""}},
+            session=session,
+        )
+    return failed
+
+
+def _undo_transition(book_ids: list[int], to_status: str, session=None):
+    """Trả lại trạng thái cho các sách đã đổi (chỉ dùng khi không có transaction)."""
+    if session is not None or not book_ids:
+        return
+    get_collection("books").update_many(
+        {"book_id": {"$in": book_ids}, "status": to_status},
+        {"$set": {"status": STATUS_AVAILABLE}},
+    )
+
+
+def checkout_books(book_ids: list[int], session=None):
+    """
+    available -> on_loan cho mọi sách, hoặc không sách nào.
+    Lỗi: BooksUnavailable kèm danh sách sách không mượn được.
+    """
+    failed = transition_books(book_ids, AVAILABLE_FILTER, STATUS_ON_LOAN, session=session)
+    if failed:
+        # Có transaction thì abort là đủ; không có thì phải tự hoàn tác phần đã đổi
+        _undo_transition([b for b in book_ids if b not in failed], STATUS_ON_LOAN, session)
+        ids = ", ".join(str(b) for b in failed)
+        raise BooksUnavailable(f"Sách ID {ids} không tồn tại hoặc hiện không có sẵn.", failed)
+
+
+def checkin_books(book_ids: list[int], session=None) -> list[int]:
+    """
+    on_loan -> available. Sách đã bị đổi sang trạng thái khác (Hỏng, Mất...)
+    được giữ nguyên và trả về trong danh sách kết quả.
+    """
+    return transition_books(book_ids, ON_LOAN_FILTER, STATUS_AVAILABLE, session=session)
+
+
+def has_open_receipt(borrower_id: int, session=None) -> bool:
+    """Người mượn còn phiếu chưa trả không (đếm theo loan_receipts)."""
+    receipts = get_collection("loan_receipts")
+    doc = receipts.find_one(
+        {"borrower_id": borrower_id, "return_date": None},
+        projection={"_id": 1},
+        session=session,
+    )
+    return doc is not None
+
+
+def _undo_receipt(receipt_id: int, loan_ids: list[int], loan_docs: list[dict], borrower_id: int, done: list[str]):
+    """Xoá phiếu / loans và trừ lại thống kê đã ghi (chỉ dùng khi không có transaction)."""
+    if "receipt" in done:
+        get_collection("loan_receipts").delete_one({"receipt_id": receipt_id})
+    if "counters" in done:
+        on_receipt_cancelled(borrower_id, len(loan_docs))
+    if "rollups" in done:
+        forget_loans(loan_docs)
+    if "loans" in done:
+        get_collection("loans").delete_many({"loan_id": {"$in": loan_ids}})
+
+
+def create_receipt(
+    borrower_id: int,
+    due_date: datetime.date | None,
+    book_ids: list[int],
+    employee_id: int | None = None,
+) -> int:
+    """
+    Tạo 1 phiếu (loan_receipts + loans) cho tối đa 5 sách.
+    Chỉ cho phép nếu KHÔNG còn phiếu mở. Trả về receipt_id.
+    """
+    book_ids = check_receipt_books(book_ids)
+
+    # Cấp ID ngoài transaction để các quầy không tranh chấp document counters
+    # (phiếu bị huỷ chỉ để lại khoảng trống ID, giống IDENTITY trong SQL)
+    receipt_id = next_id("loan_receipts")
+    loan_ids = reserve_ids("loans", len(book_ids))
+
+    borrow_dt = datetime.datetime.now()
+    due_dt = datetime.datetime.combine(due_date, datetime.time()) if due_date else None
+
+    def _txn(session):
+        books = get_collection("books")
+        loans = get_collection("loans")
+        receipts = get_collection("loan_receipts")
+
+        if has_open_receipt(borrower_id, session=session):
+            raise Exception("Độc giả đang có phiếu mượn chưa trả, không thể lập phiếu mới.")
+
+        # Giữ sách trước (compare-and-set), không cần đọc kiểm tra riêng
+        checkout_books(book_ids, session=session)
+
+        loan_docs: list[dict] = []
+        done: list[str] = []   # các bước đã ghi, để hoàn tác khi không có transaction
+        try:
+            # Tên / thể loại ghi kèm vào loans phục vụ thống kê (lấy từ cache)
+            found = get_books(book_ids)
+            borrower_name = (get_borrower(borrower_id) or {}).get("name", "")
+
+            loan_docs = [
+                {
+                    "loan_id": loan_id,
+                    "receipt_id": receipt_id,
+                    "borrower_id": borrower_id,
+                    "borrower_name": borrower_name,
+                    "book_id": b_id,
+                    "book_title": found.get(b_id, {}).get("title", ""),
+                    "book_category": found.get(b_id, {}).get("category", ""),
+                    "employee_id": employee_id,
+                    "borrow_date": borrow_dt,
+                    "return_date": None,
+                    "is_returned": False,
+                }
+                for loan_id, b_id in zip(loan_ids, book_ids)
+            ]
+            done.append("loans")
+            loans.insert_many(loan_docs, ordered=True, session=session)
+            record_loans(loan_docs, session=session)
+            done.append("rollups")
+            on_receipt_opened(borrower_id, len(loan_docs), session=session)
+            done.append("counters")
+
+            # Phiếu insert sau cùng: lỗi ở các bước trên không để lại phiếu mở
+            done.append("receipt")
+            receipts.insert_one(
+                {
+                    "receipt_id": receipt_id,
+                    "borrower_id": borrower_id,
+                    "borrow_date": borrow_dt,
+                    "due_date": due_dt,
+                    "return_date": None,
+                    "employee_id": employee_id,
+                    "note": None,
+                },
+                session=session,
+            )
+        except Exception:
+            # Không có transaction: tự hoàn tác những gì đã ghi rồi báo lỗi
+            if session is None:
+                _undo_receipt(receipt_id, loan_ids, loan_docs, borrower_id, done)
+            _undo_transition(book_ids, STATUS_ON_LOAN, session)
+            raise
+
+        return receipt_id
+
+    receipt_id = run_in_transaction(_txn)
+    invalidate_queries()  # thống kê đã đổi
+    return receipt_id
+
+
+def close_receipt(receipt_id: int) -> list[int]:
+    """
+    Trả toàn bộ sách trong một phiếu.
+    Trả về các book_id không được đưa về 'Có sẵn' vì không còn ở trạng thái mượn.
+    """
+    now = datetime.datetime.now()
+
+    def _txn(session):
+        loans = get_collection("loans")
+        receipts = get_collection("loan_receipts")
+
+        open_loans = list(
+            loans.find(
+                {"receipt_id": receipt_id, "return_date": None},
+                projection={"_id": 0, "book_id": 1, "book_category": 1, "borrower_id": 1, "borrower_name": 1},
+                session=session,
+            )
+        )
+        book_ids = [int(l["book_id"]) for l in open_loans]
+
+        # cập nhật loans
+        loans.update_many(
+            {"receipt_id": receipt_id, "return_date": None},
+            {"$set": {"return_date": now, "is_returned": True}},
+            session=session,
+        )
+
+        # cập nhật loan_receipts (chỉ khi phiếu còn mở -> bộ đếm không bị trừ 2 lần)
+        closed = receipts.find_one_and_update(
+            {"receipt_id": receipt_id, "return_date": None},
+            {"$set": {"return_date": now}},
+            projection={"_id": 0, "borrower_id": 1},
+            session=session,
+        )
+        if closed is not None:
+            on_receipt_closed(closed["borrower_id"], session=session)
+
+        record_returns([{**l, "return_date": now} for l in open_loans], session=session)
+
+        # đưa sách về 'Có sẵn' (chỉ những sách đang ở trạng thái mượn)
+        return checkin_books(book_ids, session=session)
+
+    skipped = run_in_transaction(_txn)
+    invalidate_queries()  # thống kê đã đổi
+    return skipped
@@ -0,0 +1,23 @@
+# database/config.py
+"""
+Đọc config.json (không import pymongo / pyodbc), dùng chung cho mọi backend
+lưu trữ. database.db import lại load_config từ đây nên code cũ không đổi.
+"""
+import json
+from pathlib import Path
+
+CONFIG_FILE = Path(__file__).parent / "config.json"
+
+_config_cache: dict | None = None
+
+
+def load_config(reload: bool = False):
+    """Đọc config.json một lần rồi giữ trong bộ nhớ (reload=True để đọc lại)."""
+    global _config_cache
+    if _config_cache is not None and not reload:
+        return _config_cache
+    if not CONFIG_FILE.exists():
+        raise FileNotFoundError(f"Config file not found: {CONFIG_FILE}")
+    with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+        _config_cache = json.load(f)
+    return _config_cache
@@ -8,6 +8,7 @@ USE ThuVienDB;
 GO
 
 -- 2. XÓA BẢNG (NẾU TỒN TẠI)
+IF OBJECT_ID('loan_outbox', 'U') IS NOT NULL DROP TABLE loan_outbox;
 IF OBJECT_ID('loans', 'U') IS NOT NULL DROP TABLE loans;
 IF OBJECT_ID('loan_receipts', 'U') IS NOT NULL DROP TABLE loan_receipts;
 IF OBJECT_ID('borrowers', 'U') IS NOT NULL DROP TABLE borrowers;
@@ -75,6 +76,19 @@ CREATE TABLE loans (
     FOREIGN KEY (book_id) REFERENCES books(book_id)  -- PHẢI CÓ
 );
 
+GO
+
+-- 7b. TẠO BẢNG loan_outbox (sự kiện mượn / trả chờ đồng bộ sang MongoDB)
+-- Ghi trong cùng transaction với loans; database/loan_outbox.py đọc theo event_id tăng dần
+CREATE TABLE loan_outbox (
+    event_id BIGINT IDENTITY(1,1) PRIMARY KEY,
+    event_type NVARCHAR(10) NOT NULL,        -- 'borrow' | 'return'
+    loan_id INT NOT NULL,
+    borrower_id INT,
+    book_id INT,
+    employee_id INT,
+    event_time DATETIME2 NOT NULL DEFAULT SYSUTCDATETIME()
+);
 
 -- 8. THÊM DỮ LIỆU MẪU--
 INSERT INTO employees (name, position, username, password, is_admin, work_date, schedule_days)
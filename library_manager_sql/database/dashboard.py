@@ -0,0 +1,107 @@
+# database/dashboard.py
+"""
+Các chỉ số tổng quan (KPI) cho màn hình Thống kê, mỗi collection chỉ một lệnh:
+
+    books          : 1 aggregate $facet   -> tổng số sách, có sẵn, đang mượn
+    loan_receipts  : 1 aggregate $match (index ix_open_due) + $facet
+                     -> phiếu đang mở, phiếu quá hạn, độc giả đang mượn
+    stats_daily_category : đọc dòng tổng hợp của hôm nay (database/rollups.py)
+                     -> lượt mượn / trả hôm nay
+Không đụng tới loans nên thời gian không tăng theo số lượt mượn đã có.
+Kết quả được nhớ trong query_cache (TTL + xoá khi có mượn / trả).
+
+Đo thời gian:
+    python -m database.dashboard
+"""
+import time
+from datetime import datetime
+
+from database.cache import memoize_query
+from database.circulation import AVAILABLE_FILTER, ON_LOAN_FILTER
+from database.db import get_collection
+from database.rollups import CATEGORY_ROLLUP, day_of
+
+
+def _count(facet: list) -> int:
+    return facet[0]["n"] if facet else 0
+
+
+def _book_kpis() -> dict:
+    doc = next(
+        get_collection("books").aggregate(
+            [
+                {"$match": {"book_id": {"$type": "number"}}},
+                {
+                    "$facet": {
+                        "total": [{"$count": "n"}],
+                        "available": [{"$match": AVAILABLE_FILTER}, {"$count": "n"}],
+                        "on_loan": [{"$match": ON_LOAN_FILTER}, {"$count": "n"}],
+                    }
+                },
+            ]
+        ),
+        {},
+    )
+    return {
+        "books_total": _count(doc.get("total")),
+        "books_available": _count(doc.get("available")),
+        "books_on_loan": _count(doc.get("on_loan")),
+    }
+
+
+def _receipt_kpis(now: datetime) -> dict:
+    doc = next(
+        get_collection("loan_receipts").aggregate(
+            [
+                # Chỉ phiếu đang mở (ít) đi vào $facet, lọc bằng index (return_date, due_date)
+                {"$match": {"return_date": None}},
+                {
+                    "$facet": {
+                        "open": [{"$count": "n"}],
+                        "overdue": [{"$match": {"due_date": {"$lt": now}}}, {"$count": "n"}],
+                        "borrowers": [{"$group": {"_id": "$borrower_id"}}, {"$count": "n"}],
+                    }
+                },
+            ]
+        ),
+        {},
+    )
+    return {
+        "receipts_open": _count(doc.get("open")),
+        "receipts_overdue": _count(doc.get("overdue")),
+        "active_borrowers": _count(doc.get("borrowers")),
+    }
+
+
+def _today_kpis(now: datetime) -> dict:
+    doc = next(
+        get_collection(CATEGORY_ROLLUP).aggregate(
+            [
+                {"$match": {"day": day_of(now)}},
+                {"$group": {"_id": None, "loans": {"$sum": "$loans"}, "returns": {"$sum": "$returns"}}},
+            ]
+        ),
+        {},
+    )
+    return {"loans_today": doc.get("loans", 0), "returns_today": doc.get("returns", 0)}
+
+
+@memoize_query("dashboard_kpis")
+def get_kpis() -> dict:
+    """Toàn bộ KPI trong một dict, kèm thời điểm tính (computed_at)."""
+    now = datetime.now()
+    return {
+        **_book_kpis(),
+        **_receipt_kpis(now),
+        **_today_kpis(now),
+        "computed_at": now,
+    }
+
+
+if __name__ == "__main__":
+    for label in ("lần đầu", "từ cache"):
+        t0 = time.perf_counter()
+        kpis = get_kpis()
+        print(f"{label:<9}: {(time.perf_counter() - t0) * 1000:7.1f} ms")
+    for key, value in kpis.items():
+        print(f"  {key:<18} {value}")
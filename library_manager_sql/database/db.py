@@ -1,59 +1,129 @@
 # database/db.py
-import json
-from pathlib import Path
+import atexit
+import threading
 import pymongo
 from datetime import datetime, timedelta, timezone
 
-CONFIG_FILE = Path(__file__).parent / "config.json"
+from database.config import CONFIG_FILE, load_config  # noqa: F401  (giữ đường import cũ)
+
+# Tham số mặc định cho pool kết nối (ghi đè bằng khối "mongo_pool" trong config.json)
+DEFAULT_POOL_OPTIONS = {
+    "max_pool_size": 20,
+    "min_pool_size": 1,
+    "max_idle_time_ms": 300_000,
+    "server_selection_timeout_ms": 5_000,
+    "connect_timeout_ms": 5_000,
+    "socket_timeout_ms": 30_000,
+    # Nén tốn CPU, chỉ có lợi khi server ở xa: bật bằng "compressors" trong mongo_pool
+    "compressors": [],
+}
+
+_clients: dict[str, pymongo.MongoClient] = {}
+_txn_support: dict[str, bool] = {}
+_lock = threading.Lock()
+
+
+def _client_options(cfg: dict) -> dict:
+    opts = {**DEFAULT_POOL_OPTIONS, **(cfg.get("mongo_pool") or {})}
+    compressors = opts.get("compressors") or []
+    if isinstance(compressors, str):
+        compressors = [c.strip() for c in compressors.split(",") if c.strip()]
+    kwargs = {
+        "maxPoolSize": int(opts["max_pool_size"]),
+        "minPoolSize": int(opts["min_pool_size"]),
+        "maxIdleTimeMS": int(opts["max_idle_time_ms"]),
+        "serverSelectionTimeoutMS": int(opts["server_selection_timeout_ms"]),
+        "connectTimeoutMS": int(opts["connect_timeout_ms"]),
+        "socketTimeoutMS": int(opts["socket_timeout_ms"]),
+    }
+    if compressors:
+        # zstd / snappy cần cài thêm zstandard / python-snappy (thiếu thì pymongo cảnh báo)
+        kwargs["compressors"] = ",".join(compressors)
+    return kwargs
 
-def load_config():
-    if not CONFIG_FILE.exists():
-        raise FileNotFoundError(f"Config file not found: {CONFIG_FILE}")
-    with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
 
 def get_client():
+    """Trả về MongoClient dùng chung cho cả tiến trình (một client cho mỗi URI)."""
     cfg = load_config()
-    return pymongo.MongoClient(cfg.get("mongo_uri", "mongodb://localhost:27017"))
+    uri = cfg.get("mongo_uri", "mongodb://localhost:27017")
+    client = _clients.get(uri)
+    if client is not None:
+        return client
+    with _lock:
+        client = _clients.get(uri)
+        if client is None:
+            client = pymongo.MongoClient(uri, **_client_options(cfg))
+            _clients[uri] = client
+    return client
+
 
 def get_db():
     cfg = load_config()
-    client = get_client()
     db_name = cfg.get("database")
     if not db_name:
         raise ValueError("Missing 'database' in config.json")
-    return client[db_name]
+    return get_client()[db_name]
+
 
 def get_collection(collection_name: str):
     db = get_db()
     return db[collection_name]
 
-# === THỐNG KÊ SIÊU NHANH ===
+
+def supports_transactions() -> bool:
+    """
+    Transaction nhiều document chỉ có trên replica set / sharded cluster.
+    Kết quả được nhớ theo URI (chỉ hỏi server 1 lần).
+    """
+    uri = load_config().get("mongo_uri", "mongodb://localhost:27017")
+    if uri not in _txn_support:
+        try:
+            hello = get_client().admin.command("hello")
+            _txn_support[uri] = bool(hello.get("setName")) or hello.get("msg") == "isdbgrid"
+        except Exception as e:
+            print("Error checking transaction support:", e)
+            return False
+    return _txn_support[uri]
+
+
+def run_in_transaction(callback):
+    """
+    Chạy callback(session) trong transaction nếu server hỗ trợ
+    (with_transaction tự thử lại khi gặp TransientTransactionError /
+    UnknownTransactionCommitResult). Server đơn lẻ: chạy thẳng với session=None.
+    """
+    if not supports_transactions():
+        return callback(None)
+    with get_client().start_session() as session:
+        return session.with_transaction(callback)
+
+
+def close_clients():
+    """Đóng mọi kết nối đang mở (gọi khi đăng xuất / thoát chương trình)."""
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+        _txn_support.clear()
+    for client in clients:
+        try:
+            client.close()
+        except Exception as e:
+            print("Error closing MongoClient:", e)
+
+
+atexit.register(close_clients)
+
+# === THỐNG KÊ (đọc từ bảng tổng hợp theo ngày, xem database/rollups.py) ===
 def get_top_category():
-    pipeline = [
-        {"$group": {"_id": "$book_category", "so_luot": {"$sum": 1}}},
-        {"$sort": {"so_luot": -1}},
-        {"$limit": 10}
-    ]
-    results = get_collection("loans").aggregate(pipeline)
-    return [(doc["_id"] or "Khác", doc["so_luot"]) for doc in results]
+    from database.rollups import top_categories
+    return top_categories(limit=10)
 
 def get_top_category_7days():
-    seven_days_ago = datetime.now(timezone.utc) - timedelta(days=7)
-    pipeline = [
-        {"$match": {"borrow_date": {"$gte": seven_days_ago}}},
-        {"$group": {"_id": "$book_category", "count": {"$sum": 1}}},
-        {"$sort": {"count": -1}},
-        {"$limit": 10}
-    ]
-    results = get_collection("loans").aggregate(pipeline)
-    return [(doc["_id"] or "Khác", doc["count"]) for doc in results]
+    from database.rollups import top_categories
+    return top_categories(start=datetime.now(timezone.utc) - timedelta(days=7), limit=10)
 
 def get_top_borrower():
-    pipeline = [
-        {"$group": {"_id": "$borrower_name", "so_luot": {"$sum": 1}}},
-        {"$sort": {"so_luot": -1}},
-        {"$limit": 20}
-    ]
-    results = get_collection("loans").aggregate(pipeline)
-    return [(doc["_id"], doc["so_luot"]) for doc in results]
\ No newline at end of file
+    # Theo bộ đếm total_loans trên borrowers (index ix_top_loans), không theo tên;
+    # top_borrowers được nhớ trong query_cache (memoize_query) như các thống kê khác
+    from database.borrower_stats import top_borrowers
+    return top_borrowers(limit=20)
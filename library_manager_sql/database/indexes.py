@@ -0,0 +1,139 @@
+# database/indexes.py
+"""
+Khai báo tập trung các index MongoDB mà ứng dụng cần.
+
+Chạy lúc khởi động (main.py) hoặc bằng tay:
+    python -m database.indexes          # tạo index còn thiếu
+    python -m database.indexes --check  # chỉ kiểm tra, không tạo
+"""
+import sys
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+from database.db import get_db
+
+
+def _only_strings(field: str) -> dict:
+    """Chỉ áp unique cho giá trị là chuỗi (bỏ qua phone/email = None)."""
+    return {field: {"$type": "string"}}
+
+
+def _only_numbers(field: str) -> dict:
+    """Chỉ áp unique cho document có trường số (loans từ SQL không có loan_id và ngược lại)."""
+    return {field: {"$type": "number"}}
+
+
+# { collection: [ (name, keys, options), ... ] }
+INDEXES = {
+    "books": [
+        ("uq_book_id", [("book_id", ASCENDING)], {"unique": True}),
+        ("ix_status", [("status", ASCENDING)], {}),
+        ("ix_title_page", [("title", ASCENDING), ("book_id", ASCENDING)], {}),
+        ("ix_search_prefixes", [("search_prefixes", ASCENDING)], {}),
+    ],
+    "borrowers": [
+        ("uq_borrower_id", [("borrower_id", ASCENDING)], {"unique": True}),
+        ("uq_phone", [("phone", ASCENDING)],
+         {"unique": True, "partialFilterExpression": _only_strings("phone")}),
+        ("uq_email", [("email", ASCENDING)],
+         {"unique": True, "partialFilterExpression": _only_strings("email")}),
+        # bộ đếm trên document (database/borrower_stats.py): xếp hạng + lọc "đang mượn"
+        ("ix_top_loans", [("total_loans", DESCENDING), ("borrower_id", ASCENDING)], {}),
+        ("ix_open_receipts", [("open_receipts", ASCENDING), ("borrower_id", ASCENDING)], {}),
+    ],
+    "loan_receipts": [
+        ("uq_receipt_id", [("receipt_id", ASCENDING)], {"unique": True}),
+        ("ix_borrower_open", [("borrower_id", ASCENDING), ("return_date", ASCENDING)], {}),
+        ("ix_borrower_history",
+         [("borrower_id", ASCENDING), ("borrow_date", DESCENDING), ("receipt_id", DESCENDING)], {}),
+        # phiếu đang mở / quá hạn cho bảng KPI (database/dashboard.py)
+        ("ix_open_due", [("return_date", ASCENDING), ("due_date", ASCENDING)], {}),
+    ],
+    "loans": [
+        ("uq_loan_id", [("loan_id", ASCENDING)],
+         {"unique": True, "partialFilterExpression": _only_numbers("loan_id")}),
+        # bản sao từ SQL Server (database/loan_outbox.py), upsert theo khoá này
+        ("uq_sql_loan_id", [("sql_loan_id", ASCENDING)],
+         {"unique": True, "partialFilterExpression": _only_numbers("sql_loan_id")}),
+        ("ix_receipt_lines", [("receipt_id", ASCENDING), ("loan_id", ASCENDING)], {}),
+        ("ix_book_open", [("book_id", ASCENDING), ("is_returned", ASCENDING)], {}),
+        ("ix_borrower", [("borrower_id", ASCENDING)], {}),
+        ("ix_borrow_date", [("borrow_date", ASCENDING)], {}),
+    ],
+    "employees": [
+        ("uq_employee_id", [("employee_id", ASCENDING)], {"unique": True}),
+        ("uq_username", [("username", ASCENDING)], {"unique": True}),
+        ("ix_login", [("username", ASCENDING), ("password", ASCENDING)], {}),
+    ],
+    "system_logs": [
+        ("ix_time", [("time", DESCENDING)], {}),
+    ],
+    # Bảng tổng hợp thống kê (database/rollups.py); unique để $inc upsert / $merge theo khoá
+    "stats_daily_category": [
+        ("uq_day_category", [("day", ASCENDING), ("category", ASCENDING)], {"unique": True}),
+    ],
+}
+
+
+def _same_keys(info: dict, keys: list) -> bool:
+    return [(k, int(v)) for k, v in info.get("key", [])] == [(k, int(v)) for k, v in keys]
+
+
+def ensure_indexes(create: bool = True) -> dict:
+    """
+    So sánh index hiện có với INDEXES rồi tạo các index còn thiếu (idempotent).
+
+    Trả về báo cáo:
+        {"created": [...], "missing": [...], "conflicts": [...], "errors": [...]}
+    Mỗi phần tử là chuỗi "collection.index_name".
+    """
+    db = get_db()
+    report = {"created": [], "missing": [], "conflicts": [], "errors": []}
+
+    for col_name, specs in INDEXES.items():
+        col = db[col_name]
+        existing = col.index_information()
+        for name, keys, options in specs:
+            label = f"{col_name}.{name}"
+            info = existing.get(name)
+            if info is not None:
+                if not _same_keys(info, keys):
+                    report["conflicts"].append(label)
+                continue
+            if any(_same_keys(i, keys) for i in existing.values()):
+                # Đã có index cùng khoá nhưng khác tên -> chấp nhận
+                continue
+
+            report["missing"].append(label)
+            if not create:
+                continue
+            try:
+                col.create_index(keys, name=name, **options)
+                report["created"].append(label)
+            except OperationFailure as e:
+                # Thường gặp: dữ liệu cũ bị trùng nên không tạo được unique index
+                report["errors"].append(f"{label}: {e}")
+    return report
+
+
+def print_report(report: dict):
+    for label in report["missing"]:
+        if label in report["created"]:
+            print(f"[index] Đã tạo: {label}")
+        else:
+            print(f"[index] THIẾU: {label}")
+    for label in report["conflicts"]:
+        print(f"[index] Sai khoá (cần kiểm tra): {label}")
+    for err in report["errors"]:
+        print(f"[index] Lỗi: {err}")
+    if not any(report.values()):
+        print("[index] Tất cả index đều đầy đủ.")
+
+
+if __name__ == "__main__":
+    check_only = "--check" in sys.argv[1:]
+    result = ensure_indexes(create=not check_only)
+    print_report(result)
+    if check_only and (result["missing"] or result["conflicts"]):
+        sys.exit(1)
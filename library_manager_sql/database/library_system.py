@@ -1,11 +1,16 @@
 # library_system.py
-import json, pyodbc, pymongo, bcrypt, uuid
-from datetime import datetime, timedelta, timezone
-from database.db import get_collection
+import pyodbc, bcrypt, uuid
+from datetime import datetime, timezone
+from database.audit import audit
+from database.cache import LRUCache, invalidate_queries
+from database.db import get_collection, load_config
+from database.borrower_stats import on_loan_recorded
+from database.loan_outbox import LOCAL_CLOCK, notify_mirror
+from database.rollups import record_loans
+from database.sql_pool import SQLConnectionPool
 
 # === CẤU HÌNH ===
-with open("config.json", "r", encoding="utf-8") as f:
-    cfg = json.load(f)
+cfg = load_config()
 
 # SQL Server
 def sql_conn():
@@ -13,24 +18,26 @@ def sql_conn():
     conn_str = f"DRIVER={c['driver']};SERVER={c['server']};DATABASE={c['database']};Trusted_Connection=yes;"
     return pyodbc.connect(conn_str)
 
+# Pool dùng chung: mỗi thread mượn 1 kết nối, các lệnh lồng nhau dùng lại kết nối đó
+sql_pool = SQLConnectionPool(sql_conn, **cfg.get("sql_pool", {}))
+
 def sql_execute(sql, params=None):
-    with sql_conn() as conn:
-        cursor = conn.cursor()
+    with sql_pool.unit_of_work() as cursor:
         cursor.execute(sql, params or ())
-        conn.commit()
         return cursor.rowcount
 
+def sql_transaction(callback):
+    """Chạy callback(cursor) trong MỘT transaction SQL: commit nếu xong, rollback nếu lỗi."""
+    with sql_pool.unit_of_work() as cursor:
+        return callback(cursor)
+
 def sql_fetch(sql, params=None):
-    with sql_conn() as conn:
+    with sql_pool.connection() as conn:
         cursor = conn.cursor()
         cursor.execute(sql, params or ())
         cols = [col[0] for col in cursor.description]
         return [dict(zip(cols, row)) for row in cursor.fetchall()]
 
-# MongoDB
-mongo = pymongo.MongoClient(cfg["mongo_uri"])[cfg["database"]]
-logs = mongo["system_logs"]
-
 # === BẢO MẬT ===
 def hash_pwd(p): return bcrypt.hashpw(p.encode(), bcrypt.gensalt())
 
@@ -49,6 +56,14 @@ def create_admin():
         )
 
 # === GHI LOG ===
+# action -> loại log (write concern riêng, xem database/audit.py)
+LOG_CLASS_OF = {
+    "login": "security",
+    "create_admin": "security",
+    "borrow_book": "circulation",
+    "return_book": "circulation",
+}
+
 def log_action(user, action, details=None):
     entry = {
         "time": datetime.now(timezone.utc),
@@ -57,69 +72,151 @@ def log_action(user, action, details=None):
         "id": str(uuid.uuid4())[:8],
         **(details or {})
     }
-    logs.insert_one(entry)
+    # Đưa vào hàng đợi, thread nền ghi system_logs theo lô (không chờ round trip)
+    audit(LOG_CLASS_OF.get(action, "general"), entry)
+
+# === CACHE BẢN GHI SQL (tên sách / thể loại / tên người mượn ít khi đổi) ===
+_sql_books = LRUCache("sql_books", maxsize=5000, ttl=600)
+_sql_borrowers = LRUCache("sql_borrowers", maxsize=5000, ttl=600)
+
+def _first(rows):
+    return rows[0] if rows else None
 
-# === GHI MƯỢN VÀO MONGODB ===
+def sql_book_info(book_id):
+    return _sql_books.get_or_load(
+        book_id, lambda: _first(sql_fetch("SELECT title, category FROM books WHERE book_id = ?", (book_id,)))
+    )
+
+def sql_borrower_info(borrower_id):
+    return _sql_borrowers.get_or_load(
+        borrower_id, lambda: _first(sql_fetch("SELECT name FROM borrowers WHERE borrower_id = ?", (borrower_id,)))
+    )
+
+# === GHI MƯỢN VÀO MONGODB (ghi trực tiếp, đồng bộ) ===
+# borrow_book / return_book dùng outbox (database/loan_outbox.py) thay cho hàm này
 def record_loan_to_mongo(borrower_id, book_id, emp_id):
-    borrower = sql_fetch("SELECT name FROM borrowers WHERE borrower_id = ?", (borrower_id,))[0]
-    book = sql_fetch("SELECT title, category FROM books WHERE book_id = ?", (book_id,))[0]
-    get_collection("loans").insert_one({
+    borrower = sql_borrower_info(borrower_id)
+    book = sql_book_info(book_id)
+    loan = {
         "borrower_id": borrower_id,
         "borrower_name": borrower["name"],
         "book_id": book_id,
         "book_title": book["title"],
         "book_category": book["category"],
         "employee_id": emp_id,
-        "borrow_date": datetime.now(timezone.utc),
-        "is_returned": False
-    })
+        "borrow_date": datetime.now(),   # giờ địa phương như circulation (xem database/rollups.py)
+        "is_returned": False,
+        **LOCAL_CLOCK
+    }
+    get_collection("loans").insert_one(loan)
+    record_loans([loan])
+    on_loan_recorded(borrower_id)
+    invalidate_queries()
 
 # === MƯỢN SÁCH ===
-def borrow_book(borrower_id, book_id, emp_id):
-    if not sql_fetch("SELECT 1 FROM employees WHERE employee_id = ?", (emp_id,)):
-        return False, "Nhân viên không tồn tại"
-    book = sql_fetch("SELECT status FROM books WHERE book_id = ?", (book_id,))
-    if not book or book[0]["status"] != "Có sẵn":
-        return False, "Sách không có sẵn"
-
-    sql_execute("INSERT INTO loans (borrower_id, book_id, employee_id) VALUES (?, ?, ?)",
-                (borrower_id, book_id, emp_id))
+# Một batch T-SQL có tham số = 1 round trip (+ commit của unit_of_work):
+# kiểm tra nhân viên, khoá + kiểm tra sách (UPDLOCK: hai quầy không mượn trùng
+# một cuốn), insert loans + outbox, rồi trả về mọi thứ log / bản sao cần.
+# SCOPE_IDENTITY thay cho OUTPUT inserted.loan_id: bảng loans có trigger.
+_BORROW_SQL = """
+SET NOCOUNT ON;
+DECLARE @borrower_id INT = ?, @book_id INT = ?, @emp_id INT = ?;
+DECLARE @result VARCHAR(20) = 'ok', @loan_id INT = NULL, @status NVARCHAR(50) = NULL,
+        @title NVARCHAR(300) = NULL, @category NVARCHAR(100) = NULL, @borrower_name NVARCHAR(200) = NULL;
+
+IF NOT EXISTS (SELECT 1 FROM employees WHERE employee_id = @emp_id)
+    SET @result = 'no_employee';
+ELSE
+BEGIN
+    SELECT @status = status, @title = title, @category = category
+    FROM books WITH (UPDLOCK, ROWLOCK) WHERE book_id = @book_id;
+
+    IF @status IS NULL OR @status <> N'Có sẵn'
+        SET @result = 'unavailable';
+    ELSE
+    BEGIN
+        INSERT INTO loans (borrower_id, book_id, employee_id) VALUES (@borrower_id, @book_id, @emp_id);
+        SET @loan_id = CAST(SCOPE_IDENTITY() AS INT);
+        -- Sự kiện cho bản sao MongoDB, commit cùng lượt mượn
+        INSERT INTO loan_outbox (event_type, loan_id, borrower_id, book_id, employee_id)
+        VALUES ('borrow', @loan_id, @borrower_id, @book_id, @emp_id);
+        SELECT @borrower_name = name FROM borrowers WHERE borrower_id = @borrower_id;
+    END
+END
+
+SELECT @result AS result, @loan_id AS loan_id, @title AS book_title,
+       @category AS book_category, @borrower_name AS borrower_name;
+"""
+
+_BORROW_ERRORS = {
+    "no_employee": "Nhân viên không tồn tại",
+    "unavailable": "Sách không có sẵn",
+}
 
-    record_loan_to_mongo(borrower_id, book_id, emp_id)
+def borrow_book(borrower_id, book_id, emp_id):
+    with sql_pool.unit_of_work() as cur:
+        cur.execute(_BORROW_SQL, (borrower_id, book_id, emp_id))
+        result, loan_id, title, category, borrower_name = cur.fetchone()
+    if result != "ok":
+        return False, _BORROW_ERRORS[result]
+    notify_mirror()  # thread nền gửi sang MongoDB, không chờ ở đây
 
-    book_info = sql_fetch("SELECT title, category FROM books WHERE book_id = ?", (book_id,))[0]
     log_action("employee", "borrow_book", {
+        "loan_id": loan_id,
         "borrower_id": borrower_id,
+        "borrower_name": borrower_name,
         "book_id": book_id,
-        "book_title": book_info["title"],
-        "category": book_info["category"]
+        "book_title": title,
+        "category": category
     })
     return True, "Mượn thành công"
 
 # === TRẢ SÁCH ===
-def return_book(loan_id):
-    loan = sql_fetch("SELECT * FROM loans WHERE loan_id = ?", (loan_id,))
-    if not loan or loan[0]["is_returned"]:
-        return False, "Phiếu không tồn tại hoặc đã trả"
+# Cập nhật có điều kiện + outbox trong một batch; OUTPUT ... INTO (được phép
+# khi bảng có trigger) mang borrower / book sang outbox và kết quả trả về.
+_RETURN_SQL = """
+SET NOCOUNT ON;
+DECLARE @loan_id INT = ?;
+DECLARE @done TABLE (loan_id INT, borrower_id INT, book_id INT, employee_id INT);
 
-    sql_execute("UPDATE loans SET is_returned = 1 WHERE loan_id = ?", (loan_id,))
+UPDATE loans SET is_returned = 1
+OUTPUT inserted.loan_id, inserted.borrower_id, inserted.book_id, inserted.employee_id INTO @done
+WHERE loan_id = @loan_id AND is_returned = 0;
 
-    get_collection("loans").update_one(
-        {"book_id": loan[0]["book_id"], "is_returned": False},
-        {"$set": {"is_returned": True, "return_date": datetime.now(timezone.utc)}}
-    )
+INSERT INTO loan_outbox (event_type, loan_id, borrower_id, book_id, employee_id)
+SELECT 'return', loan_id, borrower_id, book_id, employee_id FROM @done;
+
+SELECT d.borrower_id, d.book_id, bk.title AS book_title
+FROM @done d LEFT JOIN books bk ON bk.book_id = d.book_id;
+"""
 
-    log_action("employee", "return_book", {"loan_id": loan_id})
+def return_book(loan_id):
+    with sql_pool.unit_of_work() as cur:
+        cur.execute(_RETURN_SQL, (loan_id,))
+        row = cur.fetchone()
+    if row is None:
+        return False, "Phiếu không tồn tại hoặc đã trả"
+    borrower_id, book_id, title = row
+    notify_mirror()
+
+    log_action("employee", "return_book", {
+        "loan_id": loan_id,
+        "borrower_id": borrower_id,
+        "book_id": book_id,
+        "book_title": title
+    })
     return True, "Trả sách thành công"
 
 # === DỌN DẸP ===
 def clear_test_data():
-    sql_execute("DELETE FROM loans")
-    sql_execute("DELETE FROM borrowers")
-    sql_execute("DELETE FROM books")
-    sql_execute("DELETE FROM employees WHERE username != 'admin'")
-    sql_execute("DBCC CHECKIDENT ('books', RESEED, 0)")
-    sql_execute("DBCC CHECKIDENT ('borrowers', RESEED, 0)")
+    with sql_pool.unit_of_work():  # 1 kết nối, 1 transaction cho cả loạt lệnh
+        sql_execute("DELETE FROM loan_outbox")
+        sql_execute("DELETE FROM loans")
+        sql_execute("DELETE FROM borrowers")
+        sql_execute("DELETE FROM books")
+        sql_execute("DELETE FROM employees WHERE username != 'admin'")
+        sql_execute("DBCC CHECKIDENT ('books', RESEED, 0)")
+        sql_execute("DBCC CHECKIDENT ('borrowers', RESEED, 0)")
     print("Dọn dẹp dữ liệu test thành công!")
 
 if __name__ == "__main__":
@@ -0,0 +1,310 @@
+# database/loan_outbox.py
+"""
+Đồng bộ lượt mượn / trả từ SQL Server sang MongoDB (bản sao phục vụ thống kê)
+theo mô hình outbox:
+
+    borrow_book / return_book  --(cùng transaction SQL)-->  bảng loan_outbox
+    thread nền                 --(theo lô, event_id tăng dần)-->  MongoDB loans
+
+- Sự kiện mượn được upsert vào loans theo sql_loan_id (loan_id bên SQL Server;
+  loan_id trong MongoDB là dãy số riêng của phiếu mượn, xem database/sequences.py)
+  nên gửi lại bao nhiêu lần cũng không tạo bản trùng. Sự kiện trả chỉ cập nhật
+  loan đã có (theo sql_loan_id, hoặc loan cũ chưa có sql_loan_id cùng độc giả +
+  sách còn đang mượn), không tạo loan mới.
+- Mốc đã gửi (high-water mark = event_id lớn nhất đã ghi) lưu trong collection
+  sync_state, cập nhật trong CÙNG transaction MongoDB với lô sự kiện. Server
+  không hỗ trợ transaction thì thứ tự là: loans (ghi lại không sao) -> mốc ->
+  bộ đếm $inc. Tắt giữa chừng chỉ có thể THIẾU thống kê của lô đó, không cộng
+  trùng: chạy lại python -m database.rollups --backfill và borrower_stats --repair.
+- event_id (IDENTITY) được cấp lúc insert, không phải lúc commit: đọc outbox
+  với READCOMMITTEDLOCK để sự kiện chưa commit có event_id nhỏ hơn chặn lần đọc
+  (kể cả khi database bật READ_COMMITTED_SNAPSHOT), không bị mốc vượt qua và
+  bỏ sót mãi mãi.
+- Thao tác mượn / trả không còn chờ ghi MongoDB. Khi khởi động chương trình
+  (start_mirror_if_available) các sự kiện còn tồn được gửi ngay.
+- event_time là giờ UTC (SYSUTCDATETIME); borrow_date / return_date ghi vào
+  loans được đổi sang giờ địa phương như các loans khác (database/rollups.py)
+  và đánh dấu clock = "local". Loans do bản cũ chép sang (record_loan_to_mongo
+  ghi giờ UTC, không có receipt_id / clock) được đổi sang giờ địa phương một
+  lần bằng localize_legacy_loans (khi khởi động MongoDB và khi thread gửi bắt
+  đầu), sau đó bảng tổng hợp được dựng lại theo mốc ngày mới.
+
+Dòng lệnh:
+    python -m database.loan_outbox --status     # mốc đã gửi, số sự kiện chờ, độ trễ
+    python -m database.loan_outbox --once       # gửi hết các sự kiện đang chờ rồi thoát
+    python -m database.loan_outbox --prune 7    # xoá sự kiện đã gửi cũ hơn 7 ngày
+"""
+import sys
+import threading
+from datetime import datetime, timezone
+
+from pymongo import UpdateOne
+
+from database.borrower_stats import on_loan_recorded
+from database.cache import invalidate_queries
+from database.config import load_config
+from database.db import get_collection, run_in_transaction
+from database.rollups import local_time, record_loans, record_returns
+
+BATCH_SIZE = 500
+POLL_SECONDS = 2.0
+STATE_ID = "loan_outbox"
+LOCAL_CLOCK = {"clock": "local"}   # loans không qua phiếu đã ghi theo giờ địa phương
+
+_FETCH_SQL = f"""
+SELECT TOP ({BATCH_SIZE})
+    o.event_id, o.event_type, o.loan_id, o.borrower_id, o.book_id, o.employee_id, o.event_time,
+    bk.title AS book_title, bk.category AS book_category, br.name AS borrower_name
+FROM loan_outbox o WITH (READCOMMITTEDLOCK)  -- chờ sự kiện chưa commit, không đọc snapshot
+LEFT JOIN books bk ON bk.book_id = o.book_id
+LEFT JOIN borrowers br ON br.borrower_id = o.borrower_id
+WHERE o.event_id > ?
+ORDER BY o.event_id
+"""
+
+
+def _sql():
+    # import muộn: library_system cần pyodbc + cấu hình SQL Server
+    from database import library_system
+    return library_system
+
+
+def high_water_mark(session=None) -> int:
+    doc = get_collection("sync_state").find_one({"_id": STATE_ID}, session=session)
+    return int(doc["last_event_id"]) if doc else 0
+
+
+def _event_time(ev: dict) -> datetime:
+    """event_time (UTC, không tz) -> giờ địa phương, đồng hồ chung của loans."""
+    return local_time(ev["event_time"].replace(tzinfo=timezone.utc))
+
+
+def _loan_fields(ev: dict) -> dict:
+    return {
+        "sql_loan_id": ev["loan_id"],
+        "borrower_id": ev["borrower_id"],
+        "borrower_name": ev["borrower_name"] or "",
+        "book_id": ev["book_id"],
+        "book_title": ev["book_title"] or "",
+        "book_category": ev["book_category"] or "",
+        "employee_id": ev["employee_id"],
+    }
+
+
+def _ship(events: list[dict]):
+    """Ghi một lô sự kiện + mốc mới vào MongoDB (trong transaction nếu có)."""
+
+    def _txn(session):
+        # Lô trước có thể đã được luồng khác gửi xong: bỏ các sự kiện <= mốc
+        mark = high_water_mark(session)
+        todo = [ev for ev in events if ev["event_id"] > mark]
+        if not todo:
+            return 0
+
+        ops, borrowed, returned = [], [], []
+        for ev in todo:
+            fields = _loan_fields(ev)
+            at = _event_time(ev)
+            if ev["event_type"] == "borrow":
+                ops.append(UpdateOne(
+                    {"sql_loan_id": ev["loan_id"]},
+                    {"$setOnInsert": {**fields, **LOCAL_CLOCK, "borrow_date": at, "is_returned": False}},
+                    upsert=True,
+                ))
+                borrowed.append({**fields, "borrow_date": at})
+            else:
+                # Không upsert: loan mượn trước khi có outbox (chưa có sql_loan_id)
+                # được nhận theo độc giả + sách còn đang mượn và gắn sql_loan_id
+                ops.append(UpdateOne(
+                    {"$or": [
+                        {"sql_loan_id": ev["loan_id"]},
+                        {
+                            "sql_loan_id": {"$exists": False},
+                            "borrower_id": ev["borrower_id"],
+                            "book_id": ev["book_id"],
+                            "is_returned": {"$ne": True},
+                        },
+                    ]},
+                    {"$set": {"sql_loan_id": ev["loan_id"], "is_returned": True, "return_date": at}},
+                ))
+                returned.append({**fields, "return_date": at})
+
+        get_collection("loans").bulk_write(ops, ordered=True, session=session)
+
+        # Mốc được ghi TRƯỚC bộ đếm: không có transaction mà tắt giữa chừng thì
+        # lô này không bị gửi lại nên $inc không bị cộng hai lần
+        last = todo[-1]
+        get_collection("sync_state").update_one(
+            {"_id": STATE_ID},
+            {"$set": {
+                "last_event_id": last["event_id"],
+                "last_event_time": last["event_time"],
+                "updated_at": datetime.now(timezone.utc),
+            }},
+            upsert=True,
+            session=session,
+        )
+
+        record_loans(borrowed, session=session)
+        record_returns(returned, session=session)
+        for loan in borrowed:
+            on_loan_recorded(loan["borrower_id"], session=session)
+        return len(todo)
+
+    shipped = run_in_transaction(_txn)
+    if shipped:
+        invalidate_queries()
+    return shipped
+
+
+def localize_legacy_loans(batch_size: int = 1000) -> int:
+    """
+    Đổi borrow_date / return_date (UTC) của loans do bản cũ chép từ SQL Server
+    sang giờ địa phương, gắn clock = "local" (chạy lại không đổi lần hai).
+    return_date đã có sql_loan_id là do outbox ghi (giờ địa phương), giữ nguyên.
+    Có dòng được đổi thì dựng lại bảng tổng hợp. Trả về số loans đã đổi.
+    """
+    from database.rollups import backfill
+
+    loans = get_collection("loans")
+    cond = {"receipt_id": {"$exists": False}, "clock": {"$exists": False}}
+    ops, total = [], 0
+    for doc in loans.find(cond, projection={"borrow_date": 1, "return_date": 1, "sql_loan_id": 1}):
+        fields = dict(LOCAL_CLOCK)
+        if isinstance(doc.get("borrow_date"), datetime):
+            fields["borrow_date"] = local_time(doc["borrow_date"].replace(tzinfo=timezone.utc))
+        if isinstance(doc.get("return_date"), datetime) and "sql_loan_id" not in doc:
+            fields["return_date"] = local_time(doc["return_date"].replace(tzinfo=timezone.utc))
+        ops.append(UpdateOne({"_id": doc["_id"], **cond}, {"$set": fields}))
+        if len(ops) >= batch_size:
+            total += loans.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        total += loans.bulk_write(ops, ordered=False).modified_count
+    if total:
+        backfill()   # mốc ngày của các loans này đã đổi
+    return total
+
+
+def ship_pending(max_batches: int | None = None) -> int:
+    """Gửi các sự kiện sau mốc hiện tại, theo lô BATCH_SIZE. Trả về số sự kiện đã gửi."""
+    total, batches = 0, 0
+    while max_batches is None or batches < max_batches:
+        events = _sql().sql_fetch(_FETCH_SQL, (high_water_mark(),))
+        if not events:
+            break
+        total += _ship(events)
+        batches += 1
+        if len(events) < BATCH_SIZE:
+            break
+    return total
+
+
+def status() -> dict:
+    """Mốc đã gửi, số sự kiện còn chờ và độ trễ (giây) của sự kiện cũ nhất chưa gửi."""
+    mark = high_water_mark()
+    row = _sql().sql_fetch(
+        "SELECT COUNT(*) AS pending, MIN(event_time) AS oldest, MAX(event_id) AS max_id "
+        "FROM loan_outbox WHERE event_id > ?",
+        (mark,),
+    )[0]
+    oldest = row["oldest"]
+    return {
+        "high_water_mark": mark,
+        "max_event_id": row["max_id"] or mark,
+        "pending": row["pending"],
+        # event_time là giờ UTC không tz (SYSUTCDATETIME)
+        "lag_seconds": (datetime.now(timezone.utc) - oldest.replace(tzinfo=timezone.utc)).total_seconds()
+        if oldest else 0.0,
+    }
+
+
+def prune(keep_days: int = 7) -> int:
+    """Xoá sự kiện ĐÃ gửi (event_id <= mốc) cũ hơn keep_days ngày."""
+    return _sql().sql_execute(
+        "DELETE FROM loan_outbox WHERE event_id <= ? AND event_time < DATEADD(day, ?, SYSUTCDATETIME())",
+        (high_water_mark(), -int(keep_days)),
+    )
+
+
+# === THREAD NỀN ===
+class LoanMirror:
+    """Thread nền gửi outbox định kỳ; wake() để gửi ngay sau một lần mượn / trả."""
+
+    def __init__(self, poll_seconds: float = POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self.last_error: Exception | None = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="loan-mirror", daemon=True)
+        self._thread.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        try:
+            localize_legacy_loans()   # trước lượt trả đầu tiên chạm tới loans cũ
+        except Exception as e:
+            print("Loan mirror error:", e)
+        while not self._stop.is_set():
+            try:
+                ship_pending()
+                self.last_error = None
+            except Exception as e:
+                # SQL Server / MongoDB tạm lỗi: sự kiện vẫn nằm trong outbox, thử lại vòng sau
+                self.last_error = e
+                print("Loan mirror error:", e)
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+
+
+_mirror: LoanMirror | None = None
+_mirror_lock = threading.Lock()
+
+
+def start_mirror() -> LoanMirror:
+    global _mirror
+    with _mirror_lock:
+        if _mirror is None:
+            _mirror = LoanMirror()
+        return _mirror
+
+
+def start_mirror_if_available() -> LoanMirror | None:
+    """
+    Gọi khi khởi động chương trình: sự kiện còn tồn (lần trước tắt trước khi gửi
+    xong) được gửi ngay thay vì chờ lần mượn / trả kế tiếp. Không có SQL Server
+    (thiếu cấu hình / pyodbc, không kết nối được) thì bỏ qua.
+    """
+    if "sql_server" not in load_config():
+        return None
+    try:
+        _sql().sql_fetch("SELECT 1 AS ok")
+    except Exception as e:
+        print("Loan mirror not started:", e)
+        return None
+    return start_mirror()   # vòng đầu của thread gửi hết phần còn tồn
+
+
+def notify_mirror():
+    """Gọi sau khi commit một sự kiện mượn / trả."""
+    start_mirror().wake()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if "--once" in args:
+        print(f"Đã gửi {ship_pending()} sự kiện.")
+    elif "--prune" in args:
+        i = args.index("--prune")
+        days = int(args[i + 1]) if len(args) > i + 1 else 7
+        print(f"Đã xoá {prune(days)} sự kiện đã gửi.")
+    else:
+        for key, value in status().items():
+            print(f"{key:<16} {value}")
@@ -0,0 +1,305 @@
+# database/rollups.py
+"""
+Bảng tổng hợp theo ngày cho thống kê mượn sách, cập nhật dần bằng $inc.
+
+    stats_daily_category : {day, category, loans, returns}
+
+Mỗi lần mượn / trả (circulation.create_receipt, close_receipt, loan_outbox)
+cộng thêm vào đúng dòng (ngày, thể loại) trong cùng transaction với loans.
+Xếp hạng độc giả đọc bộ đếm trên borrowers (database/borrower_stats.py), không
+cần bảng theo ngày; backfill xoá collection cũ stats_daily_borrower nếu còn.
+Thống kê chỉ đọc các dòng trong khoảng ngày cần xem, không $group cả loans.
+
+Mốc ngày theo giờ địa phương: loans lưu borrow_date / return_date là giờ
+địa phương không kèm tz (như circulation ghi bằng datetime.now()); thời điểm
+có tz (UTC) được đổi về giờ địa phương trước khi lấy ngày (local_time).
+
+Xoá sách / độc giả kèm loans thì trừ lại bằng forget_loans. Khi khởi động,
+bảng tổng hợp còn trống thì tự dựng lại (backfill_if_empty).
+Dựng lại từ loans (dữ liệu cũ, sau khi seed, hoặc khi nghi lệch số):
+    python -m database.rollups --backfill
+"""
+import sys
+from datetime import datetime, timedelta
+
+from pymongo import UpdateOne
+
+from database.cache import invalidate_queries, memoize_query
+from database.db import get_collection, get_db
+
+CATEGORY_ROLLUP = "stats_daily_category"
+LEGACY_ROLLUPS = ("stats_daily_borrower",)   # không còn cập nhật / đọc
+OTHER_CATEGORY = "Khác"
+
+
+def local_time(dt: datetime) -> datetime:
+    """Giờ địa phương không tz (đồng hồ chung của loans và bảng tổng hợp)."""
+    if dt.tzinfo is not None:
+        dt = dt.astimezone().replace(tzinfo=None)
+    return dt
+
+
+def day_of(dt: datetime) -> datetime:
+    """Mốc 00:00 của ngày theo giờ địa phương."""
+    dt = local_time(dt)
+    return datetime(dt.year, dt.month, dt.day)
+
+
+def _category(value) -> str:
+    return value or OTHER_CATEGORY
+
+
+def _apply(counters: dict, field: str, session=None, sign: int = 1):
+    """
+    counters: {(collection, key_tuple): (filter, extra_set, n)} -> bulk $inc upsert.
+    sign=-1: trừ lại (không upsert, không tạo dòng âm mới).
+    """
+    by_collection: dict[str, list] = {}
+    for (coll, _), (flt, extra, n) in counters.items():
+        update = {"$inc": {field: sign * n}}
+        if extra and sign > 0:
+            update["$set"] = extra
+        by_collection.setdefault(coll, []).append(UpdateOne(flt, update, upsert=sign > 0))
+    for coll, ops in by_collection.items():
+        get_collection(coll).bulk_write(ops, ordered=False, session=session)
+
+
+def _collect(items, day_field: str) -> dict:
+    """items: các dict loan (cần day_field, book_category)."""
+    counters: dict = {}
+    for loan in items:
+        if not isinstance(loan.get(day_field), datetime):
+            continue
+        day = day_of(loan[day_field])
+        cat = _category(loan.get("book_category"))
+        key = (CATEGORY_ROLLUP, (day, cat))
+        flt, extra, n = counters.get(key, ({"day": day, "category": cat}, None, 0))
+        counters[key] = (flt, extra, n + 1)
+    return counters
+
+
+def record_loans(loans: list[dict], session=None):
+    """
+    Cộng lượt mượn theo ngày borrow_date. Gọi sau khi insert loans; người gọi
+    invalidate_queries() SAU khi commit để cache không giữ số liệu trước commit.
+    """
+    if loans:
+        _apply(_collect(loans, "borrow_date"), "loans", session=session)
+
+
+def record_returns(loans: list[dict], session=None):
+    """Cộng lượt trả theo ngày return_date. Gọi sau khi cập nhật loans đã trả."""
+    if loans:
+        _apply(_collect(loans, "return_date"), "returns", session=session)
+
+
+def forget_loans(loans: list[dict], session=None):
+    """
+    Trừ lại lượt mượn / trả của các loans sắp bị xoá (xoá sách, xoá độc giả).
+    loans cần borrow_date, return_date, book_category.
+    """
+    if loans:
+        _apply(_collect(loans, "borrow_date"), "loans", session=session, sign=-1)
+        _apply(_collect(loans, "return_date"), "returns", session=session, sign=-1)
+
+
+# === TRUY VẤN THỐNG KÊ ===
+def _day_range(start: datetime | None, end: datetime | None) -> dict:
+    cond = {}
+    if start is not None:
+        cond["$gte"] = start
+    if end is not None:
+        cond["$lt"] = end + timedelta(days=1)   # end tính cả ngày cuối
+    return {"day": cond} if cond else {}
+
+
+def _days(start, end) -> tuple:
+    """Chuẩn hoá về 00:00 để key cache giống nhau trong cùng một ngày."""
+    return (
+        day_of(start) if start is not None else None,
+        day_of(end) if end is not None else None,
+    )
+
+
+def top_categories(start=None, end=None, limit: int = 10) -> list[tuple]:
+    """[(thể loại, số lượt mượn), ...] trong khoảng ngày [start, end]."""
+    return _top_categories(*_days(start, end), limit)
+
+
+@memoize_query("top_categories")
+def _top_categories(start, end, limit) -> list[tuple]:
+    pipeline = [
+        {"$match": _day_range(start, end)},
+        {"$group": {"_id": "$category", "so_luot": {"$sum": "$loans"}}},
+        {"$match": {"so_luot": {"$gt": 0}}},
+        {"$sort": {"so_luot": -1, "_id": 1}},
+        {"$limit": limit},
+    ]
+    return [
+        (doc["_id"] or OTHER_CATEGORY, doc["so_luot"])
+        for doc in get_collection(CATEGORY_ROLLUP).aggregate(pipeline)
+    ]
+
+
+# === XU HƯỚNG THEO THỜI GIAN ===
+TREND_UNITS = ("day", "week", "month")
+MAX_TREND_POINTS = 400          # quá số điểm này thì tự gộp lên đơn vị lớn hơn
+TREND_TOP_CATEGORIES = 6        # số thể loại vẽ riêng, còn lại gộp một đường
+TOTAL_SERIES = "Tổng lượt mượn"
+REST_SERIES = "Thể loại khác"
+
+
+def bucket_of(day: datetime, unit: str) -> datetime:
+    """Đầu kỳ chứa ngày day, giống $dateTrunc (tuần bắt đầu từ thứ Hai)."""
+    day = day_of(day)
+    if unit == "week":
+        return day - timedelta(days=day.weekday())
+    if unit == "month":
+        return day.replace(day=1)
+    return day
+
+
+def bucket_starts(start: datetime, end: datetime, unit: str) -> list[datetime]:
+    """Mọi đầu kỳ từ start tới end (kể cả kỳ trống) để trục thời gian liên tục."""
+    result, cur = [], bucket_of(start, unit)
+    while cur <= end:
+        result.append(cur)
+        if unit == "day":
+            cur += timedelta(days=1)
+        elif unit == "week":
+            cur += timedelta(days=7)
+        else:
+            cur = cur.replace(year=cur.year + cur.month // 12, month=cur.month % 12 + 1)
+    return result
+
+
+def fit_unit(start: datetime, end: datetime, unit: str) -> str:
+    """Đơn vị nhỏ nhất (>= unit) mà số điểm không vượt MAX_TREND_POINTS."""
+    for u in TREND_UNITS[TREND_UNITS.index(unit):]:
+        if len(bucket_starts(start, end, u)) <= MAX_TREND_POINTS:
+            return u
+    return TREND_UNITS[-1]
+
+
+def loan_trend(start, end, unit: str = "day", by_category: bool = False) -> dict:
+    """
+    Lượt mượn theo ngày / tuần / tháng trong [start, end], đọc từ stats_daily_category:
+        {"unit": ..., "buckets": [datetime, ...], "series": {tên: [số lượt, ...]}}
+    by_category=True: mỗi thể loại top một đường, phần còn lại gộp REST_SERIES.
+    Số điểm tỉ lệ với độ dài khoảng ngày / unit, không phụ thuộc tổng số loans.
+    """
+    if unit not in TREND_UNITS:
+        raise ValueError(f"Không hỗ trợ đơn vị {unit}")
+    start, end = _days(start, end)
+    if start > end:
+        raise ValueError("Ngày bắt đầu phải trước ngày kết thúc")
+    return _loan_trend(start, end, fit_unit(start, end, unit), bool(by_category))
+
+
+@memoize_query("loan_trend")
+def _loan_trend(start, end, unit, by_category) -> dict:
+    trunc = {"date": "$day", "unit": unit}
+    if unit == "week":
+        trunc["startOfWeek"] = "monday"
+    group_id = {"bucket": {"$dateTrunc": trunc}}
+    if by_category:
+        group_id["category"] = "$category"
+    pipeline = [
+        {"$match": _day_range(start, end)},   # dùng index (day, category)
+        {"$group": {"_id": group_id, "n": {"$sum": "$loans"}}},
+    ]
+    buckets = bucket_starts(start, end, unit)
+    index = {b: i for i, b in enumerate(buckets)}
+    counts: dict[str, list[int]] = {}
+    for doc in get_collection(CATEGORY_ROLLUP).aggregate(pipeline):
+        i = index.get(doc["_id"]["bucket"].replace(tzinfo=None))
+        if i is None:
+            continue
+        name = (doc["_id"].get("category") or OTHER_CATEGORY) if by_category else TOTAL_SERIES
+        counts.setdefault(name, [0] * len(buckets))[i] += doc["n"]
+
+    if not by_category:
+        return {"unit": unit, "buckets": buckets, "series": {TOTAL_SERIES: counts.get(TOTAL_SERIES, [0] * len(buckets))}}
+
+    ranked = sorted(counts, key=lambda c: (-sum(counts[c]), c))
+    series = {c: counts[c] for c in ranked[:TREND_TOP_CATEGORIES]}
+    if len(ranked) > TREND_TOP_CATEGORIES:
+        series[REST_SERIES] = [sum(v) for v in zip(*(counts[c] for c in ranked[TREND_TOP_CATEGORIES:]))]
+    return {"unit": unit, "buckets": buckets, "series": series}
+
+
+# === DỰNG LẠI TỪ LOANS ===
+def _day_expr(field: str) -> dict:
+    return {
+        "$dateFromParts": {
+            "year": {"$year": f"${field}"},
+            "month": {"$month": f"${field}"},
+            "day": {"$dayOfMonth": f"${field}"},
+        }
+    }
+
+
+def _backfill_pipeline(date_field: str, counter: str, group_key: dict, into: str, on: list) -> list:
+    group = {"_id": {"day": _day_expr(date_field), **group_key}, counter: {"$sum": 1}}
+    project = {"_id": 0, "day": "$_id.day", counter: 1}
+    for name in group_key:
+        project[name] = f"$_id.{name}"
+    return [
+        {"$match": {date_field: {"$type": "date"}}},
+        {"$group": group},
+        {"$project": project},
+        {"$merge": {"into": into, "on": on, "whenMatched": "merge", "whenNotMatched": "insert"}},
+    ]
+
+
+def backfill() -> dict:
+    """
+    Tính lại toàn bộ bảng tổng hợp từ loans (chạy trên server bằng $merge) vào
+    một collection tạm rồi rename đè lên bảng thật: bảng thật không lúc nào
+    trống / dở dang, không xoá trước rồi mới ghi. $inc của lượt mượn chen vào
+    giữa lúc dựng vẫn có thể lệch: chạy lại --backfill khi không có mượn / trả.
+    """
+    from database.indexes import INDEXES, ensure_indexes
+
+    ensure_indexes()
+    loans = get_collection("loans")
+    tmp = get_collection(CATEGORY_ROLLUP + "_rebuild")
+    tmp.drop()
+    # $merge theo (day, category) cần unique index trên collection đích;
+    # index đi theo collection khi rename
+    for name, keys, options in INDEXES[CATEGORY_ROLLUP]:
+        tmp.create_index(keys, name=name, **options)
+    # None và "" đều gộp vào "Khác" như khi cập nhật dần (_category)
+    category_key = {
+        "category": {
+            "$cond": [{"$eq": [{"$ifNull": ["$book_category", ""]}, ""]}, OTHER_CATEGORY, "$book_category"]
+        }
+    }
+
+    for date_field, counter in (("borrow_date", "loans"), ("return_date", "returns")):
+        loans.aggregate(
+            _backfill_pipeline(date_field, counter, category_key, tmp.name, ["day", "category"])
+        )
+    # Một lệnh renameCollection (dropTarget) thay bảng cũ
+    tmp.rename(CATEGORY_ROLLUP, dropTarget=True)
+    for name in LEGACY_ROLLUPS:
+        get_db().drop_collection(name)
+    result = {CATEGORY_ROLLUP: get_collection(CATEGORY_ROLLUP).count_documents({})}
+    invalidate_queries()
+    return result
+
+
+def backfill_if_empty() -> dict | None:
+    """Bảng tổng hợp còn trống (cài mới / nâng cấp) mà đã có loans thì dựng lại."""
+    empty = get_collection(CATEGORY_ROLLUP).find_one({}, {"_id": 1}) is None
+    if not empty or get_collection("loans").find_one({}, {"_id": 1}) is None:
+        return None
+    return backfill()
+
+
+if __name__ == "__main__":
+    if "--backfill" in sys.argv[1:]:
+        for name, n in backfill().items():
+            print(f"{name}: {n} dòng")
+    else:
+        print("Top thể loại:", top_categories())
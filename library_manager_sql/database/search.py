@@ -0,0 +1,151 @@
+# database/search.py
+"""
+Tìm sách không phân biệt dấu / hoa thường, dùng index thay vì $regex quét cả bảng.
+
+Mỗi sách có thêm các trường được tính từ title, author, category:
+    search_words      : các từ đã bỏ dấu, viết thường     ["van", "hoc", "viet", "nam"]
+    search_title_words: như trên nhưng chỉ của tiêu đề (để xếp hạng)
+    search_prefixes   : mọi tiền tố của từng từ (edge n-gram) ["v", "va", "van", "h", ...]
+search_prefixes có multikey index, nên "van hoc" / "Văn Học" / "vă" đều trả lời
+bằng index. Kết quả được xếp hạng: khớp trọn từ > khớp tiền tố, khớp tiêu đề được cộng điểm.
+
+Sách cũ chưa có các trường này được bổ sung khi khởi động (Storage.bootstrap,
+chỉ những sách còn thiếu). Dựng lại toàn bộ:
+    python -m database.search --rebuild
+"""
+import re
+import sys
+
+from pymongo import UpdateOne
+
+from database.catalog import book_row
+from database.db import get_collection
+from database.text import fold, words_of  # noqa: F401  (giữ đường import cũ)
+
+MAX_PREFIX_LEN = 12   # từ dài hơn chỉ lưu tiền tố tối đa 12 ký tự
+SEARCH_FIELDS = ("title", "author", "category")
+
+
+def search_fields(doc: dict) -> dict:
+    """Các trường tìm kiếm cần $set kèm khi thêm / sửa sách."""
+    title_words = words_of(doc.get("title"))
+    words: list[str] = []
+    for field in SEARCH_FIELDS:
+        for w in words_of(doc.get(field)):
+            if w not in words:
+                words.append(w)
+    prefixes = sorted({w[:i] for w in words for i in range(1, min(len(w), MAX_PREFIX_LEN) + 1)})
+    return {
+        "search_words": words,
+        "search_title_words": title_words,
+        "search_prefixes": prefixes,
+    }
+
+
+def search_query(keyword: str) -> dict | None:
+    """
+    Điều kiện find() cho ô tìm kiếm: mọi từ gõ vào đều phải là tiền tố của
+    một từ nào đó trong sách. Trả về None nếu không có từ hợp lệ, hoặc mọi từ
+    chỉ có 1 ký tự ("C++" -> "c" khớp gần hết kho): khi đó dùng regex_query.
+    """
+    tokens = [t[:MAX_PREFIX_LEN] for t in words_of(keyword)]
+    if all(len(t) < 2 for t in tokens):
+        return None
+    return {"search_prefixes": {"$all": tokens}}
+
+
+def regex_query(keyword: str) -> dict:
+    """So khớp nguyên văn (đã escape) trên title / author / category."""
+    regex = {"$regex": re.escape(keyword.strip()), "$options": "i"}
+    return {"book_id": {"$type": "number"}, "$or": [{f: regex} for f in SEARCH_FIELDS]}
+
+
+def search_books(keyword: str, limit: int = 200, after: tuple | None = None) -> list[dict]:
+    """
+    Tìm + xếp hạng trên server:
+        +2 mỗi từ gõ vào khớp trọn một từ, +1 nếu từ đó nằm trong tiêu đề.
+    after: con trỏ (_score, book_id) của dòng cuối trang trước (keyset, như
+    catalog.list_books_page), trang sau không phải đọc lại các dòng đã xem.
+    """
+    tokens = words_of(keyword)
+    query = search_query(keyword)
+    if query is None:
+        return []
+    pipeline = [
+        {"$match": query},
+        {
+            "$addFields": {
+                "_score": {
+                    "$add": [
+                        {"$multiply": [2, {"$size": {"$setIntersection": ["$search_words", tokens]}}]},
+                        {"$size": {"$setIntersection": ["$search_title_words", tokens]}},
+                    ]
+                }
+            }
+        },
+    ]
+    if after is not None:
+        score, book_id = after
+        pipeline.append({"$match": {"$or": [
+            {"_score": {"$lt": score}},
+            {"_score": score, "book_id": {"$gt": book_id}},
+        ]}})
+    pipeline += [
+        {"$sort": {"_score": -1, "book_id": 1}},
+        {"$limit": limit},
+        {"$project": {"search_words": 0, "search_title_words": 0, "search_prefixes": 0}},
+    ]
+    return list(get_collection("books").aggregate(pipeline))
+
+
+def search_books_page(keyword: str, after: tuple | None = None, limit: int = 200) -> dict:
+    """
+    Một trang kết quả tìm kiếm, cùng dạng với catalog.list_books_page:
+        {"rows": [...], "next": con trỏ (_score, book_id) trang sau | None, "prev": None}
+    """
+    if search_query(keyword) is None:
+        # Không có từ nào dùng được index (ví dụ ".", "C++"): so khớp nguyên văn,
+        # keyset theo book_id (_score luôn 0)
+        query = regex_query(keyword)
+        if after is not None:
+            query["book_id"] = {"$type": "number", "$gt": after[1]}
+        docs = list(get_collection("books").find(query).sort("book_id", 1).limit(limit + 1))
+    else:
+        docs = search_books(keyword, limit=limit + 1, after=after)
+    has_more = len(docs) > limit
+    docs = [d for d in docs[:limit] if isinstance(d.get("book_id"), (int, float))]
+    return {
+        "rows": [book_row(d) for d in docs],
+        "next": (docs[-1].get("_score", 0), docs[-1]["book_id"]) if has_more and docs else None,
+        "prev": None,
+    }
+
+
+def rebuild_search_fields(batch_size: int = 1000, only_missing: bool = False) -> int:
+    """
+    Tính lại trường tìm kiếm, ghi theo lô bulk_write.
+    only_missing=True: chỉ các sách chưa có search_prefixes (dùng khi khởi động).
+    """
+    books = get_collection("books")
+    cond = {"search_prefixes": {"$exists": False}} if only_missing else {}
+    ops, total = [], 0
+    for d in books.find(cond, projection={f: 1 for f in SEARCH_FIELDS}):
+        ops.append(UpdateOne({"_id": d["_id"]}, {"$set": search_fields(d)}))
+        if len(ops) >= batch_size:
+            books.bulk_write(ops, ordered=False)
+            total += len(ops)
+            ops = []
+    if ops:
+        books.bulk_write(ops, ordered=False)
+        total += len(ops)
+    return total
+
+
+if __name__ == "__main__":
+    if "--rebuild" in sys.argv[1:]:
+        n = rebuild_search_fields()
+        print(f"Đã cập nhật trường tìm kiếm cho {n} sách.")
+    else:
+        kw = " ".join(sys.argv[1:])
+        for doc in search_books(kw, limit=20):
+            print(doc.get("book_id"), doc.get("_score"), doc.get("title"), "|", doc.get("author"))
@@ -0,0 +1,86 @@
+# database/sequences.py
+"""
+Cấp phát ID tăng dần (giống IDENTITY trong SQL) qua collection "counters".
+
+Mỗi sequence là một document { _id: <tên>, seq: <giá trị đã cấp gần nhất> }
+và được tăng nguyên tử bằng find_one_and_update + $inc, nên nhiều máy cùng
+lúc vẫn không nhận trùng ID. Có thể giữ trước cả một khối N ID trong 1 lần gọi.
+"""
+import threading
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from database.db import get_collection
+
+# tên sequence -> (collection, field) dùng để đồng bộ giá trị ban đầu
+SEQUENCES = {
+    "books": ("books", "book_id"),
+    "borrowers": ("borrowers", "borrower_id"),
+    "employees": ("employees", "employee_id"),
+    "loan_receipts": ("loan_receipts", "receipt_id"),
+    "loans": ("loans", "loan_id"),
+}
+
+_synced: set[str] = set()
+_lock = threading.Lock()
+
+
+def _sync_with_collection(name: str, session=None):
+    """
+    Lần đầu dùng trong tiến trình: đẩy seq lên ít nhất bằng ID lớn nhất đang có
+    ($max là nguyên tử và không bao giờ làm giảm seq).
+    """
+    if name in _synced or name not in SEQUENCES:
+        return
+    with _lock:
+        if name in _synced:
+            return
+        col_name, field = SEQUENCES[name]
+        last = get_collection(col_name).find_one(
+            {field: {"$type": "number"}},
+            sort=[(field, -1)],
+            projection={field: 1},
+            session=session,
+        )
+        current_max = int(last[field]) if last else 0
+        try:
+            get_collection("counters").update_one(
+                {"_id": name},
+                {"$max": {"seq": current_max}},
+                upsert=True,
+                session=session,
+            )
+        except DuplicateKeyError:
+            # Máy khác vừa upsert cùng _id -> document đã có, chạy lại là đủ
+            get_collection("counters").update_one(
+                {"_id": name}, {"$max": {"seq": current_max}}, session=session
+            )
+        _synced.add(name)
+
+
+def reserve_ids(name: str, count: int = 1, session=None) -> range:
+    """Giữ trước `count` ID liên tiếp, trả về range(first, last + 1)."""
+    if count < 1:
+        raise ValueError("count phải >= 1")
+    _sync_with_collection(name, session=session)
+    doc = get_collection("counters").find_one_and_update(
+        {"_id": name},
+        {"$inc": {"seq": count}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+        session=session,
+    )
+    last = int(doc["seq"])
+    return range(last - count + 1, last + 1)
+
+
+def next_id(name: str, session=None) -> int:
+    return reserve_ids(name, 1, session=session)[0]
+
+
+def reset_sequences():
+    """Xoá toàn bộ counters (dùng khi seed lại dữ liệu demo)."""
+    get_collection("counters").delete_many({})
+    with _lock:
+        _synced.clear()
@@ -0,0 +1,182 @@
+# database/sql_pool.py
+"""
+Pool kết nối SQL (DB-API: pyodbc cho SQL Server, sqlite3 khi chạy thử) để
+sql_execute / sql_fetch không mở kết nối mới cho mỗi câu lệnh.
+
+    pool = SQLConnectionPool(sql_conn, max_size=8)
+
+    with pool.unit_of_work() as cur:      # nhiều câu lệnh, 1 kết nối, 1 transaction
+        cur.execute("INSERT ...")
+        cur.execute("INSERT ...")
+    # thoát khối: commit; có exception: rollback
+
+- Mỗi thread giữ tối đa MỘT kết nối: gọi lồng nhau (sql_fetch bên trong
+  unit_of_work, hay unit_of_work lồng nhau) dùng lại kết nối và transaction
+  đang mở, chỉ khối ngoài cùng mới commit / rollback và trả kết nối về pool.
+- Kết nối nằm yên lâu hơn check_after giây được kiểm tra bằng health_query
+  trước khi cho mượn; hỏng thì bỏ và mở kết nối mới. Nằm yên quá max_idle
+  giây thì đóng hẳn.
+- Trả về pool luôn rollback phần chưa commit, nên kết nối sạch cho lần sau.
+- Sau close_all() pool không cho mượn nữa (PoolClosed); cần thì tạo pool mới.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+
+class PoolTimeout(Exception):
+    """Không mượn được kết nối trong thời gian chờ (pool đã cho mượn hết)."""
+
+
+class PoolClosed(Exception):
+    """Pool đã close_all(): không cho mượn kết nối mới."""
+
+
+class SQLConnectionPool:
+    def __init__(
+        self,
+        factory,
+        max_size: int = 8,
+        health_query: str = "SELECT 1",
+        check_after: float = 30.0,
+        max_idle: float = 300.0,
+        timeout: float = 10.0,
+    ):
+        self.factory = factory
+        self.max_size = max_size
+        self.health_query = health_query
+        self.check_after = check_after
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.counters = {"created": 0, "reused": 0, "discarded": 0, "health_failures": 0, "checkouts": 0}
+
+        self._idle: list = []                 # [(conn, last_used)], lấy từ cuối (LIFO)
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._closed = False
+
+    # ---------------------------------------------------------------- mượn / trả
+    @contextmanager
+    def connection(self):
+        """Kết nối của thread hiện tại (mượn từ pool nếu thread chưa giữ kết nối nào)."""
+        local = self._local
+        conn = getattr(local, "conn", None)
+        if conn is not None:
+            yield conn   # lồng nhau: dùng lại, không trả về pool ở đây
+            return
+
+        conn = self._checkout()
+        local.conn = conn
+        healthy = True
+        try:
+            yield conn
+        except BaseException:
+            healthy = self._safe_rollback(conn)
+            raise
+        finally:
+            local.conn = None
+            self._release(conn, healthy)
+
+    @contextmanager
+    def unit_of_work(self):
+        """Cursor dùng chung một transaction; commit khi khối ngoài cùng kết thúc."""
+        with self.connection() as conn:
+            local = self._local
+            if getattr(local, "in_uow", False):
+                yield conn.cursor()
+                return
+            local.in_uow = True
+            try:
+                yield conn.cursor()
+                conn.commit()
+            finally:
+                local.in_uow = False
+
+    def _checkout(self):
+        if self._closed:
+            raise PoolClosed("Pool kết nối SQL đã đóng.")
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(f"Không lấy được kết nối SQL sau {self.timeout} giây (pool {self.max_size}).")
+        try:
+            if self._closed:   # close_all() chạy trong lúc chờ chỗ trống
+                raise PoolClosed("Pool kết nối SQL đã đóng.")
+            conn = self._take_idle()
+            if conn is None:
+                conn = self.factory()
+                self._count("created")
+            else:
+                self._count("reused")
+            self._count("checkouts")
+            return conn
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _take_idle(self):
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                conn, last_used = self._idle.pop()
+            idle_for = now - last_used
+            if idle_for > self.max_idle:
+                self._discard(conn)
+                continue
+            if idle_for > self.check_after and not self._healthy(conn):
+                self._count("health_failures")
+                self._discard(conn)
+                continue
+            return conn
+
+    def _release(self, conn, healthy: bool):
+        try:
+            if healthy and not self._closed and self._safe_rollback(conn):
+                with self._lock:
+                    self._idle.append((conn, time.monotonic()))
+            else:
+                self._discard(conn)
+        finally:
+            self._slots.release()
+
+    # ---------------------------------------------------------------- tiện ích
+    def _healthy(self, conn) -> bool:
+        try:
+            cur = conn.cursor()
+            cur.execute(self.health_query)
+            cur.fetchall()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _safe_rollback(conn) -> bool:
+        try:
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        self._count("discarded")
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def close_all(self):
+        """Đóng mọi kết nối đang rảnh (kết nối đang cho mượn sẽ bị đóng khi trả về)."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self.counters, "idle": len(self._idle)}
@@ -0,0 +1,48 @@
+# database/storage/__init__.py
+"""
+Chọn backend lưu trữ theo khối "storage" trong config.json:
+
+    "storage": {"backend": "mongodb"}                                 # mặc định
+    "storage": {"backend": "sqlite", "sqlite_path": "library.db"}     # một máy, không cần server
+
+    from database.storage import get_storage
+    get_storage().books.add(...)
+
+Module backend chỉ được import khi dùng lần đầu (sqlite không cần pymongo).
+"""
+import importlib
+import threading
+
+from database.config import load_config
+from database.storage.base import Storage
+
+BACKENDS = {
+    "mongodb": "database.storage.mongo",
+    "sqlite": "database.storage.sqlite",
+}
+
+_storage: Storage | None = None
+_lock = threading.Lock()
+
+
+def get_storage() -> Storage:
+    global _storage
+    if _storage is not None:
+        return _storage
+    with _lock:
+        if _storage is None:
+            options = dict(load_config().get("storage") or {})
+            backend = options.pop("backend", "mongodb")
+            if backend not in BACKENDS:
+                raise ValueError(f"storage.backend không hợp lệ: {backend}")
+            _storage = importlib.import_module(BACKENDS[backend]).open_storage(options)
+    return _storage
+
+
+def close_storage():
+    """Đóng backend hiện tại (đăng xuất); lần get_storage() sau mở lại."""
+    global _storage
+    with _lock:
+        storage, _storage = _storage, None
+    if storage is not None:
+        storage.close()
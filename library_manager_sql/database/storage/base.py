@@ -0,0 +1,219 @@
+# database/storage/base.py
+"""
+Giao diện chung của các backend lưu trữ (MongoDB, SQLite).
+
+Mỗi backend là một Storage gồm sáu repository; các frame chỉ gọi qua đây:
+    storage.books      BookRepository
+    storage.borrowers  BorrowerRepository
+    storage.receipts   ReceiptRepository
+    storage.loans      LoanRepository
+    storage.employees  EmployeeRepository
+    storage.logs       LogRepository
+Dòng trả về cho Treeview có cùng dạng tuple ở mọi backend.
+Module này không import driver nào (pymongo / sqlite3).
+"""
+import datetime
+from abc import ABC, abstractmethod
+
+MAX_BOOKS_PER_RECEIPT = 5
+
+STATUS_AVAILABLE = "Có sẵn"
+STATUS_ON_LOAN = "Đang mượn"
+
+# Status (sau normalize_status, kể cả dữ liệu cũ) được coi là "có sẵn".
+# Sách chưa có trường status cũng là có sẵn; status = None thì không.
+AVAILABLE_STATUSES = ("có sẵn", "co san", "available", "", "0")
+ON_LOAN_VALUES = ["Đang mượn", "Đã mượn"]
+
+
+def normalize_status(status) -> str:
+    """' Có Sẵn ' -> 'có sẵn' (bỏ khoảng trắng hai đầu, thường hoá)."""
+    return str(status).strip().lower()
+
+
+def is_available(status) -> bool:
+    return normalize_status(status) in AVAILABLE_STATUSES
+
+
+class BooksUnavailable(Exception):
+    """Một số sách không chuyển được trạng thái; book_ids cho biết chính xác sách nào."""
+
+    def __init__(self, message: str, book_ids: list[int]):
+        super().__init__(message)
+        self.book_ids = book_ids
+
+
+class DuplicateError(Exception):
+    """Vi phạm khoá duy nhất (username, SĐT, email...)."""
+
+
+def check_receipt_books(book_ids: list[int]) -> list[int]:
+    """Chuẩn hoá + kiểm tra danh sách sách của một phiếu (dùng chung mọi backend)."""
+    book_ids = [int(b) for b in book_ids]
+    if not (1 <= len(book_ids) <= MAX_BOOKS_PER_RECEIPT):
+        raise Exception("Một phiếu phải có từ 1 đến 5 sách.")
+    if len(set(book_ids)) != len(book_ids):
+        raise Exception("Một sách chỉ được nhập một lần trong phiếu.")
+    return book_ids
+
+
+def borrower_status_text(total: int, open_cnt: int) -> str:
+    if total == 0:
+        return "Vừa thêm"
+    if open_cnt > 0:
+        return "Đang mượn"
+    return "Đã trả hết"
+
+
+class BookRepository(ABC):
+    @abstractmethod
+    def list_page(self, keyword: str | None = None, after=None) -> dict:
+        """
+        Một trang cho Treeview:
+            {"rows": [(book_id, title, author, year, category, status), ...],
+             "next": con trỏ trang sau | None, "prev": ...}
+        Con trỏ là giá trị do chính backend trả về, frame chỉ truyền lại.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def exists(self, book_id: int) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def add(self, title: str, author: str, year: int | None, category: str, status: str = STATUS_AVAILABLE) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def update(self, book_id: int, title: str, author: str, year: int | None, category: str, status: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, book_id: int):
+        """Không cho xoá sách đang được mượn; xoá kèm lịch sử loans của sách."""
+        raise NotImplementedError
+
+
+class BorrowerRepository(ABC):
+    @abstractmethod
+    def list_page(
+        self,
+        keyword: str | None = None,
+        only_returned: bool = False,
+        only_borrowing: bool = False,
+        page: int = 0,
+        page_size: int = 100,
+    ) -> tuple[list[tuple], int]:
+        """
+        (rows, total) với rows là tuple cho Treeview:
+        (borrower_id, name, phone, email, open_receipts, total_receipts, status_text)
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def add(self, name: str, phone: str | None, email: str | None) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def update(self, borrower_id: int, name: str, phone: str | None, email: str | None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, borrower_id: int):
+        """XÓA CỨNG: chỉ khi không còn phiếu mở; xoá kèm phiếu + loans."""
+        raise NotImplementedError
+
+
+class ReceiptRepository(ABC):
+    @abstractmethod
+    def has_open(self, borrower_id: int) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def create(
+        self,
+        borrower_id: int,
+        due_date: datetime.date | None,
+        book_ids: list[int],
+        employee_id: int | None = None,
+    ) -> int:
+        """Lập phiếu cho 1..5 sách (độc giả không được còn phiếu mở). Trả về receipt_id."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def close(self, receipt_id: int) -> list[int]:
+        """Trả hết sách trong phiếu; trả về book_id không đưa được về 'Có sẵn'."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_for_borrower(self, borrower_id: int) -> list[tuple]:
+        """(receipt_id, borrow_date, due_date, return_date, book_count, status), mới nhất trước."""
+        raise NotImplementedError
+
+
+class LoanRepository(ABC):
+    @abstractmethod
+    def book_on_loan(self, book_id: int) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def receipt_lines(self, receipt_id: int) -> list[tuple]:
+        """(book_id, title, borrow_date, return_date) theo loan_id."""
+        raise NotImplementedError
+
+
+class EmployeeRepository(ABC):
+    @abstractmethod
+    def find_login(self, username: str, password: str) -> dict | None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def list(self, keyword: str = "") -> list[dict]:
+        """Nhân viên (trừ admin) theo employee_id, lọc theo tên / chức vụ."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get(self, employee_id: int) -> dict | None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def add(self, name: str, position: str, username: str, password: str, schedule_days: str) -> int:
+        """DuplicateError nếu username đã có."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def update(self, employee_id: int, fields: dict):
+        """fields: name, position, username, schedule_days, password (tuỳ chọn)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, employee_id: int):
+        raise NotImplementedError
+
+
+class LogRepository(ABC):
+    @abstractmethod
+    def append(self, log_class: str, entry: dict):
+        """Ghi một dòng system_logs (log_class: security / circulation / general / debug)."""
+        raise NotImplementedError
+
+
+class Storage(ABC):
+    name = ""
+
+    books: BookRepository
+    borrowers: BorrowerRepository
+    receipts: ReceiptRepository
+    loans: LoanRepository
+    employees: EmployeeRepository
+    logs: LogRepository
+
+    @abstractmethod
+    def bootstrap(self):
+        """Kiểm tra kết nối + tạo schema / index còn thiếu (idempotent)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def close(self):
+        """Ghi nốt phần đang chờ và đóng kết nối."""
+        raise NotImplementedError
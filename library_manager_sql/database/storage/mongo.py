@@ -0,0 +1,407 @@
+# database/storage/mongo.py
+"""
+Backend MongoDB: dùng lại các module sẵn có (catalog, search, circulation,
+cache, sequences, audit). Phần truy vấn trước đây nằm rải trong ui/frames
+được gom vào đây.
+"""
+import datetime
+import re
+
+from pymongo.errors import DuplicateKeyError
+
+from database.audit import audit, flush_audit
+from database.borrower_stats import EMPTY_COUNTERS, on_loans_deleted, repair
+from database.cache import invalidate_book, invalidate_borrower, invalidate_queries
+from database.catalog import list_books_page
+from database.circulation import close_receipt, create_receipt, has_open_receipt
+from database.db import close_clients, get_collection, run_in_transaction
+from database.loan_outbox import localize_legacy_loans
+from database.rollups import backfill_if_empty, forget_loans
+from database.search import rebuild_search_fields, search_books_page, search_fields
+from database.sequences import next_id
+from database.storage.base import (
+    STATUS_AVAILABLE,
+    BookRepository,
+    BorrowerRepository,
+    DuplicateError,
+    EmployeeRepository,
+    LoanRepository,
+    LogRepository,
+    ReceiptRepository,
+    Storage,
+    borrower_status_text,
+)
+
+
+# Trường của loans cần để trừ lại bảng tổng hợp (database/rollups.py) và
+# total_loans của độc giả (borrower_id) khi xoá
+_ROLLUP_FIELDS = {"borrow_date": 1, "return_date": 1, "book_category": 1, "borrower_id": 1}
+
+
+def _delete_loans(cond: dict, session=None) -> list[dict]:
+    """Xoá loans khớp cond và trừ lại thống kê theo ngày; trả về các loans đã xoá."""
+    loans = get_collection("loans")
+    history = list(loans.find(cond, projection=_ROLLUP_FIELDS, session=session))
+    if history:
+        loans.delete_many(cond, session=session)
+        forget_loans(history, session=session)
+    return history
+
+
+# === SÁCH ===
+class MongoBooks(BookRepository):
+    def list_page(self, keyword: str | None = None, after=None) -> dict:
+        # Không có từ khoá: danh mục keyset theo book_id (database/catalog.py).
+        # Có từ khoá: tìm không dấu qua index, xếp theo độ khớp (database/search.py).
+        kw = (keyword or "").strip()
+        if kw:
+            return search_books_page(kw, after=after)
+        return list_books_page(after=after)
+
+    def exists(self, book_id: int) -> bool:
+        return get_collection("books").count_documents({"book_id": int(book_id)}, limit=1) > 0
+
+    def add(self, title, author, year, category, status=STATUS_AVAILABLE) -> int:
+        new_id = next_id("books")
+        doc = {
+            "book_id": new_id,
+            "title": title,
+            "author": author,
+            "published_year": year,
+            "category": category,
+            "status": status or STATUS_AVAILABLE,
+        }
+        get_collection("books").insert_one({**doc, **search_fields(doc)})
+        return new_id
+
+    def update(self, book_id, title, author, year, category, status):
+        fields = {
+            "title": title,
+            "author": author,
+            "published_year": year,
+            "category": category,
+            "status": status,
+        }
+        get_collection("books").update_one(
+            {"book_id": int(book_id)},
+            {"$set": {**fields, **search_fields(fields)}},
+        )
+        invalidate_book(book_id)
+
+    def delete(self, book_id):
+        if MongoLoans().book_on_loan(book_id):
+            raise Exception("Sách này đang được mượn, không thể xóa.")
+
+        def _txn(session):
+            # Xóa lịch sử loan liên quan tới sách này (FK mềm), trừ total_loans của người mượn
+            counts: dict = {}
+            for loan in _delete_loans({"book_id": int(book_id)}, session=session):
+                if loan.get("borrower_id") is not None:
+                    counts[loan["borrower_id"]] = counts.get(loan["borrower_id"], 0) + 1
+            on_loans_deleted(counts, session=session)
+            get_collection("books").delete_one({"book_id": int(book_id)}, session=session)
+
+        run_in_transaction(_txn)
+        invalidate_book(book_id)
+        invalidate_queries()
+
+
+# === ĐỘC GIẢ ===
+class MongoBorrowers(BorrowerRepository):
+    def list_page(self, keyword=None, only_returned=False, only_borrowing=False, page=0, page_size=100):
+        # Một aggregation: lọc theo bộ đếm lưu sẵn trên borrowers
+        # (database/borrower_stats.py) rồi cắt đúng 1 trang, không $lookup.
+        match: dict = {"borrower_id": {"$exists": True}}
+        kw = (keyword or "").strip()
+        if kw:
+            # Escape như LIKE bên SQLite: "(" / "[" là ký tự thường, không lỗi regex
+            regex = {"$regex": re.escape(kw), "$options": "i"}
+            match["$or"] = [{"phone": regex}, {"name": regex}]
+        if only_returned:
+            match["total_receipts"] = {"$gt": 0}
+            match["open_receipts"] = 0
+        if only_borrowing:
+            match["open_receipts"] = {"$gt": 0}
+
+        page_stages = [{"$skip": max(page, 0) * page_size}, {"$limit": page_size}]
+        pipeline: list = [
+            {"$match": match},
+            {"$sort": {"borrower_id": 1}},
+            {"$facet": {"rows": page_stages, "total": [{"$count": "n"}]}},
+        ]
+        result = next(get_collection("borrowers").aggregate(pipeline), {"rows": [], "total": []})
+        total_count = result["total"][0]["n"] if result["total"] else 0
+
+        rows = []
+        for b in result["rows"]:
+            total = int(b.get("total_receipts", 0) or 0)
+            open_cnt = int(b.get("open_receipts", 0) or 0)
+            rows.append(
+                (
+                    int(b.get("borrower_id")),
+                    b.get("name", ""),
+                    b.get("phone", ""),
+                    b.get("email", ""),
+                    open_cnt,
+                    total,
+                    borrower_status_text(total, open_cnt),
+                )
+            )
+        return rows, total_count
+
+    @staticmethod
+    def _contact_conditions(phone, email) -> list:
+        conditions = []
+        if phone:
+            conditions.append({"phone": phone})
+        if email:
+            conditions.append({"email": email})
+        return conditions
+
+    def add(self, name, phone, email) -> int:
+        borrowers = get_collection("borrowers")
+        conditions = self._contact_conditions(phone, email)
+        if conditions and borrowers.count_documents({"$or": conditions}) > 0:
+            raise Exception("SĐT hoặc Email đã tồn tại, vui lòng kiểm tra lại.")
+        new_id = next_id("borrowers")
+        borrowers.insert_one(
+            {"borrower_id": new_id, "name": name, "phone": phone, "email": email, **EMPTY_COUNTERS}
+        )
+        return new_id
+
+    def update(self, borrower_id, name, phone, email):
+        borrowers = get_collection("borrowers")
+        conditions = self._contact_conditions(phone, email)
+        if conditions and borrowers.count_documents({"borrower_id": {"$ne": borrower_id}, "$or": conditions}) > 0:
+            raise Exception("SĐT hoặc Email đã được dùng bởi độc giả khác.")
+        borrowers.update_one(
+            {"borrower_id": borrower_id},
+            {"$set": {"name": name, "phone": phone, "email": email}},
+        )
+        invalidate_borrower(borrower_id)
+
+    def delete(self, borrower_id):
+        if has_open_receipt(borrower_id):
+            raise Exception("Người mượn còn phiếu chưa trả — không thể xoá.")
+
+        def _txn(session):
+            _delete_loans({"borrower_id": borrower_id}, session=session)
+            get_collection("loan_receipts").delete_many({"borrower_id": borrower_id}, session=session)
+            get_collection("borrowers").delete_one({"borrower_id": borrower_id}, session=session)
+
+        run_in_transaction(_txn)
+        invalidate_borrower(borrower_id)
+        invalidate_queries()
+
+
+# === PHIẾU MƯỢN / LOANS ===
+class MongoReceipts(ReceiptRepository):
+    def has_open(self, borrower_id) -> bool:
+        return has_open_receipt(borrower_id)
+
+    def create(self, borrower_id, due_date, book_ids, employee_id=None) -> int:
+        return create_receipt(borrower_id, due_date, book_ids, employee_id)
+
+    def close(self, receipt_id) -> list[int]:
+        return close_receipt(receipt_id)
+
+    def list_for_borrower(self, borrower_id) -> list[tuple]:
+        # Một aggregation: số sách mỗi phiếu đếm ngay trong $lookup sang loans
+        # (chỉ trả về {n}, không kéo cả document loans về để lấy $size)
+        pipeline = [
+            {"$match": {"borrower_id": borrower_id}},
+            {"$sort": {"borrow_date": -1, "receipt_id": -1}},
+            {
+                "$lookup": {
+                    "from": "loans",
+                    "let": {"rid": "$receipt_id"},
+                    "pipeline": [
+                        {"$match": {"$expr": {"$eq": ["$receipt_id", "$$rid"]}}},
+                        {"$count": "n"},
+                    ],
+                    "as": "lines",
+                }
+            },
+            {
+                "$project": {
+                    "_id": 0,
+                    "receipt_id": 1,
+                    "borrow_date": 1,
+                    "due_date": 1,
+                    "return_date": 1,
+                    "book_count": {"$ifNull": [{"$arrayElemAt": ["$lines.n", 0]}, 0]},
+                }
+            },
+        ]
+        result = []
+        for r in get_collection("loan_receipts").aggregate(pipeline):
+            return_date = r.get("return_date")
+            result.append(
+                (
+                    int(r["receipt_id"]),
+                    r.get("borrow_date"),
+                    r.get("due_date"),
+                    return_date,
+                    int(r.get("book_count", 0)),
+                    "Đang mượn" if return_date is None else "Đã trả",
+                )
+            )
+        return result
+
+
+class MongoLoans(LoanRepository):
+    def book_on_loan(self, book_id) -> bool:
+        doc = get_collection("loans").find_one(
+            {
+                "book_id": int(book_id),
+                "$or": [{"return_date": None}, {"is_returned": {"$ne": True}}],
+            },
+            projection={"_id": 1},
+        )
+        return doc is not None
+
+    def receipt_lines(self, receipt_id) -> list[tuple]:
+        # Tên sách lấy bằng $lookup sang books trong cùng một aggregation
+        pipeline = [
+            {"$match": {"receipt_id": receipt_id}},
+            {"$sort": {"loan_id": 1}},
+            {
+                "$lookup": {
+                    "from": "books",
+                    "localField": "book_id",
+                    "foreignField": "book_id",
+                    "as": "book",
+                }
+            },
+            {
+                "$project": {
+                    "_id": 0,
+                    "book_id": 1,
+                    "borrow_date": 1,
+                    "return_date": 1,
+                    "title": {"$ifNull": [{"$arrayElemAt": ["$book.title", 0]}, ""]},
+                }
+            },
+        ]
+        return [
+            (int(l["book_id"]), l.get("title", ""), l.get("borrow_date"), l.get("return_date"))
+            for l in get_collection("loans").aggregate(pipeline)
+        ]
+
+
+# === NHÂN VIÊN ===
+class MongoEmployees(EmployeeRepository):
+    def find_login(self, username, password):
+        return get_collection("employees").find_one({"username": username, "password": password})
+
+    def list(self, keyword=""):
+        cond = {"is_admin": {"$ne": True}}
+        if keyword:
+            regex = {"$regex": re.escape(keyword), "$options": "i"}
+            cond["$or"] = [{"name": regex}, {"position": regex}]
+        return list(get_collection("employees").find(cond).sort("employee_id", 1))
+
+    def get(self, employee_id):
+        return get_collection("employees").find_one({"employee_id": employee_id})
+
+    def add(self, name, position, username, password, schedule_days) -> int:
+        new_id = next_id("employees")
+        try:
+            get_collection("employees").insert_one(
+                {
+                    "employee_id": new_id,
+                    "name": name,
+                    "position": position,
+                    "username": username,
+                    "password": password,
+                    "is_admin": False,
+                    "work_date": datetime.datetime.now(),
+                    "schedule_days": schedule_days,
+                }
+            )
+        except DuplicateKeyError as e:
+            raise DuplicateError(str(e)) from e
+        return new_id
+
+    def update(self, employee_id, fields):
+        try:
+            get_collection("employees").update_one({"employee_id": employee_id}, {"$set": dict(fields)})
+        except DuplicateKeyError as e:
+            raise DuplicateError(str(e)) from e
+
+    def delete(self, employee_id):
+        get_collection("employees").delete_one({"employee_id": employee_id})
+
+
+# === LOG ===
+class MongoLogs(LogRepository):
+    def append(self, log_class, entry):
+        audit(log_class, entry)   # ghi nền theo lô (database/audit.py)
+
+
+# === KHỞI ĐỘNG: bổ sung phần dữ liệu cũ còn thiếu (idempotent, chỉ đụng phần thiếu) ===
+def _bootstrap_step(label: str, fn):
+    """Lỗi ở một bước chỉ in ra, không chặn đăng nhập."""
+    try:
+        fn()
+    except Exception as e:
+        print(f"{label} bootstrap error:", e)
+
+
+def _backfill_search_fields():
+    # Sách cũ chưa có trường tìm kiếm (database/search.py)
+    n = rebuild_search_fields(only_missing=True)
+    if n:
+        print(f"Đã bổ sung trường tìm kiếm cho {n} sách.")
+
+
+def _localize_legacy_loans():
+    # Loans cũ chép từ SQL Server theo giờ UTC (database/loan_outbox.py)
+    n = localize_legacy_loans()
+    if n:
+        print(f"Đã đổi {n} lượt mượn cũ sang giờ địa phương.")
+
+
+def _backfill_rollups():
+    # Bảng tổng hợp thống kê còn trống (database/rollups.py): dựng lại từ loans
+    rebuilt = backfill_if_empty()
+    if rebuilt:
+        print("Đã dựng bảng tổng hợp thống kê:", rebuilt)
+
+
+def _backfill_borrower_counters():
+    # Độc giả cũ chưa có bộ đếm phiếu / lượt mượn (database/borrower_stats.py)
+    n = repair(only_missing=True)
+    if n:
+        print(f"Đã bổ sung bộ đếm cho {n} độc giả.")
+
+
+class MongoStorage(Storage):
+    name = "mongodb"
+
+    def __init__(self):
+        self.books = MongoBooks()
+        self.borrowers = MongoBorrowers()
+        self.receipts = MongoReceipts()
+        self.loans = MongoLoans()
+        self.employees = MongoEmployees()
+        self.logs = MongoLogs()
+
+    def bootstrap(self):
+        from database.indexes import ensure_indexes, print_report
+
+        # gọi thử 1 lệnh đơn giản để đảm bảo kết nối OK
+        get_collection("books").find_one({})
+        _bootstrap_step("Index", lambda: print_report(ensure_indexes()))
+        _bootstrap_step("Search fields", _backfill_search_fields)
+        _bootstrap_step("Loan clock", _localize_legacy_loans)
+        _bootstrap_step("Rollups", _backfill_rollups)
+        _bootstrap_step("Borrower counters", _backfill_borrower_counters)
+
+    def close(self):
+        flush_audit()    # ghi nốt log đang chờ trong hàng đợi
+        close_clients()  # trả kết nối về server
+
+
+def open_storage(options: dict) -> MongoStorage:
+    return MongoStorage()
@@ -0,0 +1,671 @@
+# database/storage/sqlite.py
+"""
+Backend SQLite nhúng: một file .db cạnh chương trình, không cần server.
+Dành cho quầy đơn lẻ / máy phát triển / chạy test.
+
+    "storage": {"backend": "sqlite", "sqlite_path": "library.db"}
+
+- journal_mode=WAL: đọc không bị chặn bởi ghi, commit chỉ nối vào file -wal.
+- Mọi câu lệnh là chuỗi cố định + tham số "?", nên sqlite3 dùng lại bản đã
+  biên dịch trong cache statement của từng kết nối (cached_statements).
+- Kết nối lấy từ SQLConnectionPool (database/sql_pool.py); mỗi thao tác ghi
+  là một unit_of_work = một transaction BEGIN IMMEDIATE.
+- Tìm sách không dấu bằng bảng FTS5 books_fts (chữ đã bỏ dấu, tìm theo tiền tố).
+- Bộ đếm phiếu trên borrowers giống bản MongoDB (database/borrower_stats.py).
+
+Dòng lệnh:
+    python -m database.storage.sqlite --init                       # tạo schema / index
+    python -m database.storage.sqlite --add-admin <tài khoản> <mật khẩu>
+"""
+import datetime
+import json
+import sqlite3
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+
+from database.config import CONFIG_FILE
+from database.sql_pool import SQLConnectionPool
+from database.storage.base import (
+    AVAILABLE_STATUSES,
+    ON_LOAN_VALUES,
+    STATUS_AVAILABLE,
+    STATUS_ON_LOAN,
+    BookRepository,
+    BooksUnavailable,
+    BorrowerRepository,
+    DuplicateError,
+    EmployeeRepository,
+    LoanRepository,
+    LogRepository,
+    ReceiptRepository,
+    Storage,
+    borrower_status_text,
+    check_receipt_books,
+    normalize_status,
+)
+from database.text import fold, words_of
+
+DEFAULT_SQLITE_OPTIONS = {
+    "sqlite_path": "library.db",     # tương đối: tính từ thư mục chứa config.json
+    "pool_size": 4,
+    "busy_timeout_ms": 5000,
+    "cached_statements": 256,
+}
+
+PAGE_SIZE = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    book_id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    title          TEXT NOT NULL,
+    author         TEXT,
+    published_year INTEGER,
+    category       TEXT,
+    status         TEXT NOT NULL DEFAULT 'Có sẵn'
+);
+CREATE INDEX IF NOT EXISTS ix_books_status ON books (status);
+CREATE INDEX IF NOT EXISTS ix_books_title ON books (title, book_id);
+
+-- chữ đã bỏ dấu (database/text.py); rowid = book_id
+CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5 (
+    words, title_words, tokenize = 'unicode61', prefix = '1 2 3'
+);
+
+CREATE TABLE IF NOT EXISTS borrowers (
+    borrower_id    INTEGER PRIMARY KEY AUTOINCREMENT,
+    name           TEXT NOT NULL,
+    phone          TEXT UNIQUE,
+    email          TEXT UNIQUE,
+    open_receipts  INTEGER NOT NULL DEFAULT 0,
+    total_receipts INTEGER NOT NULL DEFAULT 0,
+    total_loans    INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ix_borrowers_open ON borrowers (open_receipts, borrower_id);
+CREATE INDEX IF NOT EXISTS ix_borrowers_top ON borrowers (total_loans DESC, borrower_id);
+
+CREATE TABLE IF NOT EXISTS employees (
+    employee_id   INTEGER PRIMARY KEY AUTOINCREMENT,
+    name          TEXT NOT NULL,
+    position      TEXT,
+    username      TEXT NOT NULL UNIQUE,
+    password      TEXT NOT NULL,
+    is_admin      INTEGER NOT NULL DEFAULT 0,
+    work_date     TIMESTAMP,
+    schedule_days TEXT
+);
+
+CREATE TABLE IF NOT EXISTS loan_receipts (
+    receipt_id  INTEGER PRIMARY KEY AUTOINCREMENT,
+    borrower_id INTEGER NOT NULL REFERENCES borrowers (borrower_id),
+    borrow_date TIMESTAMP NOT NULL,
+    due_date    TIMESTAMP,
+    return_date TIMESTAMP,
+    employee_id INTEGER,
+    note        TEXT
+);
+-- mỗi độc giả tối đa một phiếu mở (chặn cả khi hai quầy lập phiếu cùng lúc)
+CREATE UNIQUE INDEX IF NOT EXISTS uq_receipts_open ON loan_receipts (borrower_id) WHERE return_date IS NULL;
+CREATE INDEX IF NOT EXISTS ix_receipts_history ON loan_receipts (borrower_id, borrow_date DESC, receipt_id DESC);
+CREATE INDEX IF NOT EXISTS ix_receipts_open_due ON loan_receipts (return_date, due_date);
+
+CREATE TABLE IF NOT EXISTS loans (
+    loan_id       INTEGER PRIMARY KEY AUTOINCREMENT,
+    receipt_id    INTEGER REFERENCES loan_receipts (receipt_id),
+    borrower_id   INTEGER NOT NULL,
+    borrower_name TEXT,
+    book_id       INTEGER NOT NULL,
+    book_title    TEXT,
+    book_category TEXT,
+    employee_id   INTEGER,
+    borrow_date   TIMESTAMP NOT NULL,
+    return_date   TIMESTAMP,
+    is_returned   INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ix_loans_receipt ON loans (receipt_id, loan_id);
+CREATE INDEX IF NOT EXISTS ix_loans_book_open ON loans (book_id, is_returned);
+CREATE INDEX IF NOT EXISTS ix_loans_borrower ON loans (borrower_id);
+
+CREATE TABLE IF NOT EXISTS system_logs (
+    log_id     INTEGER PRIMARY KEY AUTOINCREMENT,
+    log_class  TEXT NOT NULL,
+    action     TEXT,
+    created_at TIMESTAMP NOT NULL,
+    entry      TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_logs_time ON system_logs (created_at);
+"""
+
+# datetime <-> TEXT ISO (bộ chuyển mặc định của sqlite3 đã deprecated từ Python 3.12)
+sqlite3.register_adapter(datetime.datetime, lambda d: d.isoformat(" "))
+sqlite3.register_adapter(datetime.date, lambda d: d.isoformat())
+sqlite3.register_converter("TIMESTAMP", lambda b: datetime.datetime.fromisoformat(b.decode()))
+
+_AVAILABLE_IN = ", ".join("?" for _ in AVAILABLE_STATUSES)
+_AVAILABLE_PARAMS = tuple(AVAILABLE_STATUSES)
+_ON_LOAN_IN = ", ".join("?" for _ in ON_LOAN_VALUES)
+_ON_LOAN_PARAMS = tuple(normalize_status(v) for v in ON_LOAN_VALUES)
+
+# status_key() = normalize_status() đăng ký trên từng kết nối (lower() của SQLite chỉ hiểu ASCII);
+# mượn và trả cùng so khớp sau strip().lower()
+_SQL_CHECKOUT = f"UPDATE books SET status = ? WHERE book_id = ? AND status_key(status) IN ({_AVAILABLE_IN})"
+_SQL_CHECKIN = f"UPDATE books SET status = ? WHERE book_id = ? AND status_key(status) IN ({_ON_LOAN_IN})"
+
+
+def _like_pattern(text: str) -> str:
+    """'%text%' với \\, %, _ được escape (dùng kèm ESCAPE '\\')."""
+    text = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{text}%"
+
+
+def _fts_match(keyword: str) -> str | None:
+    """'van hoc' -> '"van"* "hoc"*' (mọi từ là tiền tố). None nếu không có từ hợp lệ."""
+    tokens = words_of(keyword)
+    return " ".join(f'"{t}"*' for t in tokens) if tokens else None
+
+
+def _book_row(r) -> tuple:
+    return (
+        r["book_id"],
+        r["title"] or "",
+        r["author"] or "",
+        r["published_year"] if r["published_year"] is not None else "",
+        r["category"] or "",
+        r["status"] or STATUS_AVAILABLE,
+    )
+
+
+class _Repo:
+    def __init__(self, pool: SQLConnectionPool):
+        self.pool = pool
+
+    def _fetchall(self, sql: str, params=()) -> list:
+        with self.pool.connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def _fetchone(self, sql: str, params=()):
+        with self.pool.connection() as conn:
+            return conn.execute(sql, params).fetchone()
+
+    @contextmanager
+    def _write(self):
+        """unit_of_work mở bằng BEGIN IMMEDIATE: cả phần đọc kiểm tra cũng nằm trong khoá ghi."""
+        with self.pool.unit_of_work() as cur:
+            if not cur.connection.in_transaction:
+                cur.execute("BEGIN IMMEDIATE")
+            yield cur
+
+
+# === SÁCH ===
+_BOOK_COLUMNS = "b.book_id, b.title, b.author, b.published_year, b.category, b.status"
+
+
+class SQLiteBooks(_Repo, BookRepository):
+    def list_page(self, keyword=None, after=None) -> dict:
+        kw = (keyword or "").strip()
+        if kw:
+            return self._search_page(kw, offset=after or 0)
+        # Keyset theo khoá chính: con trỏ = book_id cuối trang
+        rows = self._fetchall(
+            f"SELECT {_BOOK_COLUMNS} FROM books b WHERE b.book_id > ? ORDER BY b.book_id LIMIT ?",
+            (after or 0, PAGE_SIZE + 1),
+        )
+        has_more = len(rows) > PAGE_SIZE
+        rows = rows[:PAGE_SIZE]
+        return {
+            "rows": [_book_row(r) for r in rows],
+            "next": rows[-1]["book_id"] if has_more else None,
+            "prev": None,
+        }
+
+    def _search_page(self, keyword: str, offset: int) -> dict:
+        match = _fts_match(keyword)
+        if match is None:
+            # Không có chữ / số nào (ví dụ ".", "++"): so khớp nguyên văn trong tiêu đề
+            rows = self._fetchall(
+                f"SELECT {_BOOK_COLUMNS} FROM books b WHERE b.title LIKE ? ESCAPE '\\' "
+                "ORDER BY b.book_id LIMIT ? OFFSET ?",
+                (_like_pattern(keyword), PAGE_SIZE + 1, offset),
+            )
+        else:
+            # bm25: khớp trong tiêu đề được tính nặng gấp đôi
+            rows = self._fetchall(
+                f"SELECT {_BOOK_COLUMNS} FROM books_fts f JOIN books b ON b.book_id = f.rowid "
+                "WHERE books_fts MATCH ? ORDER BY bm25(books_fts, 1.0, 2.0), b.book_id LIMIT ? OFFSET ?",
+                (match, PAGE_SIZE + 1, offset),
+            )
+        has_more = len(rows) > PAGE_SIZE
+        return {
+            "rows": [_book_row(r) for r in rows[:PAGE_SIZE]],
+            "next": offset + PAGE_SIZE if has_more else None,
+            "prev": None,
+        }
+
+    def exists(self, book_id) -> bool:
+        return self._fetchone("SELECT 1 FROM books WHERE book_id = ?", (int(book_id),)) is not None
+
+    @staticmethod
+    def _index(cur, book_id: int, title, author, category):
+        words: list[str] = []
+        for text in (title, author, category):
+            for w in words_of(text):
+                if w not in words:
+                    words.append(w)
+        cur.execute("DELETE FROM books_fts WHERE rowid = ?", (book_id,))
+        cur.execute(
+            "INSERT INTO books_fts (rowid, words, title_words) VALUES (?, ?, ?)",
+            (book_id, " ".join(words), " ".join(words_of(title))),
+        )
+
+    def add(self, title, author, year, category, status=STATUS_AVAILABLE) -> int:
+        with self._write() as cur:
+            cur.execute(
+                "INSERT INTO books (title, author, published_year, category, status) VALUES (?, ?, ?, ?, ?)",
+                (title, author, year, category, status or STATUS_AVAILABLE),
+            )
+            book_id = cur.lastrowid
+            self._index(cur, book_id, title, author, category)
+        return book_id
+
+    def update(self, book_id, title, author, year, category, status):
+        with self._write() as cur:
+            cur.execute(
+                "UPDATE books SET title = ?, author = ?, published_year = ?, category = ?, status = ? "
+                "WHERE book_id = ?",
+                (title, author, year, category, status, int(book_id)),
+            )
+            if cur.rowcount:
+                self._index(cur, int(book_id), title, author, category)
+
+    def delete(self, book_id):
+        book_id = int(book_id)
+        with self._write() as cur:
+            if SQLiteLoans(self.pool).book_on_loan(book_id):
+                raise Exception("Sách này đang được mượn, không thể xóa.")
+            # Xoá lịch sử loans của sách thì trừ total_loans của người mượn tương ứng
+            cur.execute(
+                "UPDATE borrowers SET total_loans = MAX(total_loans - "
+                "(SELECT COUNT(*) FROM loans l WHERE l.book_id = ? AND l.borrower_id = borrowers.borrower_id), 0) "
+                "WHERE borrower_id IN (SELECT borrower_id FROM loans WHERE book_id = ?)",
+                (book_id, book_id),
+            )
+            cur.execute("DELETE FROM loans WHERE book_id = ?", (book_id,))
+            cur.execute("DELETE FROM books_fts WHERE rowid = ?", (book_id,))
+            cur.execute("DELETE FROM books WHERE book_id = ?", (book_id,))
+
+
+# === ĐỘC GIẢ ===
+class SQLiteBorrowers(_Repo, BorrowerRepository):
+    def list_page(self, keyword=None, only_returned=False, only_borrowing=False, page=0, page_size=100):
+        where, params = [], []
+        kw = (keyword or "").strip()
+        if kw:
+            pattern = _like_pattern(fold(kw))
+            where.append("(fold(phone) LIKE ? ESCAPE '\\' OR fold(name) LIKE ? ESCAPE '\\')")
+            params += [pattern, pattern]
+        if only_returned:
+            where.append("total_receipts > 0 AND open_receipts = 0")
+        if only_borrowing:
+            where.append("open_receipts > 0")
+        clause = ("WHERE " + " AND ".join(where)) if where else ""
+
+        with self.pool.connection() as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM borrowers {clause}", params).fetchone()[0]
+            found = conn.execute(
+                "SELECT borrower_id, name, phone, email, open_receipts, total_receipts "
+                f"FROM borrowers {clause} ORDER BY borrower_id LIMIT ? OFFSET ?",
+                (*params, page_size, max(page, 0) * page_size),
+            ).fetchall()
+
+        rows = [
+            (
+                r["borrower_id"],
+                r["name"] or "",
+                r["phone"] or "",
+                r["email"] or "",
+                r["open_receipts"],
+                r["total_receipts"],
+                borrower_status_text(r["total_receipts"], r["open_receipts"]),
+            )
+            for r in found
+        ]
+        return rows, total
+
+    @staticmethod
+    def _contact(value) -> str | None:
+        """SĐT / email trống lưu NULL: cột UNIQUE cho phép nhiều NULL, không cho nhiều ''."""
+        return (value or "").strip() or None
+
+    @staticmethod
+    def _contact_taken(cur, phone, email, exclude_id: int = 0) -> bool:
+        row = cur.execute(
+            "SELECT 1 FROM borrowers WHERE borrower_id <> ? AND (phone = ? OR email = ?) LIMIT 1",
+            (exclude_id, phone, email),
+        ).fetchone()
+        return row is not None
+
+    def add(self, name, phone, email) -> int:
+        phone, email = self._contact(phone), self._contact(email)
+        message = "SĐT hoặc Email đã tồn tại, vui lòng kiểm tra lại."
+        try:
+            with self._write() as cur:
+                if self._contact_taken(cur, phone, email):
+                    raise DuplicateError(message)
+                cur.execute(
+                    "INSERT INTO borrowers (name, phone, email) VALUES (?, ?, ?)",
+                    (name, phone, email),
+                )
+                return cur.lastrowid
+        except sqlite3.IntegrityError as e:
+            # ghi song song lọt qua bước kiểm tra: UNIQUE vẫn chặn
+            raise DuplicateError(message) from e
+
+    def update(self, borrower_id, name, phone, email):
+        phone, email = self._contact(phone), self._contact(email)
+        message = "SĐT hoặc Email đã được dùng bởi độc giả khác."
+        try:
+            with self._write() as cur:
+                if self._contact_taken(cur, phone, email, exclude_id=borrower_id):
+                    raise DuplicateError(message)
+                cur.execute(
+                    "UPDATE borrowers SET name = ?, phone = ?, email = ? WHERE borrower_id = ?",
+                    (name, phone, email, borrower_id),
+                )
+        except sqlite3.IntegrityError as e:
+            raise DuplicateError(message) from e
+
+    def delete(self, borrower_id):
+        with self._write() as cur:
+            if SQLiteReceipts(self.pool).has_open(borrower_id):
+                raise Exception("Người mượn còn phiếu chưa trả — không thể xoá.")
+            cur.execute("DELETE FROM loans WHERE borrower_id = ?", (borrower_id,))
+            cur.execute("DELETE FROM loan_receipts WHERE borrower_id = ?", (borrower_id,))
+            cur.execute("DELETE FROM borrowers WHERE borrower_id = ?", (borrower_id,))
+
+
+# === PHIẾU MƯỢN / LOANS ===
+class SQLiteReceipts(_Repo, ReceiptRepository):
+    def has_open(self, borrower_id) -> bool:
+        row = self._fetchone(
+            "SELECT 1 FROM loan_receipts WHERE borrower_id = ? AND return_date IS NULL LIMIT 1",
+            (borrower_id,),
+        )
+        return row is not None
+
+    def create(self, borrower_id, due_date, book_ids, employee_id=None) -> int:
+        book_ids = check_receipt_books(book_ids)
+        now = datetime.datetime.now()
+        due_dt = datetime.datetime.combine(due_date, datetime.time()) if due_date else None
+
+        # Một transaction BEGIN IMMEDIATE: lỗi ở bất kỳ bước nào thì không còn gì thay đổi
+        with self._write() as cur:
+            if self.has_open(borrower_id):
+                raise Exception("Độc giả đang có phiếu mượn chưa trả, không thể lập phiếu mới.")
+            borrower = cur.execute(
+                "SELECT name FROM borrowers WHERE borrower_id = ?", (borrower_id,)
+            ).fetchone()
+            if borrower is None:
+                raise Exception(f"Không tìm thấy độc giả ID {borrower_id}.")
+
+            # Giữ sách (compare-and-set), sách nào không đổi được thì báo đúng sách đó
+            failed = [
+                b_id
+                for b_id in book_ids
+                if cur.execute(_SQL_CHECKOUT, (STATUS_ON_LOAN, b_id, *_AVAILABLE_PARAMS)).rowcount == 0
+            ]
+            if failed:
+                ids = ", ".join(str(b) for b in failed)
+                raise BooksUnavailable(f"Sách ID {ids} không tồn tại hoặc hiện không có sẵn.", failed)
+
+            marks = ", ".join("?" for _ in book_ids)
+            info = {
+                r["book_id"]: r
+                for r in cur.execute(
+                    f"SELECT book_id, title, category FROM books WHERE book_id IN ({marks})", book_ids
+                )
+            }
+            cur.execute(
+                "INSERT INTO loan_receipts (borrower_id, borrow_date, due_date, employee_id) VALUES (?, ?, ?, ?)",
+                (borrower_id, now, due_dt, employee_id),
+            )
+            receipt_id = cur.lastrowid
+            cur.executemany(
+                "INSERT INTO loans (receipt_id, borrower_id, borrower_name, book_id, book_title, "
+                "book_category, employee_id, borrow_date) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        receipt_id, borrower_id, borrower["name"], b_id,
+                        info[b_id]["title"] or "", info[b_id]["category"] or "", employee_id, now,
+                    )
+                    for b_id in book_ids
+                ],
+            )
+            cur.execute(
+                "UPDATE borrowers SET open_receipts = open_receipts + 1, total_receipts = total_receipts + 1, "
+                "total_loans = total_loans + ? WHERE borrower_id = ?",
+                (len(book_ids), borrower_id),
+            )
+        return receipt_id
+
+    def close(self, receipt_id) -> list[int]:
+        now = datetime.datetime.now()
+        with self._write() as cur:
+            book_ids = [
+                r["book_id"]
+                for r in cur.execute(
+                    "SELECT book_id FROM loans WHERE receipt_id = ? AND return_date IS NULL ORDER BY loan_id",
+                    (receipt_id,),
+                )
+            ]
+            cur.execute(
+                "UPDATE loans SET return_date = ?, is_returned = 1 WHERE receipt_id = ? AND return_date IS NULL",
+                (now, receipt_id),
+            )
+            # Chỉ trừ bộ đếm khi phiếu thực sự chuyển từ mở sang đóng
+            owner = cur.execute(
+                "SELECT borrower_id FROM loan_receipts WHERE receipt_id = ? AND return_date IS NULL",
+                (receipt_id,),
+            ).fetchone()
+            if owner is not None:
+                cur.execute("UPDATE loan_receipts SET return_date = ? WHERE receipt_id = ?", (now, receipt_id))
+                cur.execute(
+                    "UPDATE borrowers SET open_receipts = open_receipts - 1 "
+                    "WHERE borrower_id = ? AND open_receipts > 0",
+                    (owner["borrower_id"],),
+                )
+            # Sách đã bị đổi sang trạng thái khác (Hỏng, Mất...) được giữ nguyên
+            return [
+                b_id
+                for b_id in book_ids
+                if cur.execute(_SQL_CHECKIN, (STATUS_AVAILABLE, b_id, *_ON_LOAN_PARAMS)).rowcount == 0
+            ]
+
+    def list_for_borrower(self, borrower_id) -> list[tuple]:
+        rows = self._fetchall(
+            "SELECT r.receipt_id, r.borrow_date, r.due_date, r.return_date, "
+            "       (SELECT COUNT(*) FROM loans l WHERE l.receipt_id = r.receipt_id) AS book_count "
+            "FROM loan_receipts r WHERE r.borrower_id = ? "
+            "ORDER BY r.borrow_date DESC, r.receipt_id DESC",
+            (borrower_id,),
+        )
+        return [
+            (
+                r["receipt_id"],
+                r["borrow_date"],
+                r["due_date"],
+                r["return_date"],
+                r["book_count"],
+                "Đang mượn" if r["return_date"] is None else "Đã trả",
+            )
+            for r in rows
+        ]
+
+
+class SQLiteLoans(_Repo, LoanRepository):
+    def book_on_loan(self, book_id) -> bool:
+        row = self._fetchone(
+            "SELECT 1 FROM loans WHERE book_id = ? AND is_returned = 0 LIMIT 1", (int(book_id),)
+        )
+        return row is not None
+
+    def receipt_lines(self, receipt_id) -> list[tuple]:
+        rows = self._fetchall(
+            "SELECT l.book_id, COALESCE(b.title, l.book_title, '') AS title, l.borrow_date, l.return_date "
+            "FROM loans l LEFT JOIN books b ON b.book_id = l.book_id "
+            "WHERE l.receipt_id = ? ORDER BY l.loan_id",
+            (receipt_id,),
+        )
+        return [(r["book_id"], r["title"], r["borrow_date"], r["return_date"]) for r in rows]
+
+
+# === NHÂN VIÊN ===
+_EMPLOYEE_FIELDS = ("name", "position", "username", "password", "schedule_days")
+
+
+def _employee(row) -> dict | None:
+    if row is None:
+        return None
+    doc = dict(row)
+    doc["is_admin"] = bool(doc["is_admin"])
+    return doc
+
+
+class SQLiteEmployees(_Repo, EmployeeRepository):
+    def find_login(self, username, password):
+        return _employee(
+            self._fetchone("SELECT * FROM employees WHERE username = ? AND password = ?", (username, password))
+        )
+
+    def list(self, keyword=""):
+        if keyword:
+            pattern = _like_pattern(fold(keyword))
+            rows = self._fetchall(
+                "SELECT * FROM employees WHERE is_admin = 0 "
+                "AND (fold(name) LIKE ? ESCAPE '\\' OR fold(position) LIKE ? ESCAPE '\\') ORDER BY employee_id",
+                (pattern, pattern),
+            )
+        else:
+            rows = self._fetchall("SELECT * FROM employees WHERE is_admin = 0 ORDER BY employee_id")
+        return [_employee(r) for r in rows]
+
+    def get(self, employee_id):
+        return _employee(self._fetchone("SELECT * FROM employees WHERE employee_id = ?", (employee_id,)))
+
+    def add(self, name, position, username, password, schedule_days, is_admin: bool = False) -> int:
+        try:
+            with self._write() as cur:
+                cur.execute(
+                    "INSERT INTO employees (name, position, username, password, is_admin, work_date, schedule_days) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (name, position, username, password, int(is_admin), datetime.datetime.now(), schedule_days),
+                )
+                return cur.lastrowid
+        except sqlite3.IntegrityError as e:
+            raise DuplicateError(str(e)) from e
+
+    def update(self, employee_id, fields):
+        fields = {k: v for k, v in fields.items() if k in _EMPLOYEE_FIELDS}
+        if not fields:
+            return
+        names = sorted(fields)   # cùng tập trường -> cùng câu lệnh -> dùng lại bản đã biên dịch
+        try:
+            with self._write() as cur:
+                cur.execute(
+                    f"UPDATE employees SET {', '.join(f'{n} = ?' for n in names)} WHERE employee_id = ?",
+                    (*(fields[n] for n in names), employee_id),
+                )
+        except sqlite3.IntegrityError as e:
+            raise DuplicateError(str(e)) from e
+
+    def delete(self, employee_id):
+        with self._write() as cur:
+            cur.execute("DELETE FROM employees WHERE employee_id = ?", (employee_id,))
+
+
+# === LOG ===
+class SQLiteLogs(_Repo, LogRepository):
+    def append(self, log_class, entry):
+        with self._write() as cur:
+            cur.execute(
+                "INSERT INTO system_logs (log_class, action, created_at, entry) VALUES (?, ?, ?, ?)",
+                (
+                    log_class,
+                    entry.get("action"),
+                    entry.get("time") or datetime.datetime.now(),
+                    json.dumps(entry, ensure_ascii=False, default=str),
+                ),
+            )
+
+
+class SQLiteStorage(Storage):
+    name = "sqlite"
+
+    def __init__(self, options: dict | None = None):
+        opts = {**DEFAULT_SQLITE_OPTIONS, **(options or {})}
+        path = Path(opts["sqlite_path"])
+        if not path.is_absolute():
+            path = CONFIG_FILE.parent / path
+        self.path = path
+        self.busy_timeout = int(opts["busy_timeout_ms"]) / 1000
+        self.cached_statements = int(opts["cached_statements"])
+        self.pool = SQLConnectionPool(self._connect, max_size=int(opts["pool_size"]))
+
+        self.books = SQLiteBooks(self.pool)
+        self.borrowers = SQLiteBorrowers(self.pool)
+        self.receipts = SQLiteReceipts(self.pool)
+        self.loans = SQLiteLoans(self.pool)
+        self.employees = SQLiteEmployees(self.pool)
+        self.logs = SQLiteLogs(self.pool)
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            isolation_level="IMMEDIATE",   # transaction ghi giữ khoá ngay từ đầu, không deadlock khi nâng khoá
+            check_same_thread=False,       # pool đảm bảo mỗi lúc chỉ một thread dùng kết nối
+            cached_statements=self.cached_statements,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.create_function("fold", 1, fold, deterministic=True)
+        conn.create_function("status_key", 1, normalize_status, deterministic=True)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")   # an toàn với WAL, không fsync mỗi commit
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    def bootstrap(self):
+        with self.pool.connection() as conn:
+            conn.executescript(SCHEMA)
+            # Dữ liệu cũ: SĐT / email trống lưu '' -> NULL (xem SQLiteBorrowers._contact)
+            conn.execute("UPDATE borrowers SET phone = NULL WHERE phone = ''")
+            conn.execute("UPDATE borrowers SET email = NULL WHERE email = ''")
+            conn.commit()
+
+    def close(self):
+        try:
+            with self.pool.connection() as conn:
+                conn.execute("PRAGMA optimize")   # cập nhật thống kê cho query planner
+        except Exception as e:
+            print("SQLite optimize error:", e)
+        self.pool.close_all()
+
+
+def open_storage(options: dict) -> SQLiteStorage:
+    return SQLiteStorage(options)
+
+
+if __name__ == "__main__":
+    from database.config import load_config
+
+    args = sys.argv[1:]
+    storage = SQLiteStorage(load_config().get("storage"))
+    storage.bootstrap()
+    if "--add-admin" in args:
+        i = args.index("--add-admin")
+        username, password = args[i + 1], args[i + 2]
+        emp_id = storage.employees.add("Quản trị viên", "Admin", username, password, "", is_admin=True)
+        print(f"Đã tạo tài khoản admin {username} (employee_id={emp_id}).")
+    else:
+        print(f"Schema SQLite sẵn sàng: {storage.path}")
+    storage.close()
@@ -0,0 +1,95 @@
+# test_sql_pool.py
+# Chạy thử pool kết nối với sqlite3 thay cho SQL Server:
+#     python -m database.test_sql_pool
+import sqlite3
+import threading
+import time
+
+from database.sql_pool import PoolClosed, PoolTimeout, SQLConnectionPool
+
+print("=== TEST SQL POOL (sqlite3) ===")
+
+DB = "file:test_sql_pool?mode=memory&cache=shared"
+keeper = sqlite3.connect(DB, uri=True)  # giữ DB trong bộ nhớ suốt bài test
+keeper.execute("CREATE TABLE loans (loan_id INTEGER PRIMARY KEY, book_id INT)")
+keeper.commit()
+
+
+def factory():
+    return sqlite3.connect(DB, uri=True, check_same_thread=False)
+
+
+pool = SQLConnectionPool(factory, max_size=2, check_after=0.05, timeout=0.2)
+
+# 1. Nhiều câu lệnh trong một unit of work: 1 lần mượn kết nối, commit một lần
+with pool.unit_of_work() as cur:
+    cur.execute("INSERT INTO loans (book_id) VALUES (?)", (1,))
+    with pool.unit_of_work() as inner:   # lồng nhau: cùng kết nối, cùng transaction
+        inner.execute("INSERT INTO loans (book_id) VALUES (?)", (2,))
+assert keeper.execute("SELECT COUNT(*) FROM loans").fetchone()[0] == 2
+assert pool.stats()["checkouts"] == 1, pool.stats()
+print("Unit of work lồng nhau: 1 kết nối, commit khi khối ngoài kết thúc")
+
+# 2. Lỗi giữa chừng -> rollback toàn bộ
+try:
+    with pool.unit_of_work() as cur:
+        cur.execute("INSERT INTO loans (book_id) VALUES (?)", (3,))
+        raise RuntimeError("lỗi giả lập")
+except RuntimeError:
+    pass
+assert keeper.execute("SELECT COUNT(*) FROM loans").fetchone()[0] == 2
+print("Lỗi trong unit of work: đã rollback")
+
+# 3. Kết nối được dùng lại
+before = pool.stats()
+with pool.connection() as conn:
+    conn.execute("SELECT 1")
+after = pool.stats()
+assert after["created"] == before["created"] and after["reused"] == before["reused"] + 1, after
+print("Kết nối được dùng lại từ pool")
+
+# 4. Kết nối hỏng bị phát hiện khi kiểm tra sức khoẻ
+with pool.connection() as conn:
+    broken = conn
+broken.close()
+time.sleep(0.1)  # quá check_after -> kiểm tra trước khi cho mượn
+with pool.connection() as conn:
+    assert conn is not broken
+    conn.execute("SELECT 1")
+assert pool.stats()["health_failures"] == 1, pool.stats()
+print("Kết nối hỏng bị loại, mở kết nối mới")
+
+# 5. Mỗi thread một kết nối; hết chỗ thì báo PoolTimeout
+hold = threading.Event()
+release = threading.Event()
+
+
+def worker():
+    with pool.connection():
+        hold.set()
+        release.wait(2)
+
+
+threads = [threading.Thread(target=worker) for _ in range(2)]
+for t in threads:
+    t.start()
+    hold.wait(1)
+    hold.clear()
+try:
+    with pool.connection():
+        raise AssertionError("pool phải hết chỗ")
+except PoolTimeout:
+    print("Pool đầy: PoolTimeout sau thời gian chờ")
+release.set()
+for t in threads:
+    t.join()
+
+pool.close_all()
+print(pool.stats())
+try:
+    with pool.connection():
+        pass
+    raise AssertionError("pool đã đóng thì không được cho mượn")
+except PoolClosed:
+    print("Sau close_all(): PoolClosed")
+print("TEST SQL POOL: THÀNH CÔNG!")
@@ -0,0 +1,138 @@
+# test_storage_sqlite.py
+# Chạy thử backend SQLite (không cần MongoDB / SQL Server):
+#     python -m database.test_storage_sqlite
+import datetime
+import tempfile
+import time
+from pathlib import Path
+
+from database.storage.base import BooksUnavailable, DuplicateError
+from database.storage.sqlite import SQLiteStorage
+
+print("=== TEST STORAGE SQLITE ===")
+
+tmp = tempfile.TemporaryDirectory()
+storage = SQLiteStorage({"sqlite_path": str(Path(tmp.name) / "library.db"), "pool_size": 2})
+storage.bootstrap()
+storage.bootstrap()   # chạy lại không lỗi (IF NOT EXISTS)
+
+with storage.pool.connection() as conn:
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+print("Schema tạo xong, journal_mode = WAL")
+
+# 1. Sách + tìm không dấu theo tiền tố
+b1 = storage.books.add("Văn học Việt Nam", "Nguyễn Du", 1820, "Văn học")
+b2 = storage.books.add("Lập trình Python", "Guido", 2020, "Lập trình")
+b3 = storage.books.add("Đời thừa", "Nam Cao", 1943, "Văn học")
+assert [r[0] for r in storage.books.list_page()["rows"]] == [b1, b2, b3]
+assert [r[0] for r in storage.books.list_page("van hoc")["rows"]] == [b1, b3]
+assert [r[0] for r in storage.books.list_page("doi")["rows"]] == [b3]
+assert [r[0] for r in storage.books.list_page("PYTH")["rows"]] == [b2]
+storage.books.update(b2, "Lập trình Go", "Rob Pike", 2015, "Lập trình", "Có sẵn")
+assert storage.books.list_page("python")["rows"] == []
+print("Thêm / sửa sách, tìm 'van hoc' / 'doi' / 'PYTH' khớp đúng")
+
+# 2. Độc giả: trùng SĐT bị chặn
+r1 = storage.borrowers.add("Trần Thị Bình", "0901", "binh@example.com")
+try:
+    storage.borrowers.add("Khác", "0901", None)
+    raise AssertionError("phải báo trùng SĐT")
+except Exception as e:
+    assert "SĐT" in str(e)
+rows, total = storage.borrowers.list_page("binh")
+assert total == 1 and rows[0][0] == r1 and rows[0][6] == "Vừa thêm"
+# không có email: lưu NULL, nhiều độc giả cùng trống vẫn thêm được
+r_a = storage.borrowers.add("Không email A", "0902", "")
+r_b = storage.borrowers.add("Không email B", "0903", "")
+try:
+    storage.borrowers.update(r_b, "Không email B", "0902", "")
+    raise AssertionError("phải báo trùng SĐT khi sửa")
+except DuplicateError:
+    pass
+storage.borrowers.delete(r_a)
+storage.borrowers.delete(r_b)
+print("Độc giả: tìm không dấu, chặn trùng SĐT, cho nhiều email trống")
+
+# 3. Lập phiếu: sách không có sẵn -> không thay đổi gì
+storage.books.update(b3, "Đời thừa", "Nam Cao", 1943, "Văn học", "Hỏng")
+try:
+    storage.receipts.create(r1, datetime.date.today(), [b1, b3])
+    raise AssertionError("phải báo sách không có sẵn")
+except BooksUnavailable as e:
+    assert e.book_ids == [b3]
+assert not storage.loans.book_on_loan(b1)
+assert storage.books.list_page()["rows"][0][5] == "Có sẵn"
+print("Phiếu lỗi được rollback, sách vẫn 'Có sẵn'")
+
+rid = storage.receipts.create(r1, datetime.date.today() + datetime.timedelta(days=7), [b1, b2], employee_id=1)
+assert storage.receipts.has_open(r1) and storage.loans.book_on_loan(b1)
+assert [l[0] for l in storage.loans.receipt_lines(rid)] == [b1, b2]
+rows, _ = storage.borrowers.list_page(only_borrowing=True)
+assert rows[0][4:6] == (1, 1)
+try:
+    storage.receipts.create(r1, None, [b3])
+    raise AssertionError("phải chặn phiếu thứ hai")
+except BooksUnavailable:
+    raise
+except Exception as e:
+    assert "chưa trả" in str(e)
+try:
+    storage.books.delete(b1)
+    raise AssertionError("không được xoá sách đang mượn")
+except Exception as e:
+    assert "đang được mượn" in str(e)
+print("Lập phiếu 2 sách, chặn phiếu thứ hai và xoá sách đang mượn")
+
+assert storage.receipts.close(rid) == []
+assert storage.receipts.close(rid) == []   # đóng lần hai không trừ bộ đếm thêm
+receipts = storage.receipts.list_for_borrower(r1)
+assert receipts[0][0] == rid and receipts[0][4] == 2 and receipts[0][5] == "Đã trả"
+assert isinstance(receipts[0][1], datetime.datetime)
+rows, _ = storage.borrowers.list_page(only_returned=True)
+assert rows[0][4:7] == (0, 1, "Đã trả hết")
+print("Trả phiếu: sách về 'Có sẵn', bộ đếm đúng")
+
+# status cũ viết khác kiểu vẫn là "có sẵn" (so khớp sau strip().lower())
+storage.books.update(b3, "Đời thừa", "Nam Cao", 1943, "Văn học", " AVAILABLE ")
+assert storage.receipts.close(storage.receipts.create(r1, None, [b3])) == []
+print("Status ' AVAILABLE ' vẫn cho mượn")
+
+# status 'đang mượn ' (dữ liệu cũ) vẫn được trả về 'Có sẵn'
+rid = storage.receipts.create(r1, None, [b3])
+storage.books.update(b3, "Đời thừa", "Nam Cao", 1943, "Văn học", "đang mượn ")
+assert storage.receipts.close(rid) == []
+assert storage.books.list_page("doi")["rows"][0][5] == "Có sẵn"
+print("Status 'đang mượn ' vẫn trả được")
+
+# xoá sách kèm lịch sử loans thì total_loans giảm theo
+storage.books.delete(b3)
+with storage.pool.connection() as conn:
+    assert conn.execute("SELECT total_loans FROM borrowers WHERE borrower_id = ?", (r1,)).fetchone()[0] == 2
+print("Xoá sách: total_loans của độc giả giảm theo")
+
+# 4. Nhân viên + log
+emp = storage.employees.add("Lê Văn An", "Thủ thư", "an", "123", "1,15")
+try:
+    storage.employees.add("Trùng", "Thủ thư", "an", "456", "")
+    raise AssertionError("phải báo trùng username")
+except DuplicateError:
+    pass
+assert storage.employees.find_login("an", "123")["employee_id"] == emp
+assert storage.employees.find_login("an", "sai") is None
+storage.employees.update(emp, {"position": "Trưởng quầy"})
+assert [e["position"] for e in storage.employees.list("truong")] == ["Trưởng quầy"]
+storage.logs.append("security", {"time": datetime.datetime.now(), "action": "login", "user": "an"})
+with storage.pool.connection() as conn:
+    assert conn.execute("SELECT COUNT(*) FROM system_logs").fetchone()[0] == 1
+print("Nhân viên: đăng nhập, chặn trùng username; ghi log")
+
+# 5. Độ trễ đọc cục bộ
+n = 1000
+t0 = time.perf_counter()
+for _ in range(n):
+    storage.employees.find_login("an", "123")
+print(f"find_login: {(time.perf_counter() - t0) / n * 1000:.3f} ms / lần")
+
+storage.close()
+tmp.cleanup()
+print("TEST STORAGE SQLITE: THÀNH CÔNG!")
@@ -0,0 +1,17 @@
+# database/text.py
+"""Chuẩn hoá chữ cho tìm kiếm không dấu (dùng chung cho MongoDB và SQLite)."""
+import re
+import unicodedata
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def fold(text) -> str:
+    """'Văn Học Đời' -> 'van hoc doi' (bỏ dấu, thường hoá, đ -> d)."""
+    s = unicodedata.normalize("NFD", str(text or ""))
+    s = "".join(ch for ch in s if unicodedata.category(ch) != "Mn")
+    return s.replace("đ", "d").replace("Đ", "D").lower()
+
+
+def words_of(text) -> list[str]:
+    return _WORD_RE.findall(fold(text))
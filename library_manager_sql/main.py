@@ -1,20 +1,40 @@
+import time
+
+_T0 = time.time()  # mốc đo thời gian tới lúc hiện cửa sổ login
+
+import importlib
+import sys
 import tkinter as tk
 from tkinter import messagebox
 
+# Chỉ import những gì cần để vẽ cửa sổ login; pymongo, các trang và
+# matplotlib được import khi dùng lần đầu (xem startup_profile.py)
 from ui.frames.login_frame import LoginFrame
-from ui.components.sidebar import Sidebar
-from ui.components.header import Header
-from ui.frames.books_frame import BooksFrame
-from ui.frames.borrowers_frame import BorrowersFrame
-from ui.frames.employees_frame import EmployeesFrame
-from ui.frames.statistics_frame import StatisticsFrame
-from database.db import get_collection
+from ui.tasks import run_async, shutdown_tasks
+
+# Thứ tự tạo trước (prefetch) các trang sau khi trang mặc định đã hiện
+# tên trang -> module chứa class cùng tên
+FRAME_CLASSES = {
+    "BooksFrame": "ui.frames.books_frame",
+    "BorrowersFrame": "ui.frames.borrowers_frame",
+    "EmployeesFrame": "ui.frames.employees_frame",
+    "StatisticsFrame": "ui.frames.statistics_frame",
+}
+PREFETCH_DELAY_MS = 400  # chờ giữa 2 lần tạo trang nền để giao diện luôn mượt
+# Trang chỉ chạy với một số backend (Thống kê đọc bảng tổng hợp của MongoDB)
+FRAME_BACKENDS = {"StatisticsFrame": ("mongodb",)}
 
 
+def available_frames(backend: str) -> list[str]:
+    return [n for n in FRAME_CLASSES if backend in FRAME_BACKENDS.get(n, (backend,))]
+
 
 class LibraryApp(tk.Tk):
     def __init__(self, user: dict):
         super().__init__()
+        from database.storage import get_storage
+        from ui.components.sidebar import Sidebar
+        from ui.components.header import Header
 
         # ===== LƯU THÔNG TIN USER ĐỂ CÁC FRAME KHÁC DÙNG =====
         self.current_user_id = user.get("employee_id")
@@ -44,8 +64,9 @@ class LibraryApp(tk.Tk):
         main = tk.Frame(self.container, bg="white")
         main.pack(fill="both", expand=True)
 
-        # Sidebar
-        self.sidebar = Sidebar(main, self.show_frame)
+        # Sidebar: chỉ các trang backend hiện tại hỗ trợ
+        self.pages = available_frames(get_storage().name)
+        self.sidebar = Sidebar(main, self.show_frame, pages=self.pages)
         self.sidebar.grid(row=0, column=0, sticky="ns")
 
         # Khu vực nội dung
@@ -55,42 +76,84 @@ class LibraryApp(tk.Tk):
         main.grid_rowconfigure(0, weight=1)
         main.grid_columnconfigure(1, weight=1)
 
-        # ===== CÁC FRAME CON =====
+        self.content_frame.grid_rowconfigure(0, weight=1)
+        self.content_frame.grid_columnconfigure(0, weight=1)
+
+        # ===== CÁC FRAME CON (tạo khi mở lần đầu) =====
         self.frames = {}
-        for F in (BooksFrame, BorrowersFrame, EmployeesFrame, StatisticsFrame):
-            frame = F(self.content_frame, self)
-            self.frames[F.__name__] = frame
-            frame.grid(row=0, column=0, sticky="nsew")
 
-        # Mặc định mở trang sách
+        # Mặc định mở trang sách, các trang khác tạo dần khi rảnh
         self.show_frame("BooksFrame")
+        self.after(PREFETCH_DELAY_MS, self._prefetch_next)
+
+    def _get_frame(self, name: str):
+        frame = self.frames.get(name)
+        if frame is None:
+            module = importlib.import_module(FRAME_CLASSES[name])
+            frame = getattr(module, name)(self.content_frame, self)
+            frame.grid(row=0, column=0, sticky="nsew")
+            frame.lower()  # tạo xong nằm dưới trang đang xem
+            self.frames[name] = frame
+        return frame
 
     def show_frame(self, name: str):
-        frame = self.frames[name]
+        if name not in self.pages:
+            return
+        frame = self._get_frame(name)
         frame.tkraise()
 
+    def _prefetch_next(self):
+        """Tạo (và cho tải dữ liệu nền) trang kế tiếp chưa mở, mỗi lần một trang."""
+        pending = [n for n in self.pages if n not in self.frames]
+        if not pending:
+            return
+
+        def _build():
+            try:
+                self._get_frame(pending[0])
+            except Exception as e:
+                print("Prefetch error:", e)
+            self.after(PREFETCH_DELAY_MS, self._prefetch_next)
+
+        self.after_idle(_build)
+
     def logout(self):
         if messagebox.askyesno("Đăng xuất", "Bạn có chắc muốn đăng xuất?"):
             self.destroy()
+            shutdown_tasks()
+            from database.storage import close_storage
+            close_storage()  # ghi nốt log đang chờ, trả kết nối trước khi đăng nhập lại
             main()  # quay lại màn hình login
 
 
+def _bootstrap_db():
+    """Chạy trên thread nền trong lúc người dùng nhập tài khoản."""
+    from database.storage import get_storage
+
+    # Kiểm tra kết nối + tạo index / schema còn thiếu (idempotent), theo backend trong config.json
+    storage = get_storage()
+    storage.bootstrap()
+    if storage.name == "mongodb":
+        # Bản sao mượn / trả từ SQL Server (nếu có): gửi ngay các sự kiện còn tồn
+        from database.loan_outbox import start_mirror_if_available
+        start_mirror_if_available()
+
+
 def main():
     """Khởi động app: mở form login trước."""
-    # ===== TEST KẾT NỐI MONGODB BẰNG get_collection =====
-    try:
-        books_col = get_collection("books")
-        # gọi thử 1 lệnh đơn giản để đảm bảo kết nối OK
-        _ = books_col.find_one({})
-    except Exception as e:
-        messagebox.showerror("Lỗi CSDL", f"Không thể kết nối MongoDB:\n{e}")
-        return
-
     # ===== CỬA SỔ GỐC CHO LOGIN =====
     root = tk.Tk()
     root.withdraw()  # Ẩn, chỉ làm parent cho LoginFrame
 
-    LoginFrame(
+    def _db_failed(e):
+        messagebox.showerror("Lỗi CSDL", f"Không thể kết nối CSDL:\n{e}", parent=root)
+        root.destroy()
+
+    probe = "--startup-probe" in sys.argv[1:]
+    if not probe:
+        run_async(root, "startup.db", _bootstrap_db, on_error=_db_failed)
+
+    login = LoginFrame(
         root,
         on_success=lambda user: (
             root.destroy(),
@@ -98,8 +161,17 @@ def main():
         )
     )
 
+    if probe:
+        # Chế độ đo của startup_profile.py: in thời gian tới lúc login hiện rồi thoát
+        login.update()
+        print(f"STARTUP_LOGIN_MS={(time.time() - _T0) * 1000:.1f}", flush=True)
+        root.after(0, root.destroy)
+
     root.mainloop()
 
 
 if __name__ == "__main__":
+    if "--profile-startup" in sys.argv[1:]:
+        import startup_profile
+        sys.exit(startup_profile.main())
     main()
@@ -2,6 +2,11 @@
 import random
 from datetime import datetime, timedelta
 from database.db import get_collection
+from database.sequences import reset_sequences
+from database.search import search_fields
+from database.cache import get_book, get_borrower
+from database.rollups import backfill
+from database.borrower_stats import repair
 
 def seed_borrowers_books_employees():
     borrowers_col = get_collection("borrowers")
@@ -16,6 +21,7 @@ def seed_borrowers_books_employees():
     employees_col.delete_many({})
     loans_col.delete_many({})
     receipts_col.delete_many({})
+    reset_sequences()  # counters sẽ tự đồng bộ theo ID lớn nhất sau khi seed
 
     today = datetime.today()
 
@@ -53,11 +59,12 @@ def seed_borrowers_books_employees():
     print("Tạo 500 sách...")
     categories = ["Lịch sử", "Khoa học", "Lập trình", "Văn học", "Thiếu nhi", "Kinh tế"]
     for book_id in range(1, 501):
-        books_col.insert_one({
+        book = {
             "book_id": book_id, "title": f"Sách {book_id}",
             "author": f"Tác giả {book_id}", "published_year": random.randint(1990, 2024),
             "category": random.choice(categories), "status": "Có sẵn"
-        })
+        }
+        books_col.insert_one({**book, **search_fields(book)})
 
     # === NGƯỜI MƯỢN ===
     print("Tạo 500 người mượn...")
@@ -100,9 +107,9 @@ def seed_borrowers_books_employees():
             num_books = random.randint(1, 5)
             book_ids = random.sample(range(1, 501), k=num_books)
 
+            borrower = get_borrower(borrower_id)
             for book_id in book_ids:
-                book = books_col.find_one({"book_id": book_id})
-                borrower = borrowers_col.find_one({"borrower_id": borrower_id})
+                book = get_book(book_id)
 
                 loan_doc = {
                     "loan_id": next_loan_id, "receipt_id": next_receipt_id,
@@ -125,6 +132,8 @@ def seed_borrowers_books_employees():
 
             next_receipt_id += 1
 
+    backfill()  # loans được insert thẳng nên dựng bảng tổng hợp thống kê một lần ở cuối
+    repair()    # và tính bộ đếm phiếu / lượt mượn trên từng độc giả
     print("HOÀN TẤT! Dữ liệu demo đã sẵn sàng cho thống kê!")
 
 # === CHỈ XÓA KHI XÁC NHẬN ===
@@ -0,0 +1,116 @@
+# startup_profile.py
+"""
+Đo thời gian khởi động tới lúc cửa sổ đăng nhập hiện ra.
+
+    python main.py --profile-startup            # báo cáo + ghi vào startup_profile.log
+    python main.py --profile-startup --top 30   # in 30 module tốn thời gian nhất
+
+Chạy lại main.py trong tiến trình con với `python -X importtime ... --startup-probe`:
+- tiến trình con in STARTUP_LOGIN_MS=... ngay khi form login vẽ xong rồi tự thoát
+- stderr chứa thời gian import từng module (self / cumulative, micro giây)
+Kết quả được so với ngân sách (LOGIN_BUDGET_MS, IMPORT_BUDGET_MS) và các module
+nặng không được phép nạp trước khi login (DEFERRED_MODULES).
+"""
+import os
+import re
+import subprocess
+import sys
+import time
+
+LOGIN_BUDGET_MS = 1500    # thời gian tới lúc hiện cửa sổ login
+IMPORT_BUDGET_MS = 400    # tổng thời gian import trước khi hiện login
+DEFERRED_MODULES = ("matplotlib", "pymongo", "bson", "pyodbc", "bcrypt")
+LOG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_profile.log")
+
+_IMPORT_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+_LOGIN_RE = re.compile(r"STARTUP_LOGIN_MS=([\d.]+)")
+
+
+def parse_importtime(stderr: str) -> list[dict]:
+    """Các dòng 'import time: self | cumulative | module' -> list dict (đơn vị ms)."""
+    rows = []
+    for line in stderr.splitlines():
+        m = _IMPORT_RE.match(line)
+        if not m:
+            continue
+        self_us, cum_us, indent, module = m.groups()
+        rows.append({
+            "module": module,
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cum_us) / 1000,
+            "top_level": len(indent) <= 1,   # import trực tiếp, không lồng trong module khác
+        })
+    return rows
+
+
+def run_probe() -> tuple[float | None, list[dict]]:
+    main_py = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", main_py, "--startup-probe"],
+        cwd=os.path.dirname(main_py),
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    m = _LOGIN_RE.search(proc.stdout)
+    if m is None:
+        raise Exception(f"Không đo được thời gian hiện login:\n{proc.stdout}\n{proc.stderr[-2000:]}")
+    return float(m.group(1)), parse_importtime(proc.stderr)
+
+
+def report(login_ms: float, rows: list[dict], top: int = 15) -> list[str]:
+    """In báo cáo, trả về danh sách vi phạm ngân sách (rỗng = đạt)."""
+    total_import = sum(r["cumulative_ms"] for r in rows if r["top_level"])
+    print("=== THỜI GIAN KHỞI ĐỘNG ===")
+    print(f"Tới lúc hiện login : {login_ms:8.1f} ms (ngân sách {LOGIN_BUDGET_MS} ms)")
+    print(f"Tổng thời gian import: {total_import:8.1f} ms (ngân sách {IMPORT_BUDGET_MS} ms)")
+    print(f"\n{top} module tốn thời gian nhất (cumulative):")
+    print(f"  {'cumulative':>10} {'self':>8}  module")
+    for r in sorted(rows, key=lambda r: r["cumulative_ms"], reverse=True)[:top]:
+        print(f"  {r['cumulative_ms']:10.1f} {r['self_ms']:8.1f}  {r['module']}")
+
+    problems = []
+    if login_ms > LOGIN_BUDGET_MS:
+        problems.append(f"login hiện sau {login_ms:.0f} ms > {LOGIN_BUDGET_MS} ms")
+    if total_import > IMPORT_BUDGET_MS:
+        problems.append(f"import mất {total_import:.0f} ms > {IMPORT_BUDGET_MS} ms")
+    loaded = {r["module"].split(".")[0] for r in rows}
+    for name in DEFERRED_MODULES:
+        if name in loaded:
+            problems.append(f"module '{name}' bị import trước khi hiện login")
+
+    print()
+    if problems:
+        print("VƯỢT NGÂN SÁCH:")
+        for p in problems:
+            print("  -", p)
+    else:
+        print("Đạt ngân sách khởi động.")
+    return problems
+
+
+def append_log(login_ms: float, rows: list[dict], problems: list[str]):
+    total_import = sum(r["cumulative_ms"] for r in rows if r["top_level"])
+    line = (
+        f"{time.strftime('%Y-%m-%d %H:%M:%S')}\t"
+        f"login_ms={login_ms:.1f}\timport_ms={total_import:.1f}\t"
+        f"modules={len(rows)}\t{'OK' if not problems else 'FAIL: ' + '; '.join(problems)}\n"
+    )
+    with open(LOG_FILE, "a", encoding="utf-8") as f:
+        f.write(line)
+
+
+def main() -> int:
+    args = sys.argv[1:]
+    top = 15
+    if "--top" in args:
+        top = int(args[args.index("--top") + 1])
+    login_ms, rows = run_probe()
+    problems = report(login_ms, rows, top=top)
+    append_log(login_ms, rows, problems)
+    print(f"Đã ghi kết quả vào {LOG_FILE}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
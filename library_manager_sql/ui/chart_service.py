@@ -0,0 +1,140 @@
+# ui/chart_service.py
+"""
+Vẽ biểu đồ thành ảnh PNG trên thread nền, có cache theo dữ liệu + kích thước.
+
+    key = chart_key("pie", data, width, height)
+    png = cached_chart(key)                        # bytes | None, gọi được trên thread Tk
+    png = render_pie(data, width, height, title)   # chạy trên thread nền (run_async)
+
+Chỉ dùng backend Agg (không đụng Tk) nên render được ngoài thread giao diện;
+thread Tk chỉ việc tạo tk.PhotoImage từ PNG đã vẽ xong (xem image_from_png).
+Kích thước được làm tròn theo SIZE_STEP để khi kéo giãn cửa sổ không phải vẽ
+lại với từng pixel, và quay lại kích thước cũ thì dùng lại ảnh trong cache.
+
+Module này thay cho FigureCanvasTkAgg + draw_idle trong StatisticsFrame (bản
+đó vẫn vẽ trên thread Tk). Hai ý của bản cũ vẫn giữ: chỉ một Figure được tạo
+và dùng lại (_get_figure), và số liệu không đổi thì không vẽ lại
+(StatisticsFrame so chart_key trước khi render).
+"""
+import base64
+import hashlib
+import io
+import threading
+
+from database.cache import LRUCache
+
+SIZE_STEP = 50          # px
+MIN_SIZE = 200
+DPI = 100
+
+_chart_cache = LRUCache("charts", maxsize=64, ttl=3600)
+_render_lock = threading.Lock()   # Figure của matplotlib không an toàn đa luồng
+_figure = None
+_canvas = None
+
+# Lề mặc định của matplotlib; đặt lại mỗi lần vẽ vì figure được dùng chung
+_DEFAULT_MARGINS = {"left": 0.125, "right": 0.9, "bottom": 0.11, "top": 0.88}
+
+
+def snap_size(width: int, height: int) -> tuple[int, int]:
+    """Làm tròn kích thước widget theo bước SIZE_STEP."""
+    w = max(MIN_SIZE, int(width) // SIZE_STEP * SIZE_STEP)
+    h = max(MIN_SIZE, int(height) // SIZE_STEP * SIZE_STEP)
+    return w, h
+
+
+def chart_key(kind: str, data, width: int, height: int) -> tuple:
+    digest = hashlib.sha1(repr((kind, list(data))).encode("utf-8")).hexdigest()
+    return (kind, digest, width, height)
+
+
+def cached_chart(key) -> bytes | None:
+    return _chart_cache.get(key)
+
+
+def _get_figure():
+    """Figure + canvas Agg dùng chung, tạo một lần (gọi khi đang giữ _render_lock)."""
+    global _figure, _canvas
+    if _figure is None:
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        _figure = Figure(dpi=DPI)
+        _canvas = FigureCanvasAgg(_figure)
+    return _figure, _canvas
+
+
+def _prepare(width: int, height: int, **margins):
+    """Xoá figure dùng chung, đặt kích thước + lề, trả về (canvas, ax) mới."""
+    fig, canvas = _get_figure()
+    fig.set_size_inches(width / DPI, height / DPI)
+    fig.clear()
+    fig.subplots_adjust(**{**_DEFAULT_MARGINS, **margins})
+    return canvas, fig.add_subplot(111)
+
+
+def render_pie(data, width: int, height: int, title: str = "") -> bytes:
+    """
+    Chạy trên thread nền: vẽ biểu đồ tròn [(nhãn, giá trị), ...] ra PNG.
+    Kết quả được lưu cache theo chart_key("pie", data, width, height).
+    """
+    key = chart_key("pie", data, width, height)
+    png = _chart_cache.get(key)
+    if png is not None:
+        return png
+
+    labels = [row[0] for row in data]
+    sizes = [row[1] for row in data]
+    with _render_lock:
+        canvas, ax = _prepare(width, height)
+        ax.pie(sizes, labels=labels, autopct="%1.1f%%", startangle=90)
+        if title:
+            ax.set_title(title, fontsize=12)
+        buf = io.BytesIO()
+        canvas.print_png(buf)
+    png = buf.getvalue()
+    _chart_cache.put(key, png)
+    return png
+
+
+def render_lines(labels: list[str], series: dict, width: int, height: int, title: str = "") -> bytes:
+    """
+    Chạy trên thread nền: vẽ biểu đồ đường, mỗi phần tử series {tên: [giá trị]}
+    là một đường trên trục labels. Cache theo chart_key("line", ...).
+    """
+    data = (tuple(labels), tuple((k, tuple(v)) for k, v in series.items()), title)
+    key = chart_key("line", data, width, height)
+    png = _chart_cache.get(key)
+    if png is not None:
+        return png
+
+    x = range(len(labels))
+    step = max(1, len(labels) // 10)   # tối đa ~10 nhãn trên trục ngang
+    with _render_lock:
+        canvas, ax = _prepare(width, height, left=0.07, right=0.98, bottom=0.2, top=0.9)
+        for name, values in series.items():
+            ax.plot(x, values, marker="o" if len(labels) <= 60 else None, markersize=3, label=name)
+        ax.set_xticks(list(x)[::step])
+        ax.set_xticklabels(labels[::step], rotation=30, ha="right", fontsize=8)
+        ax.set_ylim(bottom=0)
+        ax.grid(True, alpha=0.3)
+        if len(series) > 1:
+            ax.legend(fontsize=8, loc="upper left")
+        if title:
+            ax.set_title(title, fontsize=12)
+        buf = io.BytesIO()
+        canvas.print_png(buf)
+    png = buf.getvalue()
+    _chart_cache.put(key, png)
+    return png
+
+
+def image_from_png(png: bytes):
+    """Tạo tk.PhotoImage từ PNG (phải gọi trên thread Tk)."""
+    import tkinter as tk
+
+    return tk.PhotoImage(data=base64.b64encode(png).decode("ascii"))
+
+
+def chart_cache_stats() -> dict:
+    return _chart_cache.stats()
@@ -0,0 +1,31 @@
+import tkinter as tk
+
+
+class BusyIndicator(tk.Label):
+    """Nhãn 'Đang tải...' hiện khi còn ít nhất một việc nền đang chạy."""
+
+    FRAMES = ('⠋', '⠙', '⠹', '⠸', '⠼', '⠴', '⠦', '⠧', '⠇', '⠏')
+
+    def __init__(self, parent, text='Đang tải...', bg='white'):
+        super().__init__(parent, text='', bg=bg, fg='#1f6feb', font=('Segoe UI', 9))
+        self._text = text
+        self._count = 0
+        self._tick = 0
+        self._job = None
+
+    def start(self):
+        self._count += 1
+        if self._job is None:
+            self._animate()
+
+    def stop(self):
+        self._count = max(0, self._count - 1)
+        if self._count == 0 and self._job is not None:
+            self.after_cancel(self._job)
+            self._job = None
+            self.config(text='')
+
+    def _animate(self):
+        self.config(text=f'{self.FRAMES[self._tick % len(self.FRAMES)]} {self._text}')
+        self._tick += 1
+        self._job = self.after(100, self._animate)
@@ -1,7 +1,7 @@
 import tkinter as tk
 
 class Sidebar(tk.Frame):
-    def __init__(self, parent, on_select):
+    def __init__(self, parent, on_select, pages=None):
         super().__init__(parent, bg='#0f1724', width=220)
         self.on_select = on_select
         self.pack_propagate(0)
@@ -12,6 +12,8 @@ class Sidebar(tk.Frame):
             ('Thống kê', 'StatisticsFrame'),
         ]
         for text, name in buttons:
+            if pages is not None and name not in pages:
+                continue  # trang không dùng được với backend hiện tại
             b = tk.Button(self, text=text, fg='white', bg='#0b1220', activebackground='#1f6feb', relief='flat',
                           font=('Segoe UI', 10, 'bold'), command=lambda n=name: self.on_select(n))
             b.pack(fill='x', padx=12, pady=8, ipadx=5, ipady=8)
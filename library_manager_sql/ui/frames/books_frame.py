@@ -2,123 +2,43 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 
-from database.db import get_collection
+from database.storage import get_storage
+from ui.components.busy import BusyIndicator
+from ui.tasks import run_async, run_write
 
 
-# ===================== Helpers về ID tăng dần =====================
+# ===================== QUERY HELPERS (qua database/storage) =====================
 
-def _get_next_id(collection_name: str, field: str) -> int:
-    col = get_collection(collection_name)
-    doc = col.find_one(sort=[(field, -1)])
-    return int(doc[field]) + 1 if doc and field in doc else 1
-
-
-# ===================== QUERY HELPERS (Mongo) =====================
-
-def _list_books(keyword: str | None = None):
+def _list_books(keyword: str | None = None, after=None):
     """
-    Trả về list tuple cho Treeview:
-    (book_id, title, author, year, category, status)
-    Chỉ lấy các document có trường book_id (bỏ qua dữ liệu test cũ không chuẩn).
+    Trả về 1 trang cho Treeview:
+        {"rows": [(book_id, title, author, year, category, status), ...],
+         "next": con trỏ trang sau | None, "prev": ...}
+    Không có từ khoá: danh mục theo book_id; có từ khoá: tìm không dấu, xếp theo độ khớp.
     """
-    books = get_collection("books")
-    query = {}
-    kw = (keyword or "").strip()
-    if kw:
-        regex = {"$regex": kw, "$options": "i"}
-        query = {
-            "$or": [
-                {"title": regex},
-                {"author": regex},
-                {"category": regex},
-            ]
-        }
-
-    docs = list(books.find(query))
-    # Chỉ lấy những doc có book_id, sort theo book_id tăng dần
-    docs = [d for d in docs if "book_id" in d]
-    docs.sort(key=lambda d: int(d.get("book_id", 0)))
-
-    rows = []
-    for d in docs:
-        rows.append(
-            (
-                int(d.get("book_id")),
-                d.get("title", ""),
-                d.get("author", ""),
-                d.get("published_year", ""),
-                d.get("category", ""),
-                d.get("status", "Có sẵn"),
-            )
-        )
-    return rows
+    return get_storage().books.list_page(keyword, after)
 
 
 def _book_in_open_loan(book_id: int) -> bool:
-    """
-    Kiểm tra sách có đang được mượn không:
-    loans: is_returned != True hoặc return_date == None
-    """
-    loans = get_collection("loans")
-    doc = loans.find_one(
-        {
-            "book_id": int(book_id),
-            "$or": [
-                {"return_date": None},
-                {"is_returned": {"$ne": True}},
-            ],
-        }
-    )
-    return doc is not None
+    """Kiểm tra sách có đang được mượn không (còn loans chưa trả)."""
+    return get_storage().loans.book_on_loan(book_id)
 
 
 def _add_book(title: str, author: str, year: int | None,
              category: str, status: str = "Có sẵn") -> int:
-    books = get_collection("books")
-    new_id = _get_next_id("books", "book_id")
-    books.insert_one(
-        {
-            "book_id": new_id,
-            "title": title,
-            "author": author,
-            "published_year": year,
-            "category": category,
-            "status": status or "Có sẵn",
-        }
-    )
-    return new_id
+    return get_storage().books.add(title, author, year, category, status)
 
 
 def _update_book(book_id: int, title: str, author: str,
                  year: int | None, category: str, status: str):
-    books = get_collection("books")
-    books.update_one(
-        {"book_id": int(book_id)},
-        {
-            "$set": {
-                "title": title,
-                "author": author,
-                "published_year": year,
-                "category": category,
-                "status": status,
-            }
-        },
-    )
+    get_storage().books.update(book_id, title, author, year, category, status)
 
 
 def _delete_book(book_id: int):
     """
     Không cho xóa nếu sách đang được mượn (có loans chưa trả).
     """
-    if _book_in_open_loan(book_id):
-        raise Exception("Sách này đang được mượn, không thể xóa.")
-
-    books = get_collection("books")
-    loans = get_collection("loans")
-
-    # Xóa lịch sử loan liên quan tới sách này (nếu muốn giữ FK mềm)
-    loans.delete_many({"book_id": int(book_id)})
-    books.delete_one({"book_id": int(book_id)})
+    get_storage().books.delete(book_id)
 
 
 # ===================== FORM THÊM / SỬA SÁCH =====================
@@ -242,6 +162,8 @@ class BooksFrame(tk.Frame):
                   command=self.on_search).pack(side="left", padx=(0, 4))
         tk.Button(top, text="Làm mới", bg="#7f8c8d", fg="white",
                   command=self.reload).pack(side="left")
+        self.busy = BusyIndicator(top)
+        self.busy.pack(side="right")
 
         # Table
         self.tree = ttk.Treeview(
@@ -261,9 +183,24 @@ class BooksFrame(tk.Frame):
             self.tree.heading(key, text=text)
             self.tree.column(key, width=width, anchor=anchor)
 
-        self.tree.pack(fill="both", expand=True, padx=16, pady=(0, 10))
+        table = tk.Frame(self, bg="white")
+        table.pack(fill="both", expand=True, padx=16, pady=(0, 4))
+        self.scroll = ttk.Scrollbar(table, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self._on_tree_scroll)
+        self.tree.pack(in_=table, side="left", fill="both", expand=True)
+        self.scroll.pack(side="right", fill="y")
         self.tree.bind("<<TreeviewSelect>>", self._on_select)
 
+        # Tải thêm trang kế tiếp (hoặc tự tải khi cuộn tới cuối bảng)
+        more = tk.Frame(self, bg="white")
+        more.pack(fill="x", padx=16, pady=(0, 6))
+        self.btn_more = tk.Button(more, text="Tải thêm", command=self.load_more, state="disabled")
+        self.btn_more.pack(side="right")
+        self.lbl_count = tk.Label(more, text="", bg="white", fg="#7f8c8d")
+        self.lbl_count.pack(side="right", padx=8)
+        self._keyword = ""
+        self._next_cursor = None
+
         # Buttons
         btns = tk.Frame(self, bg="white")
         btns.pack(pady=(0, 10))
@@ -281,16 +218,62 @@ class BooksFrame(tk.Frame):
     def _fill_table(self, rows):
         for i in self.tree.get_children():
             self.tree.delete(i)
+        self._append_rows(rows)
+        self._selected_id = None
+
+    def _append_rows(self, rows):
         for row in rows:
             self.tree.insert("", "end", values=row)
-        self._selected_id = None
+
+    def _show_page(self, page, append=False):
+        if append:
+            self._append_rows(page["rows"])
+        else:
+            self._fill_table(page["rows"])
+        self._next_cursor = page["next"]
+        self.btn_more.config(state="normal" if self._next_cursor else "disabled")
+        shown = len(self.tree.get_children())
+        self.lbl_count.config(text=f"Đang hiển thị {shown} sách" + (" (còn nữa)" if self._next_cursor else ""))
+
+    def _load(self, after=None, on_error=None):
+        append = after is not None
+        run_async(
+            self, "books.page", _list_books, self._keyword, after,
+            on_done=lambda page: self._show_page(page, append=append),
+            on_error=on_error,
+            busy=self.busy,
+        )
+
+    def _show_error(self, exc):
+        messagebox.showerror("Lỗi", str(exc), parent=self)
 
     def reload(self):
-        self._fill_table(_list_books())
+        self._keyword = ""
         self.var_kw.set("")
+        self._load()
 
     def on_search(self):
-        self._fill_table(_list_books(self.var_kw.get()))
+        self._keyword = self.var_kw.get()
+        self._load()
+
+    def load_more(self):
+        if self._next_cursor is None:
+            return
+        cursor, self._next_cursor = self._next_cursor, None  # tránh tải trùng khi cuộn tiếp
+        self.btn_more.config(state="disabled")
+        self._load(after=cursor, on_error=lambda e: self._load_more_failed(cursor, e))
+
+    def _load_more_failed(self, cursor, exc):
+        # Trả lại con trỏ để người dùng bấm "Tải thêm" / cuộn lại được
+        self._next_cursor = cursor
+        self.btn_more.config(state="normal")
+        messagebox.showerror("Lỗi CSDL", f"Không thể tải dữ liệu:\n{exc}", parent=self)
+
+    def _on_tree_scroll(self, first, last):
+        self.scroll.set(first, last)
+        # Người dùng đã cuộn xuống tới đáy -> tự tải trang kế tiếp
+        if float(first) > 0 and float(last) >= 1.0 and self._next_cursor is not None:
+            self.after_idle(self.load_more)
 
     def _on_select(self, _e=None):
         sel = self.tree.selection()
@@ -313,14 +296,15 @@ class BooksFrame(tk.Frame):
         if not dlg.result:
             return
         d = dlg.result
-        try:
-            new_id = _add_book(
-                d["title"], d["author"], d["year"], d["category"], d["status"]
-            )
+
+        def _done(new_id):
             messagebox.showinfo("Thành công", f"Đã thêm sách #{new_id}.", parent=self)
             self.reload()
-        except Exception as e:
-            messagebox.showerror("Lỗi", str(e), parent=self)
+
+        run_write(
+            self, _add_book, d["title"], d["author"], d["year"], d["category"], d["status"],
+            on_done=_done, on_error=self._show_error, busy=self.busy,
+        )
 
     def on_edit(self):
         if not self._need_sel():
@@ -342,19 +326,16 @@ class BooksFrame(tk.Frame):
             return
 
         d = dlg.result
-        try:
-            _update_book(
-                self._selected_id,
-                d["title"],
-                d["author"],
-                d["year"],
-                d["category"],
-                d["status"],
-            )
+
+        def _done(_):
             messagebox.showinfo("Thành công", "Đã cập nhật sách.", parent=self)
             self.reload()
-        except Exception as e:
-            messagebox.showerror("Lỗi", str(e), parent=self)
+
+        run_write(
+            self, _update_book,
+            self._selected_id, d["title"], d["author"], d["year"], d["category"], d["status"],
+            on_done=_done, on_error=self._show_error, busy=self.busy,
+        )
 
     def on_delete(self):
         if not self._need_sel():
@@ -365,9 +346,12 @@ class BooksFrame(tk.Frame):
             parent=self,
         ):
             return
-        try:
-            _delete_book(self._selected_id)
+
+        def _done(_):
             messagebox.showinfo("Thành công", "Đã xóa sách.", parent=self)
             self.reload()
-        except Exception as e:
-            messagebox.showerror("Lỗi", str(e), parent=self)
\ No newline at end of file
+
+        run_write(
+            self, _delete_book, self._selected_id,
+            on_done=_done, on_error=self._show_error, busy=self.busy,
+        )
\ No newline at end of file
@@ -8,178 +8,64 @@ from tkinter import ttk, messagebox
 # Cho phép chạy trực tiếp trong VS Code
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
 
-from database.db import get_collection
+from database.storage import get_storage
+from ui.components.busy import BusyIndicator
+from ui.tasks import run_async, run_write
 
-# ============================= DB HELPERS (MONGO) =============================
+# ============================= DB HELPERS (qua database/storage) =============================
 
-def _stats_by_borrower() -> dict:
-    """
-    Trả về map:
-        { borrower_id: {"total_receipts": x, "open_receipts": y} }
-
-    Đếm theo collection loan_receipts (mỗi phiếu = 1 lượt).
-    """
-    receipts = get_collection("loan_receipts")
-    pipeline = [
-        {
-            "$group": {
-                "_id": "$borrower_id",
-                "total_receipts": {"$sum": 1},
-                "open_receipts": {
-                    "$sum": {
-                        "$cond": [{"$eq": ["$return_date", None]}, 1, 0]
-                    }
-                },
-            }
-        }
-    ]
-    stats = {}
-    for doc in receipts.aggregate(pipeline):
-        stats[int(doc["_id"])] = {
-            "total_receipts": int(doc.get("total_receipts", 0) or 0),
-            "open_receipts": int(doc.get("open_receipts", 0) or 0),
-        }
-    return stats
+PAGE_SIZE = 100
 
 
 def _build_rows(
     keyword: str | None = None,
     only_returned: bool = False,
     only_borrowing: bool = False,
+    page: int = 0,
+    page_size: int = PAGE_SIZE,
 ):
     """
-    Tạo list row cho Treeview:
+    Lọc từ khoá + trạng thái theo bộ đếm lưu sẵn trên borrowers rồi cắt đúng 1 trang.
+
+    Trả về (rows, total) với rows là list tuple cho Treeview:
     (borrower_id, name, phone, email, open_receipts, total_receipts, status_text)
     """
-    borrowers_col = get_collection("borrowers")
-    stats_map = _stats_by_borrower()
-
-    base_filter: dict = {}
-
-    if keyword:
-        kw = keyword.strip()
-        if kw:
-            base_filter = {
-                "$or": [
-                    {"phone": {"$regex": kw, "$options": "i"}},
-                    {"name": {"$regex": kw, "$options": "i"}},
-                ]
-            }
-
-    borrowers = list(
-        borrowers_col.find(base_filter).sort("borrower_id", 1)
-    )
-
-    rows = []
-    for b in borrowers:
-        bid = int(b.get("borrower_id"))
-        st = stats_map.get(bid, {"total_receipts": 0, "open_receipts": 0})
-        total = st["total_receipts"]
-        open_cnt = st["open_receipts"]
-
-        # Lọc theo trạng thái đã trả hết / đang mượn
-        if only_returned:
-            if not (total > 0 and open_cnt == 0):
-                continue
-        if only_borrowing:
-            if open_cnt == 0:
-                continue
+    return get_storage().borrowers.list_page(keyword, only_returned, only_borrowing, page, page_size)
 
-        if total == 0:
-            status_text = "Vừa thêm"
-        elif open_cnt > 0:
-            status_text = "Đang mượn"
-        else:
-            status_text = "Đã trả hết"
-
-        rows.append(
-            (
-                bid,
-                b.get("name", ""),
-                b.get("phone", ""),
-                b.get("email", ""),
-                open_cnt,   # số phiếu đang mượn
-                total,      # tổng số phiếu (đã + đang)
-                status_text,
-            )
-        )
-    return rows
+
+def _fetch_page(query: dict, page: int):
+    """Chạy trên thread nền: trả về (rows, total, page) — lùi về trang cuối nếu trang không còn."""
+    rows, total = _build_rows(page=page, **query)
+    pages = max(1, -(-total // PAGE_SIZE))
+    if page >= pages and page > 0:
+        page = pages - 1
+        rows, total = _build_rows(page=page, **query)
+    return rows, total, page
 
 
 def _has_open_loans(borrower_id: int) -> bool:
     """Kiểm tra người mượn còn phiếu chưa trả không (đếm theo loan_receipts)."""
-    receipts = get_collection("loan_receipts")
-    count = receipts.count_documents(
-        {"borrower_id": borrower_id, "return_date": None}
-    )
-    return count > 0
+    return get_storage().receipts.has_open(borrower_id)
 
 
 def _book_exists(book_id: int) -> bool:
-    books = get_collection("books")
-    return books.count_documents({"book_id": book_id}) > 0
+    return get_storage().books.exists(book_id)
 
 
 def _add_borrower(name: str, phone: str | None, email: str | None) -> int:
-    borrowers = get_collection("borrowers")
-    conditions = []
-    if phone:
-        conditions.append({"phone": phone})
-    if email:
-        conditions.append({"email": email})
-
-    if conditions:
-        existing = borrowers.count_documents({"$or": conditions})
-        if existing > 0:
-            raise Exception("SĐT hoặc Email đã tồn tại, vui lòng kiểm tra lại.")
-    last = borrowers.find_one(sort=[("borrower_id", -1)])
-    new_id = int(last["borrower_id"]) + 1 if last else 1
-    doc = {
-        "borrower_id": new_id,
-        "name": name,
-        "phone": phone,
-        "email": email,
-    }
-    borrowers.insert_one(doc)
-    return new_id
-    
+    return get_storage().borrowers.add(name, phone, email)
+
 
 def _update_borrower(bid: int, name: str, phone: str | None, email: str | None):
-    borrowers = get_collection("borrowers")
-    conditions = []
-    if phone:
-        conditions.append({"phone": phone})
-    if email:
-        conditions.append({"email": email})
-
-    if conditions:
-        existing = borrowers.count_documents({
-            "borrower_id": {"$ne": bid},
-            "$or": conditions
-        })
-        if existing > 0:
-            raise Exception("SĐT hoặc Email đã được dùng bởi độc giả khác.")
-
-    borrowers.update_one(
-        {"borrower_id": bid},
-        {"$set": {"name": name, "phone": phone, "email": email}},
-    )
+    get_storage().borrowers.update(bid, name, phone, email)
+
 
 def _delete_borrower(bid: int):
     """
     XÓA CỨNG: chỉ cho xoá nếu không còn phiếu đang mượn
     (phiếu = loan_receipts; sách trong phiếu = loans).
     """
-    if _has_open_loans(bid):
-        raise Exception("Người mượn còn phiếu chưa trả — không thể xoá.")
-
-    borrowers = get_collection("borrowers")
-    loans = get_collection("loans")
-    receipts = get_collection("loan_receipts")
-
-    loans.delete_many({"borrower_id": bid})
-    receipts.delete_many({"borrower_id": bid})
-    borrowers.delete_one({"borrower_id": bid})
+    get_storage().borrowers.delete(bid)
 
 
 def _create_receipt(
@@ -192,95 +78,14 @@ def _create_receipt(
     Tạo 1 phiếu (loan_receipts + loans) cho tối đa 5 sách.
     Chỉ cho phép nếu KHÔNG còn phiếu mở.
     """
-    if not (1 <= len(book_ids) <= 5):
-        raise Exception("Một phiếu phải có từ 1 đến 5 sách.")
-
-    if _has_open_loans(borrower_id):
-        raise Exception("Độc giả đang có phiếu mượn chưa trả, không thể lập phiếu mới.")
-
-    books = get_collection("books")
-    loans = get_collection("loans")
-    receipts = get_collection("loan_receipts")
-
-    # Kiểm tra sách tồn tại & đang 'Có sẵn'
-    for b_id in book_ids:
-        bk = books.find_one({"book_id": b_id})
-        if not bk:
-            raise Exception(f"Sách ID {b_id} không tồn tại.")
-        status = str(bk.get("status", "")).strip().lower()
-        if status not in ["có sẵn", "co san", "available", "", "0"]:
-            raise Exception(f"Sách ID {b_id} hiện không có sẵn (status={bk.get('status')}).")
-
-    # receipt_id auto tăng = max + 1
-    last_receipt = receipts.find_one(sort=[("receipt_id", -1)])
-    receipt_id = int(last_receipt["receipt_id"]) + 1 if last_receipt else 1
-
-    borrow_dt = datetime.datetime.now()
-    if due_date:
-        due_dt = datetime.datetime.combine(due_date, datetime.time())
-    else:
-        due_dt = None
-
-    receipt_doc = {
-        "receipt_id": receipt_id,
-        "borrower_id": borrower_id,
-        "borrow_date": borrow_dt,
-        "due_date": due_dt,
-        "return_date": None,
-        "employee_id": employee_id,
-        "note": None,
-    }
-    receipts.insert_one(receipt_doc)
-
-    # loan_id auto tăng
-    last_loan = loans.find_one(sort=[("loan_id", -1)])
-    next_loan_id = int(last_loan["loan_id"]) + 1 if last_loan else 1
-
-    for b_id in book_ids:
-        loan_doc = {
-            "loan_id": next_loan_id,
-            "receipt_id": receipt_id,
-            "borrower_id": borrower_id,
-            "book_id": b_id,
-            "employee_id": employee_id,
-            "borrow_date": borrow_dt,
-            "return_date": None,
-            "is_returned": False,
-        }
-        loans.insert_one(loan_doc)
-        next_loan_id += 1
-
-        books.update_one(
-            {"book_id": b_id},
-            {"$set": {"status": "Đang mượn"}},
-        )
-
-    return receipt_id
+    return get_storage().receipts.create(borrower_id, due_date, book_ids, employee_id)
 
 
 def _list_receipts(borrower_id: int):
     """
     Danh sách phiếu: (receipt_id, borrow_date, due_date, return_date, book_count, status)
     """
-    receipts = get_collection("loan_receipts")
-    loans = get_collection("loans")
-
-    all_receipts = list(
-        receipts.find({"borrower_id": borrower_id}).sort(
-            [("borrow_date", -1), ("receipt_id", -1)]
-        )
-    )
-
-    result = []
-    for r in all_receipts:
-        rid = int(r["receipt_id"])
-        borrow_date = r.get("borrow_date")
-        due_date = r.get("due_date")
-        return_date = r.get("return_date")
-        book_count = loans.count_documents({"receipt_id": rid})
-        status = "Đang mượn" if return_date is None else "Đã trả"
-        result.append((rid, borrow_date, due_date, return_date, book_count, status))
-    return result
+    return get_storage().receipts.list_for_borrower(borrower_id)
 
 
 def _receipt_lines(receipt_id: int):
@@ -288,54 +93,15 @@ def _receipt_lines(receipt_id: int):
     Chi tiết sách trong phiếu:
         (book_id, title, borrow_date, return_date)
     """
-    loans = get_collection("loans")
-    books = get_collection("books")
-
-    lines = []
-    for l in loans.find({"receipt_id": receipt_id}).sort("loan_id", 1):
-        book_id = int(l["book_id"])
-        bk = books.find_one({"book_id": book_id}) or {}
-        lines.append(
-            (
-                book_id,
-                bk.get("title", ""),
-                l.get("borrow_date"),
-                l.get("return_date"),
-            )
-        )
-    return lines
-
-
-def _close_receipt(receipt_id: int):
-    """Trả toàn bộ sách trong một phiếu."""
-    loans = get_collection("loans")
-    receipts = get_collection("loan_receipts")
-    books = get_collection("books")
-
-    now = datetime.datetime.now()
-
-    # cập nhật loans
-    loans.update_many(
-        {"receipt_id": receipt_id, "return_date": None},
-        {"$set": {"return_date": now, "is_returned": True}},
-    )
-
-    # cập nhật loan_receipts
-    receipts.update_one(
-        {"receipt_id": receipt_id, "return_date": None},
-        {"$set": {"return_date": now}},
-    )
-
-    # đưa sách về 'Có sẵn'
-    book_ids = {
-        int(l["book_id"])
-        for l in loans.find({"receipt_id": receipt_id})
-    }
-    if book_ids:
-        books.update_many(
-            {"book_id": {"$in": list(book_ids)}},
-            {"$set": {"status": "Có sẵn"}},
-        )
+    return get_storage().loans.receipt_lines(receipt_id)
+
+
+def _close_receipt(receipt_id: int) -> list[int]:
+    """
+    Trả toàn bộ sách trong một phiếu.
+    Trả về các mã sách không đưa được về 'Có sẵn' (đã bị đổi sang Hỏng/Mất...).
+    """
+    return get_storage().receipts.close(receipt_id)
 
 # ============================= MODAL FORM =============================
 
@@ -428,6 +194,19 @@ class BorrowersFrame(tk.Frame):
             side="left"
         )
 
+        # Phân trang
+        pager = tk.Frame(top, bg="white")
+        pager.pack(side="right")
+        tk.Button(pager, text="◀ Trước", command=self.prev_page, width=8).pack(side="left")
+        self.lbl_page = tk.Label(pager, text="", bg="white", width=26)
+        self.lbl_page.pack(side="left", padx=4)
+        tk.Button(pager, text="Sau ▶", command=self.next_page, width=8).pack(side="left")
+        self.busy = BusyIndicator(pager)
+        self.busy.pack(side="left", padx=(8, 0))
+        self._query: dict = {}
+        self._page = 0
+        self._total = 0
+
         # Bảng borrowers
         self.tree = ttk.Treeview(
             self,
@@ -509,23 +288,56 @@ class BorrowersFrame(tk.Frame):
             )
         self._selected_id = None
 
-    def reload(self):
+    def _load_page(self, then=None):
+        def _done(result):
+            rows, self._total, self._page = result
+            pages = max(1, -(-self._total // PAGE_SIZE))
+            self._fill_table(rows)
+            self.lbl_page.config(text=f"Trang {self._page + 1}/{pages} ({self._total} độc giả)")
+            if then is not None:
+                then()
+
+        run_async(
+            self, "borrowers.page", _fetch_page, dict(self._query), self._page,
+            on_done=_done, busy=self.busy,
+        )
+
+    def _run_query(self, **query):
+        self.clear_panel()
+        self._query = query
+        self._page = 0
+        self._load_page()
+
+    def refresh(self, then=None):
+        """Tải lại trang hiện tại, giữ nguyên từ khoá / bộ lọc."""
         self.clear_panel()
-        self._fill_table(_build_rows())
+        self._load_page(then)
+
+    def reload(self):
+        self._run_query()
         self.var_kw.set("")
 
     def on_search(self):
-        self.clear_panel()
         kw = (self.var_kw.get() or "").strip()
-        self._fill_table(_build_rows(keyword=kw))
+        self._run_query(keyword=kw)
 
     def filter_returned(self):
-        self.clear_panel()
-        self._fill_table(_build_rows(only_returned=True))
+        self._run_query(only_returned=True)
 
     def filter_borrowing(self):
-        self.clear_panel()
-        self._fill_table(_build_rows(only_borrowing=True))
+        self._run_query(only_borrowing=True)
+
+    def next_page(self):
+        if (self._page + 1) * PAGE_SIZE < self._total:
+            self.clear_panel()
+            self._page += 1
+            self._load_page()
+
+    def prev_page(self):
+        if self._page > 0:
+            self.clear_panel()
+            self._page -= 1
+            self._load_page()
 
     # -------- selection ----------
     def _on_select(self, _e=None):
@@ -545,18 +357,24 @@ class BorrowersFrame(tk.Frame):
             return False
         return True
 
+    def _show_error(self, exc):
+        messagebox.showerror("Lỗi", str(exc), parent=self)
+
     # -------- CRUD ----------
     def on_add(self):
         dlg = MemberForm(self, "Thêm độc giả")
         if not dlg.result:
             return
         name, phone, email = dlg.result
-        try:
-            bid = _add_borrower(name, phone, email)
+
+        def _done(bid):
             messagebox.showinfo("Thành công", f"Đã thêm độc giả #{bid}.", parent=self)
             self.reload()
-        except Exception as e:
-            messagebox.showerror("Lỗi", str(e), parent=self)
+
+        run_write(
+            self, _add_borrower, name, phone, email,
+            on_done=_done, on_error=self._show_error, busy=self.busy,
+        )
 
     def on_edit(self):
         if not self._need_sel():
@@ -570,13 +388,16 @@ class BorrowersFrame(tk.Frame):
         if not dlg.result:
             return
 
-        try:
-            name, phone, email = dlg.result
-            _update_borrower(self._selected_id, name, phone, email)
+        name, phone, email = dlg.result
+
+        def _done(_):
             messagebox.showinfo("Thành công", "Đã cập nhật.", parent=self)
             self.reload()
-        except Exception as e:
-            messagebox.showerror("Lỗi", str(e), parent=self)
+
+        run_write(
+            self, _update_borrower, self._selected_id, name, phone, email,
+            on_done=_done, on_error=self._show_error, busy=self.busy,
+        )
 
     def on_delete(self):
         if not self._need_sel():
@@ -587,13 +408,16 @@ class BorrowersFrame(tk.Frame):
             parent=self,
         ):
             return
-        try:
-            _delete_borrower(self._selected_id)
+
+        def _done(_):
             messagebox.showinfo("Thành công", "Đã xoá độc giả.", parent=self)
             self.reload()
             self.clear_panel()
-        except Exception as e:
-            messagebox.showerror("Lỗi", str(e), parent=self)
+
+        run_write(
+            self, _delete_borrower, self._selected_id,
+            on_done=_done, on_error=self._show_error, busy=self.busy,
+        )
 
     # -------- Panel helpers ----------
     def clear_panel(self):
@@ -605,14 +429,23 @@ class BorrowersFrame(tk.Frame):
     def show_create_receipt_panel(self):
         if not self._need_sel():
             return
-        if _has_open_loans(self._selected_id):
-            messagebox.showwarning(
-                "Không thể lập phiếu",
-                "Độc giả còn phiếu đang mượn, hãy trả trước.",
-                parent=self,
-            )
-            return
+        bid = self._selected_id
+
+        def _done(has_open):
+            if bid != self._selected_id:
+                return  # đã chọn người khác trong lúc chờ
+            if has_open:
+                messagebox.showwarning(
+                    "Không thể lập phiếu",
+                    "Độc giả còn phiếu đang mượn, hãy trả trước.",
+                    parent=self,
+                )
+                return
+            self._build_create_receipt_panel()
+
+        run_async(self, "borrowers.panel", _has_open_loans, bid, on_done=_done, busy=self.busy)
 
+    def _build_create_receipt_panel(self):
         self.clear_panel()
         wrapper = tk.Frame(self.detail_panel, bg="#f7f9fc")
         wrapper.pack(fill="x", padx=8, pady=8)
@@ -712,16 +545,22 @@ class BorrowersFrame(tk.Frame):
             )
             return
 
-        try:
-            current_bid = self._selected_id
-            rid = _create_receipt(current_bid, due, ids)
-            messagebox.showinfo("Thành công", f"Đã lập phiếu #{rid}.", parent=self)
-            self.reload()
+        current_bid = self._selected_id
+
+        def _reselect():
             if current_bid is not None:
                 self._select_row_by_id(current_bid)
                 self.show_receipt_detail_panel()
-        except Exception as e:
-            messagebox.showerror("Lỗi", str(e), parent=self)
+
+        def _done(rid):
+            messagebox.showinfo("Thành công", f"Đã lập phiếu #{rid}.", parent=self)
+            self.refresh(then=_reselect)
+
+        run_write(
+            self, _create_receipt,
+            current_bid, due, ids, getattr(self.controller, "current_user_id", None),
+            on_done=_done, on_error=self._show_error, busy=self.busy,
+        )
 
     def _select_row_by_id(self, bid: int):
         for iid in self.tree.get_children():
@@ -805,15 +644,23 @@ class BorrowersFrame(tk.Frame):
     def _reload_receipts_inline(self):
         for i in getattr(self, "tv_r", []).get_children():
             self.tv_r.delete(i)
-        for rid, borrow, due, returned, cnt, status in _list_receipts(self._selected_id):
-            self.tv_r.insert(
-                "",
-                "end",
-                values=(rid, borrow, due or "", returned or "", cnt, status),
-            )
         for i in getattr(self, "tv_l", []).get_children():
             self.tv_l.delete(i)
 
+        def _done(receipts):
+            for rid, borrow, due, returned, cnt, status in receipts:
+                self.tv_r.insert(
+                    "",
+                    "end",
+                    values=(rid, borrow, due or "", returned or "", cnt, status),
+                )
+
+        # gắn với tv_r: panel bị đóng trước khi có kết quả thì bỏ qua
+        run_async(
+            self.tv_r, "borrowers.receipts", _list_receipts, self._selected_id,
+            on_done=_done, busy=self.busy,
+        )
+
     def _on_select_receipt_inline(self, _e=None):
         sel = self.tv_r.selection()
         for i in self.tv_l.get_children():
@@ -822,8 +669,12 @@ class BorrowersFrame(tk.Frame):
             return
         rid = int(self.tv_r.item(sel[0])["values"][0])
         self._selected_receipt_id = rid
-        for b, t, bd, rd in _receipt_lines(rid):
-            self.tv_l.insert("", "end", values=(b, t or "", bd, rd or ""))
+
+        def _done(lines):
+            for b, t, bd, rd in lines:
+                self.tv_l.insert("", "end", values=(b, t or "", bd, rd or ""))
+
+        run_async(self.tv_l, "borrowers.lines", _receipt_lines, rid, on_done=_done, busy=self.busy)
 
     def _on_close_receipt_inline(self):
         if self._selected_receipt_id is None:
@@ -835,10 +686,16 @@ class BorrowersFrame(tk.Frame):
             parent=self,
         ):
             return
-        try:
-            _close_receipt(rid)
-            messagebox.showinfo("Thành công", "Đã trả phiếu.", parent=self)
-            self._reload_receipts_inline()
-            self.reload()
-        except Exception as e:
-            messagebox.showerror("Lỗi", str(e), parent=self)
+
+        def _done(skipped):
+            msg = "Đã trả phiếu."
+            if skipped:
+                ids = ", ".join(str(b) for b in skipped)
+                msg += f"\nSách ID {ids} không ở trạng thái đang mượn nên giữ nguyên tình trạng."
+            messagebox.showinfo("Thành công", msg, parent=self)
+            self.refresh()
+
+        run_write(
+            self, _close_receipt, rid,
+            on_done=_done, on_error=self._show_error, busy=self.busy,
+        )
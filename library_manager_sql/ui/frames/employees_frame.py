@@ -2,7 +2,15 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 import datetime
 
-from database.db import get_collection
+from database.storage import get_storage
+from database.storage.base import DuplicateError
+from ui.components.busy import BusyIndicator
+from ui.tasks import run_async, run_write
+
+
+def _find_employees(keyword: str = "") -> list[dict]:
+    """Danh sách nhân viên (trừ admin), lọc theo tên / chức vụ nếu có từ khoá."""
+    return get_storage().employees.list(keyword)
 
 
 def _status_today_from_schedule(schedule_days: str | None) -> str:
@@ -17,12 +25,6 @@ def _status_today_from_schedule(schedule_days: str | None) -> str:
     return "Có lịch làm" if str(today) in days else "Nghỉ"
 
 
-def _get_next_employee_id(col):
-    """Tìm employee_id lớn nhất và +1 (giống IDENTITY trong SQL)."""
-    last = col.find_one(sort=[("employee_id", -1)])
-    return (last.get("employee_id", 0) if last else 0) + 1
-
-
 class EmployeesFrame(tk.Frame):
     def __init__(self, parent, controller=None):
         super().__init__(parent, bg="white")
@@ -66,6 +68,9 @@ class EmployeesFrame(tk.Frame):
             command=self.load_data,
         ).pack(side="left", padx=3)
 
+        self.busy = BusyIndicator(frame)
+        self.busy.pack(side="right")
+
     # table data
     def create_table(self):
         columns = (
@@ -179,27 +184,21 @@ class EmployeesFrame(tk.Frame):
 
     # load and tìm kiếm 
     def load_data(self):
-        try:
-            col = get_collection("employees")
-            cursor = col.find({"is_admin": {"$ne": True}}).sort("employee_id", 1)
-            self._load_from_cursor(cursor)
-        except Exception as e:
-            messagebox.showerror("Lỗi CSDL", f"Không thể tải dữ liệu:\n{e}")
+        run_async(
+            self, "employees.list", _find_employees,
+            on_done=self._load_from_cursor,
+            on_error=lambda e: messagebox.showerror("Lỗi CSDL", f"Không thể tải dữ liệu:\n{e}"),
+            busy=self.busy,
+        )
 
     def search(self):
         keyword = self.search_entry.get().strip()
-        try:
-            col = get_collection("employees")
-            cond = {"is_admin": {"$ne": True}}
-            if keyword:
-                cond["$or"] = [
-                    {"name": {"$regex": keyword, "$options": "i"}},
-                    {"position": {"$regex": keyword, "$options": "i"}},
-                ]
-            cursor = col.find(cond).sort("employee_id", 1)
-            self._load_from_cursor(cursor)
-        except Exception as e:
-            messagebox.showerror("Lỗi", f"Lỗi khi tìm kiếm:\n{e}")
+        run_async(
+            self, "employees.list", _find_employees, keyword,
+            on_done=self._load_from_cursor,
+            on_error=lambda e: messagebox.showerror("Lỗi", f"Lỗi khi tìm kiếm:\n{e}"),
+            busy=self.busy,
+        )
 
     # add_employee
     def add_employee(self):
@@ -257,28 +256,15 @@ class EmployeesFrame(tk.Frame):
 
             schedule_string = ",".join(selected_days)
 
-            try:
-                col = get_collection("employees")
-                new_id = _get_next_employee_id(col)
-
-                doc = {
-                    "employee_id": new_id,
-                    "name": name,
-                    "position": position,
-                    "username": username,
-                    "password": password,
-                    "is_admin": False,
-                    "work_date": datetime.datetime.now(),
-                    "schedule_days": schedule_string,
-                }
-                col.insert_one(doc)
-
+            def _done(_):
                 messagebox.showinfo("Thành công", "Đã thêm nhân viên mới.", parent=form)
                 form.destroy()
                 self.load_data()
-            except Exception as e:
+
+            def _error(e):
+                btn_save.config(state="normal")
                 # kiểm tra trùng username
-                if "E11000" in str(e):
+                if isinstance(e, DuplicateError):
                     messagebox.showwarning(
                         "Lỗi Trùng Lặp",
                         "Tên tài khoản này đã tồn tại.\nVui lòng nhập tài khoản khác.",
@@ -291,14 +277,22 @@ class EmployeesFrame(tk.Frame):
                         parent=form,
                     )
 
-        tk.Button(
+            # gắn với form: form bị đóng trước khi xong thì bỏ qua thông báo
+            btn_save.config(state="disabled")  # chặn bấm "Lưu" hai lần
+            run_write(
+                form, get_storage().employees.add, name, position, username, password, schedule_string,
+                on_done=_done, on_error=_error,
+            )
+
+        btn_save = tk.Button(
             form,
             text="Lưu",
             bg="#2ecc71",
             fg="white",
             width=10,
             command=save_employee,
-        ).place(x=120, y=460)
+        )
+        btn_save.place(x=120, y=460)
 
         tk.Button(
             form,
@@ -324,8 +318,7 @@ class EmployeesFrame(tk.Frame):
         can_edit_password = is_admin or int(emp_id) == int(current_user_id)
 
         try:
-            col = get_collection("employees")
-            emp = col.find_one({"employee_id": emp_id})
+            emp = get_storage().employees.get(emp_id)
             if not emp:
                 return messagebox.showerror("Lỗi", "Không tìm thấy nhân viên này.")
         except Exception as e:
@@ -402,24 +395,23 @@ class EmployeesFrame(tk.Frame):
 
             schedule_string = ",".join(selected_days)
 
-            try:
-                col = get_collection("employees")
-                update_doc = {
-                    "name": name,
-                    "position": position,
-                    "username": username,
-                    "schedule_days": schedule_string,
-                }
-                if can_edit_password:
-                    update_doc["password"] = password
-
-                col.update_one({"employee_id": emp_id}, {"$set": update_doc})
+            update_doc = {
+                "name": name,
+                "position": position,
+                "username": username,
+                "schedule_days": schedule_string,
+            }
+            if can_edit_password:
+                update_doc["password"] = password
 
+            def _done(_):
                 messagebox.showinfo("Thành công", "Cập nhật thành công.", parent=form)
                 form.destroy()
                 self.load_data()
-            except Exception as e:
-                if "E11000" in str(e):
+
+            def _error(e):
+                btn_save.config(state="normal")
+                if isinstance(e, DuplicateError):
                     messagebox.showwarning(
                         "Lỗi Trùng Lặp",
                         "Tên tài khoản này đã tồn tại.\nVui lòng sử dụng tài khoản khác!",
@@ -428,14 +420,21 @@ class EmployeesFrame(tk.Frame):
                 else:
                     messagebox.showerror("Lỗi", f"Lỗi khi cập nhật:\n{e}", parent=form)
 
-        tk.Button(
+            btn_save.config(state="disabled")  # chặn bấm "Lưu" hai lần
+            run_write(
+                form, get_storage().employees.update, emp_id, update_doc,
+                on_done=_done, on_error=_error,
+            )
+
+        btn_save = tk.Button(
             form,
             text="Lưu",
             bg="#2ecc71",
             fg="white",
             width=10,
             command=update,
-        ).place(x=120, y=460)
+        )
+        btn_save.place(x=120, y=460)
 
         tk.Button(
             form,
@@ -460,20 +459,22 @@ class EmployeesFrame(tk.Frame):
         ):
             return
 
-        try:
-            col = get_collection("employees")
-            col.delete_one({"employee_id": emp_id})
+        def _done(_):
             messagebox.showinfo("Thành công", "Đã xóa nhân viên.")
             self.load_data()
-        except Exception as e:
-            messagebox.showerror("Lỗi", f"Lỗi khi xóa:\n{e}")
+
+        run_write(
+            self, get_storage().employees.delete, emp_id,
+            on_done=_done,
+            on_error=lambda e: messagebox.showerror("Lỗi", f"Lỗi khi xóa:\n{e}"),
+            busy=self.busy,
+        )
 
     #check today
     def check_today(self):
         """Xem hôm nay có những ai có lịch làm (dựa trên schedule_days)."""
         try:
-            col = get_collection("employees")
-            all_emp = list(col.find({"is_admin": {"$ne": True}}))
+            all_emp = get_storage().employees.list()
             today = datetime.datetime.now().day
 
             names_today = []
@@ -1,6 +1,26 @@
+import datetime
 import tkinter as tk
 from tkinter import messagebox
-from database.db import get_collection   # ✅ dùng get_collection, KHÔNG import db/check_login
+from ui.tasks import run_async
+
+
+def _find_employee(username: str, password: str):
+    """Chạy trên thread nền: tìm nhân viên theo tài khoản / mật khẩu, ghi log đăng nhập."""
+    # import ở đây để cửa sổ login hiện ra trước khi nạp backend (pymongo / sqlite3)
+    from database.storage import get_storage
+    storage = get_storage()
+    doc = storage.employees.find_login(username, password)
+    try:
+        # Cùng dạng với library_system.log_action; loại "security" (xem database/audit.py)
+        storage.logs.append("security", {
+            "time": datetime.datetime.now(datetime.timezone.utc),
+            "user": username,
+            "action": "login",
+            "success": doc is not None,
+        })
+    except Exception as e:
+        print("Login log error:", e)   # không ghi được log thì vẫn cho đăng nhập
+    return doc
 
 
 class LoginFrame(tk.Toplevel):
@@ -58,7 +78,7 @@ class LoginFrame(tk.Toplevel):
         self.txt_pass = tk.Entry(frm, width=28, show="*")
         self.txt_pass.grid(row=1, column=1)
 
-        btn = tk.Button(
+        self.btn_login = btn = tk.Button(
             self,
             text="Đăng nhập",
             bg="#1f6feb",
@@ -84,20 +104,26 @@ class LoginFrame(tk.Toplevel):
             self.lbl_msg.config(text="Vui lòng nhập tài khoản và mật khẩu")
             return
 
-        try:
-            employees = get_collection("employees")
-            doc = employees.find_one({
-                "username": username,
-                "password": password
-            })
-        except Exception as e:
-            messagebox.showerror(
-                "Lỗi kết nối",
-                f"Không thể kết nối MongoDB:\n{e}",
-                parent=self
-            )
-            return
+        self.btn_login.config(state="disabled")
+        self.lbl_msg.config(text="Đang kiểm tra...", fg="#1f6feb")
+        run_async(
+            self, "login", _find_employee, username, password,
+            on_done=self._on_login_result,
+            on_error=self._on_login_error,
+        )
+
+    def _on_login_error(self, e):
+        self.btn_login.config(state="normal")
+        self.lbl_msg.config(text="", fg="red")
+        messagebox.showerror(
+            "Lỗi kết nối",
+            f"Không thể kết nối MongoDB:\n{e}",
+            parent=self
+        )
 
+    def _on_login_result(self, doc):
+        self.btn_login.config(state="normal")
+        self.lbl_msg.config(text="", fg="red")
         if doc:
             # Chuẩn hoá object user truyền sang LibraryApp
             user = {
@@ -1,12 +1,77 @@
 # ui/frames/statistics_frame.py
+import datetime
 import tkinter as tk
-from tkinter import ttk
-
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib.pyplot as plt
+from tkinter import messagebox, ttk
 
 # Lấy hàm thống kê từ MongoDB (đã viết trong database/db.py)
 from database.db import get_top_category, get_top_borrower
+from database.cache import query_stats
+from database.dashboard import get_kpis
+from database.rollups import loan_trend
+from ui.chart_service import cached_chart, chart_key, image_from_png, render_lines, render_pie, snap_size
+from ui.components.busy import BusyIndicator
+from ui.tasks import run_async
+
+CHART_TITLE = "Tỉ lệ mượn theo thể loại"
+CHART_DEFAULT_SIZE = (500, 500)
+RESIZE_DEBOUNCE_MS = 150
+FOOTER_REFRESH_MS = 5000
+KPI_REFRESH_MS = 30000
+
+# (khoá trong dashboard.get_kpis(), nhãn, màu)
+KPI_CARDS = [
+    ("books_total", "Tổng số sách", "#34495e"),
+    ("books_available", "Có sẵn", "#27ae60"),
+    ("books_on_loan", "Đang mượn", "#2980b9"),
+    ("receipts_open", "Phiếu đang mở", "#8e44ad"),
+    ("receipts_overdue", "Phiếu quá hạn", "#c0392b"),
+    ("active_borrowers", "Độc giả đang mượn", "#d35400"),
+    ("loans_today", "Mượn hôm nay", "#16a085"),
+]
+
+TREND_DEFAULT_DAYS = 90
+TREND_HEIGHT = 380
+# nhãn hiển thị -> đơn vị của rollups.loan_trend, và định dạng nhãn trục thời gian
+TREND_UNITS = {"Ngày": "day", "Tuần": "week", "Tháng": "month"}
+TREND_LABEL_FORMAT = {"day": "%d/%m/%y", "week": "%d/%m/%y", "month": "%m/%Y"}
+
+
+def _safe(fn):
+    """Chạy trên thread nền: lỗi truy vấn thì coi như không có dữ liệu."""
+    try:
+        return fn()
+    except Exception as e:
+        print(f"Error {fn.__name__}:", e)
+        return []
+
+
+def _load_table_data():
+    return _safe(get_top_category), _safe(get_top_borrower)
+
+
+def _load_trend(start, end, unit, by_category, width, height):
+    """Chạy trên thread nền: truy vấn xu hướng rồi vẽ luôn ra PNG."""
+    trend = loan_trend(start, end, unit, by_category)
+    fmt = TREND_LABEL_FORMAT[trend["unit"]]
+    labels = [b.strftime(fmt) for b in trend["buckets"]]
+    if not any(any(v) for v in trend["series"].values()):
+        return trend, None
+    png = render_lines(labels, trend["series"], width, height, "Lượt mượn theo thời gian")
+    return trend, png
+
+
+def _footer_text(stats: dict) -> str:
+    """'Bộ nhớ đệm: trúng 75% (3/4) · số liệu cách đây 42 giây' cho chân trang."""
+    total = stats["hits"] + stats["misses"]
+    ratio = f"trúng {stats['hit_ratio']:.0%} ({stats['hits']}/{total})" if total else "chưa dùng"
+    age = stats["age"]
+    if age is None:
+        fresh = "số liệu sẽ lấy trực tiếp từ CSDL"
+    elif age < 2:
+        fresh = "số liệu vừa cập nhật"
+    else:
+        fresh = f"số liệu cách đây {int(age)} giây"
+    return f"Bộ nhớ đệm thống kê: {ratio} · {fresh}"
 
 
 class StatisticsFrame(tk.Frame):
@@ -21,6 +86,18 @@ class StatisticsFrame(tk.Frame):
             bg="white",
         ).pack(pady=12)
 
+        # Bảng KPI tổng quan (database/dashboard.py), tự làm mới theo KPI_REFRESH_MS
+        kpi_frame = tk.Frame(self, bg="white")
+        kpi_frame.pack(pady=(0, 6))
+        self.kpi_labels = {}
+        for col, (key, text, color) in enumerate(KPI_CARDS):
+            card = tk.Frame(kpi_frame, bg="#f7f9fc", padx=10, pady=4)
+            card.grid(row=0, column=col, padx=4)
+            value = tk.Label(card, text="–", font=("Segoe UI", 14, "bold"), fg=color, bg="#f7f9fc")
+            value.pack()
+            tk.Label(card, text=text, font=("Segoe UI", 9), fg="#555", bg="#f7f9fc").pack()
+            self.kpi_labels[key] = value
+
         # Nút chuyển chế độ xem
         btn_frame = tk.Frame(self, bg="white")
         btn_frame.pack(pady=5)
@@ -38,10 +115,35 @@ class StatisticsFrame(tk.Frame):
             bg="#2ecc71",
             fg="white",
         ).pack(side="left", padx=8)
+        tk.Button(
+            btn_frame,
+            text="Xu hướng",
+            command=self.show_trend,
+            bg="#9b59b6",
+            fg="white",
+        ).pack(side="left", padx=8)
+        self.busy = BusyIndicator(btn_frame)
+        self.busy.pack(side="left", padx=8)
+
+        # Chân trang: tỉ lệ trúng cache + tuổi số liệu (pack trước để luôn giữ chỗ)
+        self.lbl_footer = tk.Label(self, text="", bg="white", fg="#7f8c8d", font=("Segoe UI", 9))
+        self.lbl_footer.pack(side="bottom", fill="x", pady=(0, 6))
 
-        # Frame chứa biểu đồ
+        # Frame chứa biểu đồ: ảnh PNG do ui/chart_service.py vẽ trên thread nền
         self.chart_frame = tk.Frame(self, bg="white")
         self.chart_frame.pack(fill="both", expand=True)
+        self.chart_frame.bind("<Configure>", self._on_chart_resize)
+        self.lbl_chart = tk.Label(self.chart_frame, bg="white")
+        self.lbl_no_chart = tk.Label(
+            self.chart_frame,
+            text="Không có dữ liệu để hiển thị",
+            bg="white",
+        )
+        self._chart_data = None
+        self._chart_key = None
+        self._chart_image = None
+        self._resize_job = None
+        self._table_data = None
 
         # Frame chứa bảng
         self.table_frame = tk.Frame(self, bg="white")
@@ -90,61 +192,188 @@ class StatisticsFrame(tk.Frame):
         self.tree_borrower.column("count", width=120, anchor="center")
         self.tree_borrower.pack(fill="x", padx=12, pady=(0, 12))
 
+        # Frame xu hướng: chọn khoảng ngày + đơn vị, vẽ biểu đồ đường
+        self.trend_frame = tk.Frame(self, bg="white")
+        controls = tk.Frame(self.trend_frame, bg="white")
+        controls.pack(pady=(5, 5))
+        today = datetime.date.today()
+        self._trend_from = tk.StringVar(value=(today - datetime.timedelta(days=TREND_DEFAULT_DAYS)).isoformat())
+        self._trend_to = tk.StringVar(value=today.isoformat())
+        self._trend_unit = tk.StringVar(value="Ngày")
+        self._trend_by_cat = tk.BooleanVar(value=False)
+        tk.Label(controls, text="Từ (YYYY-MM-DD):", bg="white").pack(side="left")
+        tk.Entry(controls, textvariable=self._trend_from, width=12).pack(side="left", padx=(4, 10))
+        tk.Label(controls, text="Đến:", bg="white").pack(side="left")
+        tk.Entry(controls, textvariable=self._trend_to, width=12).pack(side="left", padx=(4, 10))
+        ttk.Combobox(
+            controls,
+            textvariable=self._trend_unit,
+            values=list(TREND_UNITS),
+            state="readonly",
+            width=7,
+        ).pack(side="left", padx=4)
+        tk.Checkbutton(
+            controls, text="Theo thể loại", variable=self._trend_by_cat, bg="white",
+        ).pack(side="left", padx=8)
+        tk.Button(controls, text="Xem", command=self.show_trend, bg="#9b59b6", fg="white").pack(
+            side="left", padx=4
+        )
+        self.lbl_trend_note = tk.Label(self.trend_frame, text="", bg="white", fg="#7f8c8d")
+        self.lbl_trend_note.pack()
+        self.lbl_trend = tk.Label(self.trend_frame, bg="white")
+        self.lbl_trend.pack(expand=True)
+        self._trend_image = None
+
         # Mặc định mở biểu đồ
         self.show_chart()
+        self._tick_footer()
+        self._tick_kpis()
 
     # ==================== CHUYỂN CHẾ ĐỘ XEM ====================
     def show_chart(self):
         self.table_frame.pack_forget()
+        self.trend_frame.pack_forget()
         self.chart_frame.pack(fill="both", expand=True)
-        self.hien_thi_bieu_do()
+        run_async(
+            self, "statistics.view", _safe, get_top_category,
+            on_done=self.hien_thi_bieu_do, busy=self.busy,
+        )
 
     def show_table(self):
         self.chart_frame.pack_forget()
+        self.trend_frame.pack_forget()
         self.table_frame.pack(fill="both", expand=True)
-        self.hien_thi_bang()
+        run_async(
+            self, "statistics.view", _load_table_data,
+            on_done=lambda data: self.hien_thi_bang(*data), busy=self.busy,
+        )
+
+    def show_trend(self):
+        try:
+            start = datetime.date.fromisoformat(self._trend_from.get().strip())
+            end = datetime.date.fromisoformat(self._trend_to.get().strip())
+        except ValueError:
+            messagebox.showwarning("Ngày không hợp lệ", "Hãy nhập ngày theo dạng YYYY-MM-DD.", parent=self)
+            return
+        if start > end:
+            messagebox.showwarning("Ngày không hợp lệ", "Ngày bắt đầu phải trước ngày kết thúc.", parent=self)
+            return
+
+        self.chart_frame.pack_forget()
+        self.table_frame.pack_forget()
+        self.trend_frame.pack(fill="both", expand=True)
+        self.update_idletasks()
+        width, height = snap_size(max(self.winfo_width() - 40, 600), TREND_HEIGHT)
+        unit = TREND_UNITS.get(self._trend_unit.get(), "day")
+        run_async(
+            self, "statistics.view", _load_trend,
+            datetime.datetime.combine(start, datetime.time()),
+            datetime.datetime.combine(end, datetime.time()),
+            unit, self._trend_by_cat.get(), width, height,
+            on_done=lambda result: self.hien_thi_xu_huong(unit, *result), busy=self.busy,
+        )
+
+    # ==================== KPI ====================
+    def refresh_kpis(self):
+        run_async(self, "statistics.kpi", get_kpis, on_done=self.hien_thi_kpi, on_error=lambda e: print("KPI error:", e))
+
+    def _tick_kpis(self):
+        # Trong TTL của query_cache thì lần làm mới chỉ đọc cache, không xuống CSDL
+        self.refresh_kpis()
+        self.after(KPI_REFRESH_MS, self._tick_kpis)
+
+    def hien_thi_kpi(self, kpis: dict):
+        for key, label in self.kpi_labels.items():
+            label.config(text=f"{kpis.get(key, 0):,}".replace(",", "."))
+        self.update_footer()
+
+    # ==================== CHÂN TRANG ====================
+    def update_footer(self):
+        self.lbl_footer.config(text=_footer_text(query_stats()))
+
+    def _tick_footer(self):
+        self.update_footer()
+        self.after(FOOTER_REFRESH_MS, self._tick_footer)
 
     # ==================== HIỂN THỊ BIỂU ĐỒ ====================
-    def hien_thi_bieu_do(self):
-        # Xóa biểu đồ cũ
-        for widget in self.chart_frame.winfo_children():
-            widget.destroy()
+    def hien_thi_bieu_do(self, cat):
+        """cat: [(category, so_luot), ...] đã lấy sẵn trên thread nền."""
+        self.update_footer()
+        data = [(row[0], row[1]) for row in cat or []]
+        self._chart_data = data
 
-        try:
-            cat = get_top_category()  # [(category, so_luot), ...]
-        except Exception as e:
-            print("Error get_top_category:", e)
-            cat = []
-
-        if not cat:
-            tk.Label(
-                self.chart_frame,
-                text="Không có dữ liệu để hiển thị",
-                bg="white",
-            ).pack(pady=30)
+        if not data:
+            self.lbl_chart.pack_forget()
+            self.lbl_no_chart.pack(pady=30)
+            self._chart_key = None
             return
+        self.lbl_no_chart.pack_forget()
+        if not self.lbl_chart.winfo_manager():
+            self.lbl_chart.pack(expand=True)
+        self._render_chart()
 
-        labels = [row[0] for row in cat]
-        sizes = [row[1] for row in cat]
+    def _chart_size(self):
+        self.chart_frame.update_idletasks()
+        w, h = self.chart_frame.winfo_width(), self.chart_frame.winfo_height()
+        if w <= 1 or h <= 1:
+            w, h = CHART_DEFAULT_SIZE
+        return snap_size(min(w, h), min(w, h))
 
-        fig, ax = plt.subplots(figsize=(5, 5))
-        ax.pie(sizes, labels=labels, autopct="%1.1f%%", startangle=90)
-        ax.set_title("Tỉ lệ mượn theo thể loại", fontsize=12)
+    def _render_chart(self):
+        """Lấy ảnh trong cache nếu có, không thì vẽ trên thread nền rồi gắn vào Label."""
+        if not self._chart_data:
+            return
+        w, h = self._chart_size()
+        key = chart_key("pie", self._chart_data, w, h)
+        if key == self._chart_key:
+            return  # số liệu và kích thước không đổi: giữ nguyên ảnh
+        png = cached_chart(key)
+        if png is not None:
+            self._show_chart_image(key, png)
+            return
+        run_async(
+            self, "statistics.chart", render_pie, self._chart_data, w, h, CHART_TITLE,
+            on_done=lambda result: self._show_chart_image(key, result), busy=self.busy,
+        )
 
-        canvas = FigureCanvasTkAgg(fig, master=self.chart_frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack(expand=True)
-        plt.close(fig)
+    def _show_chart_image(self, key, png):
+        self._chart_image = image_from_png(png)   # giữ tham chiếu để Tk không xoá ảnh
+        self.lbl_chart.configure(image=self._chart_image)
+        self._chart_key = key
+
+    def _on_chart_resize(self, _event=None):
+        # Gom các sự kiện <Configure> liên tiếp khi kéo giãn cửa sổ
+        if self._resize_job is not None:
+            self.after_cancel(self._resize_job)
+        self._resize_job = self.after(RESIZE_DEBOUNCE_MS, self._after_resize)
+
+    def _after_resize(self):
+        self._resize_job = None
+        if self.chart_frame.winfo_ismapped():
+            self._render_chart()
+
+    # ==================== HIỂN THỊ XU HƯỚNG ====================
+    def hien_thi_xu_huong(self, requested_unit, trend, png):
+        self.update_footer()
+        names = {v: k for k, v in TREND_UNITS.items()}
+        note = f"{len(trend['buckets'])} mốc theo {names[trend['unit']].lower()}"
+        if trend["unit"] != requested_unit:
+            note += f" (khoảng ngày dài nên đã gộp từ {names[requested_unit].lower()})"
+        if png is None:
+            self._trend_image = None
+            self.lbl_trend.configure(image="", text="Không có dữ liệu để hiển thị")
+        else:
+            self._trend_image = image_from_png(png)
+            self.lbl_trend.configure(image=self._trend_image, text="")
+        self.lbl_trend_note.configure(text=note)
 
     # ==================== HIỂN THỊ BẢNG ====================
-    def hien_thi_bang(self):
-        try:
-            cat = get_top_category()
-            borrower = get_top_borrower()
-        except Exception as e:
-            print("Error statistics:", e)
-            cat = []
-            borrower = []
+    def hien_thi_bang(self, cat, borrower):
+        self.update_footer()
+        data = ([tuple(r) for r in cat or []], [tuple(r) for r in borrower or []])
+        if data == self._table_data:
+            return  # số liệu không đổi: không dựng lại Treeview
+        self._table_data = data
 
         # Xóa dữ liệu cũ
         for i in self.tree_category.get_children():
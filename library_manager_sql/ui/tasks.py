@@ -0,0 +1,92 @@
+# ui/tasks.py
+"""
+Chạy các lệnh truy cập CSDL trên thread pool để cửa sổ Tk không bị treo.
+
+    run_async(widget, "books.list", _list_books, kw, on_done=self._show_page, busy=self.busy)
+
+- fn(*args) chạy trên thread nền; on_done(result) / on_error(exc) luôn được gọi
+  lại trên thread Tk (qua widget.after), nên được phép đụng vào widget.
+- Mỗi key (thường là "<màn hình>.<việc>") chỉ giữ kết quả của yêu cầu MỚI NHẤT:
+  yêu cầu cũ chưa chạy thì bị huỷ, đã chạy xong thì kết quả bị bỏ qua.
+- busy: đối tượng có start()/stop() (ui/components/busy.py) để hiện "Đang tải...".
+- Lệnh ghi (thêm / sửa / xoá) dùng run_write: mỗi lần ghi một key riêng nên
+  không bao giờ bị huỷ hay bỏ kết quả vì một lệnh ghi khác.
+"""
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import messagebox
+
+POLL_MS = 15          # ~60 lần/giây, không chặn vòng lặp sự kiện
+MAX_WORKERS = 4
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="db-task")
+_lock = threading.Lock()
+_generation: dict[str, int] = {}
+_pending: dict = {}
+_write_seq = itertools.count(1)
+
+
+def _default_error(widget, exc):
+    messagebox.showerror("Lỗi CSDL", f"Không thể tải dữ liệu:\n{exc}", parent=widget)
+
+
+def run_async(widget, key: str, fn, *args, on_done=None, on_error=None, busy=None, **kwargs):
+    with _lock:
+        gen = _generation.get(key, 0) + 1
+        _generation[key] = gen
+        previous = _pending.get(key)
+        if previous is not None:
+            previous.cancel()  # chỉ huỷ được nếu chưa bắt đầu chạy
+        future = _executor.submit(fn, *args, **kwargs)
+        _pending[key] = future
+
+    if busy is not None:
+        busy.start()
+
+    def _poll():
+        try:
+            alive = bool(widget.winfo_exists())
+        except Exception:
+            alive = False
+        if not future.done():
+            if alive:
+                widget.after(POLL_MS, _poll)
+            return
+        if busy is not None and alive:
+            busy.stop()
+        with _lock:
+            latest = _generation.get(key) == gen
+            if _pending.get(key) is future:
+                del _pending[key]
+        if not alive or not latest or future.cancelled():
+            return  # màn hình đã đóng hoặc đã có yêu cầu mới hơn
+        exc = future.exception()
+        if exc is not None:
+            (on_error or (lambda e: _default_error(widget, e)))(exc)
+        elif on_done is not None:
+            on_done(future.result())
+
+    widget.after(POLL_MS, _poll)
+    return future
+
+
+def run_write(widget, fn, *args, on_done=None, on_error=None, busy=None, **kwargs):
+    """run_async cho lệnh ghi CSDL (key riêng cho từng lần gọi)."""
+    return run_async(
+        widget, f"write.{next(_write_seq)}", fn, *args,
+        on_done=on_done, on_error=on_error, busy=busy, **kwargs,
+    )
+
+
+def submit_background(fn, *args, **kwargs):
+    """Chạy fn trên thread nền, không cần trả kết quả về giao diện."""
+    return _executor.submit(fn, *args, **kwargs)
+
+
+def shutdown_tasks():
+    """Huỷ các việc chưa chạy (gọi khi thoát / đăng xuất)."""
+    with _lock:
+        for future in _pending.values():
+            future.cancel()
+        _pending.clear()